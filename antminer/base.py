@@ -4,23 +4,35 @@ import sys
 
 from antminer.exceptions import (
     WarningResponse, ErrorResponse, FatalResponse, UnknownError,
-    raise_exception
+    UnsupportedCommand, raise_exception
 )
 from antminer.constants import (
-    STATUS_INFO, STATUS_SUCCESS, DEFAULT_PORT, MINER_CGMINER,
-    MINER_BMMINER
+    STATUS_INFO, STATUS_SUCCESS, DEFAULT_PORT, DEFAULT_TIMEOUT, MINER_CGMINER,
+    MINER_BMMINER, MINER_UNKNOWN, CODE_INVCMD, COALESCED_COMMANDS
 )
+from antminer.cache import UnsupportedCommandCache, VersionCache
+from antminer.ratelimit import HostRateLimiter
 from antminer.utils import parse_version_number
 
+# Keys of the first STATS entry that identify the running firmware.
+FIRMWARE_FIELDS = ('Type', 'Miner', MINER_BMMINER, MINER_CGMINER, 'CompileTime')
+
 
 class Core(object):
-    def __init__(self, host, port=DEFAULT_PORT):
+    # Shared by all clients, since a new client is usually created per poll.
+    unsupported = UnsupportedCommandCache()
+    versions = VersionCache()
+    limiter = HostRateLimiter()
+
+    def __init__(self, host, port=DEFAULT_PORT, timeout=DEFAULT_TIMEOUT):
         self.host = host
         self.port = int(port)
+        self.timeout = timeout
         self.conn = None
 
     def connect(self):
         self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.conn.settimeout(self.timeout)
         self.conn.connect((self.host, self.port))
 
     def close(self):
@@ -28,6 +40,15 @@ class Core(object):
         self.conn = None
 
     def send_command(self, command):
+        """
+        Send a command within the host's rate limit. Identical read-only
+        commands sent to the host concurrently share a single request.
+        """
+        name = command.split('|')[0]
+        key = command if name in COALESCED_COMMANDS else None
+        return self.limiter.call(self.host, key, lambda: self._exchange(command))
+
+    def _exchange(self, command):
         if self.conn is None:
             self.connect()
 
@@ -42,14 +63,18 @@ class Core(object):
         if len(cmd) == 2:
             payload['parameter'] = cmd[1]
 
-        self.conn.send(json.dumps(payload).encode('utf-8'))
-        payload = self.read_response()
+        try:
+            self.conn.send(json.dumps(payload).encode('utf-8'))
+            payload = self.read_response()
+        finally:
+            # Also on a timeout, so that the next command reconnects.
+            self.close()
+
         try:
             response = json.loads(payload)
         except ValueError:
             response = payload# Assume downstream code knows what to do.
 
-        self.close()
         return response
 
     def read_response(self):
@@ -83,6 +108,11 @@ class Core(object):
         raise_exception(response, message)
 
     def _send(self, command):
+        name = command.split('|')[0]
+        refused = self.unsupported.get(self.host, name)
+        if refused is not None:
+            raise UnsupportedCommand(refused, 'Command refused earlier by this host')
+
         response = self.send_command(command)
         try:
             success = (response['STATUS'][0]['STATUS'] in [STATUS_INFO, STATUS_SUCCESS])
@@ -90,10 +120,45 @@ class Core(object):
             raise UnknownError(response)
 
         if not success:
+            try:
+                code = int(response['STATUS'][0]['Code'])
+            except (KeyError, IndexError, TypeError, ValueError):
+                code = None
+            if code == CODE_INVCMD:
+                self.unsupported.add(self.host, name, response)
             self._raise(response)
 
         return response
 
+    def _note_firmware(self, stats):
+        """
+        Track the firmware fingerprint reported in stats, so that refused
+        commands are retried after a firmware upgrade.
+        """
+        try:
+            info = stats['STATS'][0]
+        except (KeyError, IndexError, TypeError):
+            return
+
+        fingerprint = tuple(str(info.get(field, '')) for field in FIRMWARE_FIELDS)
+        self.unsupported.set_firmware(self.host, fingerprint)
+        if info.get('Type'):
+            self.limiter.set_model(self.host, str(info['Type']))
+
+    def note_uptime(self, elapsed):
+        """
+        Record the uptime (in seconds) reported by the miner. A reboot
+        invalidates the cached version and the refused commands, since the
+        miner may have come back with different firmware.
+        """
+        try:
+            elapsed = float(elapsed)
+        except (TypeError, ValueError):
+            return
+
+        if self.versions.note_uptime(self.host, elapsed):
+            self.unsupported.clear(self.host)
+
 
 class BaseClient(Core):
 
@@ -105,19 +170,42 @@ class BaseClient(Core):
         requires us to do some light JSON correction before we load the response.
         """
         response = self.send_command('stats')
-        # Если response уже является словарем, возвращаем его как есть
-        if isinstance(response, dict):
-            return response
         # Если response - строка, обрабатываем ее как раньше
-        return json.loads(response.replace('"}{"', '"},{"'))
+        if not isinstance(response, dict):
+            response = json.loads(response.replace('"}{"', '"},{"'))
+
+        self._note_firmware(response)
+        for entry in response.get('STATS', [])[1:2]:
+            if 'Elapsed' in entry:
+                self.note_uptime(entry['Elapsed'])
+        return response
 
-    def version(self):
+    def summary(self):
+        """
+        Get the summary for the miner, recording its uptime.
+        """
+        response = self.command('summary')
+        try:
+            self.note_uptime(response['SUMMARY'][0]['Elapsed'])
+        except (KeyError, IndexError, TypeError):
+            pass
+        return response
+
+    def version(self, refresh=False):
         """
         Get basic hardware and software version information for a miner.
 
         This returns a number of important version numbers for the miner. Each of the
         version numbers is an instance of Version from the SemVer Python package.
+
+        The result is cached per host until the miner reboots (see note_uptime),
+        so repeated calls are free; pass refresh=True to query the miner anyway.
         """
+        if not refresh:
+            cached = self.versions.get(self.host)
+            if cached is not None:
+                return cached
+
         fields = [
             ('Type', 'model', str),
             ('API', 'api', parse_version_number),
@@ -144,7 +232,15 @@ class BaseClient(Core):
             version['miner']['vendor'] = MINER_UNKNOWN
             version['miner']['version'] = None
 
+        self.versions.set(self.host, version)
         return version
 
+    def cached_version(self):
+        """
+        Return the cached version information without contacting the miner,
+        or None if it has not been fetched since the last reboot.
+        """
+        return self.versions.get(self.host)
+
     def __getattr__(self, name, *args):
         return lambda *x: self.command(name, *x)
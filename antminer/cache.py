@@ -0,0 +1,114 @@
+import threading
+import time
+
+from antminer.constants import UNSUPPORTED_COMMAND_TTL, REBOOT_TOLERANCE
+
+
+class UnsupportedCommandCache(object):
+    """
+    Per-host memory of commands the firmware refused with INVCMD.
+
+    Entries expire after ``ttl`` seconds, and every entry for a host is
+    dropped as soon as the host reports a different firmware fingerprint.
+    """
+
+    def __init__(self, ttl=UNSUPPORTED_COMMAND_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._commands = {}
+        self._firmware = {}
+
+    def add(self, host, command, response):
+        with self._lock:
+            self._commands.setdefault(host, {})[command] = (response, time.time())
+
+    def get(self, host, command):
+        """
+        Return the cached refusal for a command, or None if the command
+        should be sent to the miner.
+        """
+        with self._lock:
+            try:
+                response, refused_at = self._commands[host][command]
+            except KeyError:
+                return None
+
+            if time.time() - refused_at > self.ttl:
+                del self._commands[host][command]
+                return None
+
+            return response
+
+    def set_firmware(self, host, firmware):
+        """
+        Record the firmware fingerprint for a host, forgetting its refused
+        commands if the firmware changed since the last call.
+        """
+        with self._lock:
+            previous = self._firmware.get(host)
+            self._firmware[host] = firmware
+            if previous is not None and previous != firmware:
+                self._commands.pop(host, None)
+
+    def clear(self, host=None):
+        with self._lock:
+            if host is None:
+                self._commands.clear()
+                self._firmware.clear()
+            else:
+                self._commands.pop(host, None)
+                self._firmware.pop(host, None)
+
+    def commands(self, host):
+        """Commands currently known to be unsupported by a host."""
+        with self._lock:
+            return set(self._commands.get(host, {}))
+
+
+class VersionCache(object):
+    """
+    Per-host cache of BaseClient.version() results.
+
+    A cached version stays valid for as long as the miner keeps running:
+    the boot time is derived from the uptime the miner reports, and a
+    changed boot time means the miner rebooted, possibly into new firmware.
+    """
+
+    def __init__(self, tolerance=REBOOT_TOLERANCE):
+        self.tolerance = tolerance
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._boot_times = {}
+
+    def get(self, host):
+        with self._lock:
+            return self._versions.get(host)
+
+    def set(self, host, version):
+        with self._lock:
+            self._versions[host] = version
+
+    def note_uptime(self, host, elapsed, now=None):
+        """
+        Record the uptime reported by a host. Returns True if the host has
+        rebooted since the previous call, in which case its cached version
+        has been dropped.
+        """
+        boot_time = (now if now is not None else time.time()) - elapsed
+        with self._lock:
+            previous = self._boot_times.get(host)
+            self._boot_times[host] = boot_time
+            if previous is None or abs(boot_time - previous) <= self.tolerance:
+                return False
+
+            self._versions.pop(host, None)
+            return True
+
+    def clear(self, host=None):
+        with self._lock:
+            if host is None:
+                self._versions.clear()
+                self._boot_times.clear()
+            else:
+                self._versions.pop(host, None)
+                self._boot_times.pop(host, None)
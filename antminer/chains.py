@@ -0,0 +1,116 @@
+import re
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Per-chain fields of the second STATS entry: chip temperatures
+# ("45-50-62-65"), chip status strings (" oooooooo oooxoooo"), average
+# chain frequency and, on some firmware, per-chip frequency lists.
+CHAIN_FIELD = re.compile(r'^(temp_chip|chain_acs|freq_avg|freq)(\d+)$')
+NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+# Chip status characters reported for chips that failed
+FAILED_CHIPS = ('x', '-')
+
+
+def _numbers(value, use_numpy):
+    """Numbers packed in a string (or a single number) as an array."""
+    if isinstance(value, (int, float)):
+        numbers = [float(value)]
+    else:
+        numbers = NUMBER.findall(str(value))
+    if use_numpy:
+        return numpy.array(numbers, dtype=float)
+    return array('d', map(float, numbers))
+
+
+class ChainTelemetry(object):
+    """
+    Decoded per-chain telemetry of one ``stats`` response.
+
+    ``temps`` and ``freqs`` map the chain number to an array of numbers
+    (a NumPy array if NumPy is used, ``array('d')`` otherwise),
+    ``statuses`` to the chip status string without separators.
+    """
+
+    def __init__(self, temps, statuses, freqs, use_numpy):
+        self.temps = temps
+        self.statuses = statuses
+        self.freqs = freqs
+        self.use_numpy = use_numpy
+
+    def chains(self):
+        return sorted(set(self.temps) | set(self.statuses) | set(self.freqs), key=int)
+
+    def _temp_range(self, temps):
+        # 0 means the chip has no sensor reading
+        if self.use_numpy:
+            temps = temps[temps > 0]
+            if not temps.size:
+                return None
+            return float(temps.min()), float(temps.max())
+        temps = [t for t in temps if t > 0]
+        if not temps:
+            return None
+        return min(temps), max(temps)
+
+    def _average(self, values):
+        if not len(values):
+            return None
+        if self.use_numpy:
+            return float(values.mean())
+        return sum(values) / len(values)
+
+    def metrics(self):
+        """
+        Derived metrics per chain: chip_temp_min, chip_temp_max, chips,
+        failed_chips and freq_avg. Metrics without data are left out.
+        """
+        metrics = {}
+        for chain in self.chains():
+            values = {}
+            temp_range = self._temp_range(self.temps[chain]) if chain in self.temps else None
+            if temp_range is not None:
+                values['chip_temp_min'], values['chip_temp_max'] = temp_range
+            status = self.statuses.get(chain)
+            if status:
+                values['chips'] = len(status)
+                values['failed_chips'] = sum(status.count(char) for char in FAILED_CHIPS)
+            freq = self._average(self.freqs[chain]) if chain in self.freqs else None
+            if freq is not None:
+                values['freq_avg'] = round(freq, 2)
+            if values:
+                metrics[chain] = values
+        return metrics
+
+
+def decode(stats, use_numpy=None):
+    """
+    Decode the per-chain string fields of a STATS entry in one pass.
+
+    NumPy is used when it is installed, unless ``use_numpy`` says otherwise.
+    """
+    use_numpy = numpy is not None if use_numpy is None else use_numpy and numpy is not None
+    temps = {}
+    statuses = {}
+    freqs = {}
+    averages = {}
+    for key, value in stats.items():
+        match = CHAIN_FIELD.match(key)
+        if match is None or value is None:
+            continue
+        field, chain = match.groups()
+        if field == 'temp_chip':
+            temps[chain] = _numbers(value, use_numpy)
+        elif field == 'chain_acs':
+            statuses[chain] = str(value).replace(' ', '')
+        elif field == 'freq_avg':
+            averages[chain] = _numbers(value, use_numpy)
+        else:
+            freqs[chain] = _numbers(value, use_numpy)
+    # The average reported by the firmware wins over per-chip lists
+    freqs.update(averages)
+    return ChainTelemetry(temps, statuses, freqs, use_numpy)
@@ -8,10 +8,45 @@ STATUS_FATAL = 'F'
 # Default port of the API.
 DEFAULT_PORT = 4028
 
+# Default socket timeout (in seconds) for connecting to and reading from
+# the API, so that a hung miner can't block the caller forever.
+DEFAULT_TIMEOUT = 10
+
+# Default per-host request rate (requests per second) and burst size, see
+# antminer.ratelimit. The port 4028 API of some firmware hangs when it gets
+# too many requests at once.
+DEFAULT_RATE_LIMIT = 4.0
+DEFAULT_BURST = 8
+
+# Read-only commands: identical concurrent requests to a host are coalesced
+# into one.
+COALESCED_COMMANDS = frozenset([
+    'stats', 'summary', 'devs', 'edevs', 'pools', 'version', 'config',
+    'coin', 'devdetails', 'estats', 'check',
+])
+
+# Web interface (CGI) defaults of stock Antminer firmware, see antminer.web.
+DEFAULT_WEB_PORT = 80
+DEFAULT_WEB_USERNAME = 'root'
+DEFAULT_WEB_PASSWORD = 'root'
+# Idle keep-alive connections kept per host.
+WEB_MAX_IDLE = 2
+
 MINER_CGMINER = 'CGMiner'
 MINER_BMMINER = 'BMMiner'
 MINER_UNKNOWN = 'UNKNOWN'
 
+# Response code for a command the firmware does not know.
+CODE_INVCMD = 14
+
+# How long (in seconds) a command refused with INVCMD is remembered
+# before it is tried against the host again.
+UNSUPPORTED_COMMAND_TTL = 6 * 60 * 60
+
+# Boot times derived from the reported uptime that differ by less than
+# this many seconds are treated as the same boot.
+REBOOT_TOLERANCE = 60
+
 # A map of response codes to reasonably sane 
 # response messages.
 RESPONSE_CODES = {
@@ -38,14 +38,47 @@ class ErrorResponse(APIException):
     pass
 
 
+class UnsupportedCommand(ErrorResponse):
+    """
+    Raised without contacting the miner for a command that the host
+    previously refused with INVCMD.
+    """
+    pass
+
+
 class FatalResponse(APIException):
     pass
 
 
+class RateLimited(Exception):
+    """
+    Raised instead of sending a request that would have to wait longer
+    than the limiter allows for the host's rate limit.
+    """
+    def __init__(self, host, delay):
+        super(RateLimited, self).__init__(
+            "Request to {host} rate limited ({delay:.1f}s wait)".format(host=host, delay=delay))
+        self.host = host
+        self.delay = delay
+
+
 class UnknownError(APIException):
     pass
 
 
+class WebError(Exception):
+    """
+    Raised when the web interface of a miner answers a CGI request with
+    an HTTP error status.
+    """
+    def __init__(self, host, path, status, reason=None):
+        super(WebError, self).__init__(
+            "{host}{path}: HTTP {status} {reason}".format(host=host, path=path, status=status, reason=reason or ''))
+        self.host = host
+        self.path = path
+        self.status = status
+
+
 # Maps the basic warning codes returned from the API to
 # our Exceoption classes.
 STATUS_CODE_TO_EXCEPTION = {
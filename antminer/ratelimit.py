@@ -0,0 +1,144 @@
+import copy
+import threading
+import time
+
+from antminer.constants import DEFAULT_RATE_LIMIT, DEFAULT_BURST
+from antminer.exceptions import RateLimited
+
+
+class TokenBucket(object):
+    """
+    Classic token bucket: ``burst`` requests may be sent back to back, after
+    which requests are admitted at ``rate`` per second.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self, now=None):
+        """
+        Take a token and return how many seconds the caller has to wait
+        before using it (0 if a token was available).
+        """
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class _Flight(object):
+    """A request in progress whose outcome is shared by coalesced callers."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class HostRateLimiter(object):
+    """
+    Per-host request limiting for fragile miner APIs.
+
+    Every host gets a token bucket; requests above its rate are queued
+    (the caller sleeps until its token is due) rather than sent. Identical
+    read-only requests that arrive while one is already in flight for the
+    same host are coalesced: they wait for it and share its response
+    instead of being sent again.
+
+    Limits can differ per model, as reported by the firmware (see
+    set_model). A rate of None disables limiting.
+
+    The limiter only sees requests made from this process.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE_LIMIT, burst=DEFAULT_BURST, max_wait=None):
+        self._lock = threading.Lock()
+        self._host_models = {}
+        self.configure(rate, burst, max_wait=max_wait)
+
+    def configure(self, rate=DEFAULT_RATE_LIMIT, burst=DEFAULT_BURST, models=None, max_wait=None):
+        """
+        Set the default limits and per-model overrides, a dict of
+        model -> (rate, burst). ``max_wait`` bounds how long a request may
+        be queued before RateLimited is raised.
+        """
+        with self._lock:
+            self.rate = rate
+            self.burst = burst
+            self.models = dict(models or {})
+            self.max_wait = max_wait
+            self._buckets = {}
+            self._flights = {}
+
+    def set_model(self, host, model):
+        """Record the model of a host, switching it to that model's limits."""
+        with self._lock:
+            if self._host_models.get(host) != model:
+                self._host_models[host] = model
+                self._buckets.pop(host, None)
+
+    def limits(self, host):
+        model = self._host_models.get(host)
+        if model is not None:
+            for prefix, limits in self.models.items():
+                if model.startswith(prefix):
+                    return limits
+        return self.rate, self.burst
+
+    def acquire(self, host):
+        """Wait until the host may be sent another request."""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self.limits(host)
+                if rate is None:
+                    return 0.0
+                bucket = self._buckets[host] = TokenBucket(rate, burst)
+            delay = bucket.reserve()
+            if self.max_wait is not None and delay > self.max_wait:
+                # Give the token back, the request is not going to be sent
+                bucket.tokens += 1
+                raise RateLimited(host, delay)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def call(self, host, key, func):
+        """
+        Run func() for a host within its limits. Calls with the same key
+        (None disables coalescing) that overlap in time share one result.
+        """
+        if key is None:
+            self.acquire(host)
+            return func()
+
+        with self._lock:
+            flight = self._flights.get((host, key))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(host, key)] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            # Each caller gets its own copy of the shared response
+            return copy.deepcopy(flight.result)
+
+        try:
+            self.acquire(host)
+            flight.result = func()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop((host, key), None)
+            flight.done.set()
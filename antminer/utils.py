@@ -1,6 +1,12 @@
+import functools
+
 import semantic_version
 
+# Miners report only a handful of distinct version strings.
+VERSION_CACHE_SIZE = 256
+
 
+@functools.lru_cache(maxsize=VERSION_CACHE_SIZE)
 def parse_version_number(version):
     """
     Parse a version number of varying lengths into a SemVer instance.
@@ -8,6 +14,9 @@ def parse_version_number(version):
     This function takes a variable length version number and does a
     reasonably good job of converting it into a valid instance of
     a SemVer object.
+
+    Results are memoized, so the returned instances are shared and must
+    not be modified.
     """
     if not version:
         return semantic_version.Version('0.0.0')
@@ -0,0 +1,211 @@
+import hashlib
+import http.client
+import json
+import os
+import threading
+from urllib.request import parse_http_list, parse_keqv_list
+
+from antminer.constants import (
+    DEFAULT_TIMEOUT, DEFAULT_WEB_PORT, DEFAULT_WEB_USERNAME, DEFAULT_WEB_PASSWORD, WEB_MAX_IDLE
+)
+from antminer.exceptions import WebError
+
+HASHES = {
+    'MD5': hashlib.md5,
+    'MD5-SESS': hashlib.md5,
+    'SHA-256': hashlib.sha256,
+    'SHA-256-SESS': hashlib.sha256,
+}
+
+
+class DigestChallenge(object):
+    """
+    A digest authentication challenge (RFC 7616) received from a miner.
+
+    The challenge is reused for later requests with an increasing nonce
+    count, so only the first request to a host, or the first one after the
+    miner rotates its nonce, costs an extra 401 round trip.
+    """
+
+    def __init__(self, realm, nonce, qop=None, opaque=None, algorithm='MD5'):
+        self.realm = realm
+        self.nonce = nonce
+        self.qop = qop
+        self.opaque = opaque
+        self.algorithm = (algorithm or 'MD5').upper()
+        self.nc = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, header):
+        """Build a challenge from a WWW-Authenticate header, None if it isn't Digest."""
+        if not header:
+            return None
+        scheme, _, params = header.partition(' ')
+        if scheme.lower() != 'digest':
+            return None
+        params = parse_keqv_list(parse_http_list(params))
+        qops = [qop.strip() for qop in params.get('qop', '').split(',')]
+        if params.get('algorithm', 'MD5').upper() not in HASHES or 'nonce' not in params:
+            return None
+        return cls(params.get('realm', ''), params['nonce'], 'auth' if 'auth' in qops else None,
+                   params.get('opaque'), params.get('algorithm'))
+
+    def authorization(self, username, password, method, uri):
+        """Value of the Authorization header for one request."""
+        hash_function = HASHES[self.algorithm]
+
+        def digest(*parts):
+            return hash_function(':'.join(parts).encode('utf-8')).hexdigest()
+
+        with self._lock:
+            self.nc += 1
+            nc = '{:08x}'.format(self.nc)
+        cnonce = os.urandom(8).hex()
+
+        ha1 = digest(username, self.realm, password)
+        if self.algorithm.endswith('-SESS'):
+            ha1 = digest(ha1, self.nonce, cnonce)
+        ha2 = digest(method, uri)
+        if self.qop:
+            response = digest(ha1, self.nonce, nc, cnonce, self.qop, ha2)
+        else:
+            response = digest(ha1, self.nonce, ha2)
+
+        fields = [
+            ('username', username), ('realm', self.realm), ('nonce', self.nonce),
+            ('uri', uri), ('response', response), ('algorithm', self.algorithm),
+        ]
+        if self.opaque is not None:
+            fields.append(('opaque', self.opaque))
+        header = ', '.join('{}="{}"'.format(key, value) for key, value in fields)
+        if self.qop:
+            header += ', qop={}, nc={}, cnonce="{}"'.format(self.qop, nc, cnonce)
+        return 'Digest ' + header
+
+
+class ChallengeCache(object):
+    """Last digest challenge per (host, port, username)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._challenges = {}
+
+    def get(self, key):
+        with self._lock:
+            return self._challenges.get(key)
+
+    def set(self, key, challenge):
+        with self._lock:
+            self._challenges[key] = challenge
+
+    def clear(self):
+        with self._lock:
+            self._challenges.clear()
+
+
+class ConnectionPool(object):
+    """
+    Idle keep-alive HTTP connections per host, so that repeated polls of
+    the web interface don't open a new TCP connection every time.
+    """
+
+    def __init__(self, max_idle=WEB_MAX_IDLE):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    def get(self, host, port, timeout):
+        """Return a connection and whether it was reused from the pool."""
+        with self._lock:
+            idle = self._idle.get((host, port))
+            if idle:
+                connection = idle.pop()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def put(self, host, port, connection):
+        with self._lock:
+            idle = self._idle.setdefault((host, port), [])
+            if len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class WebClient(object):
+    """
+    Client for the CGI endpoints of the Antminer web interface
+    (get_system_info.cgi, stats.cgi on newer firmware, network settings),
+    which expose data the port 4028 API doesn't.
+    """
+
+    # Shared by all clients, since a new client is usually created per poll.
+    pool = ConnectionPool()
+    challenges = ChallengeCache()
+
+    def __init__(self, host, username=DEFAULT_WEB_USERNAME, password=DEFAULT_WEB_PASSWORD,
+                 port=DEFAULT_WEB_PORT, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+
+    def cgi(self, name):
+        """Fetch /cgi-bin/<name>.cgi and decode its JSON response."""
+        body = self.request('/cgi-bin/{}.cgi'.format(name))
+        text = body.decode('utf-8', 'replace')
+        try:
+            return json.loads(text)
+        except ValueError:
+            # Some CGI scripts of older firmware answer with plain text
+            return text
+
+    def request(self, path, method='GET', body=None):
+        """Send a request, authenticating with the cached challenge if there is one."""
+        key = (self.host, self.port, self.username)
+        challenge = self.challenges.get(key)
+        status, reason, headers, data = self._send(method, path, body, challenge)
+        if status == 401:
+            # No challenge yet, or the miner rotated its nonce
+            challenge = DigestChallenge.parse(headers.get('WWW-Authenticate'))
+            if challenge is None:
+                raise WebError(self.host, path, status, reason)
+            self.challenges.set(key, challenge)
+            status, reason, headers, data = self._send(method, path, body, challenge)
+        if status >= 400:
+            raise WebError(self.host, path, status, reason)
+        return data
+
+    def _send(self, method, path, body, challenge):
+        for attempt in range(2):
+            headers = {'Connection': 'keep-alive'}
+            if challenge is not None:
+                headers['Authorization'] = challenge.authorization(self.username, self.password, method, path)
+            connection, reused = self.pool.get(self.host, self.port, self.timeout)
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if reused and attempt == 0:
+                    # The miner closed the idle connection, retry on a new one
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self.pool.put(self.host, self.port, connection)
+            return response.status, response.reason, response.headers, data
@@ -1,16 +1,62 @@
 #!/usr/bin/python3
 
+import collections
+import concurrent.futures
 import json
-import paho.mqtt.client as mqtt
 import time
 import subprocess
 import socket
 import argparse
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import os
-from whatsminer import WhatsminerAccessToken, WhatsminerAPI
-from antminer.base import BaseClient
+from asic2mqtt_core.anomaly import AnomalyDetector
+from asic2mqtt_core.api import DEFAULT_MAX_AGE, ApiServer, MinerCache, SnapshotApi
+from asic2mqtt_core.brokers import BrokerFanout
+from asic2mqtt_core.cluster import ClusterMembership
+from asic2mqtt_core.commands import CommandRequests, FleetCommandRunner, select_miners
+from asic2mqtt_core.concurrency import ConcurrencyController
+from asic2mqtt_core.drivers import (
+    CapabilityCache, configure_rate_limits, get_driver, load_plugins, resolve_driver
+)
+from asic2mqtt_core.encoding import PayloadEncoder
+from asic2mqtt_core.fleet import FleetAggregator, STATE_ERROR, STATE_OFFLINE, STATE_ONLINE
+from asic2mqtt_core.history import HistoryStore
+from asic2mqtt_core.homeassistant import DiscoveryPublisher
+from asic2mqtt_core.logs import DeferredQueueHandler, RateLimiter
+from asic2mqtt_core.metrics import MetricExtractor
+from asic2mqtt_core.projection import PayloadProjector
+from asic2mqtt_core.refresh import DEFAULT_MIN_INTERVAL, RefreshRequests
+from asic2mqtt_core.snapshot import SnapshotBatcher
+from asic2mqtt_core.warmstate import WarmState
+from asic2mqtt_core.workers import CYCLE_END, WorkerPool
+
+# Соответствие названий уровней логгирования в конфигурации
+LOG_LEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR
+}
+
+# Пауза между опросами асиков и между циклами, секунд
+ASIC_PAUSE = 1
+CYCLE_PAUSE = 5
+
+# Поток записи логов в файл и консоль, см. setup_logging()
+_log_listener = None
+
+def stop_logging():
+    """Запись оставшихся в очереди сообщений и остановка потока логгирования"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_listener = None
 
 # Настройка логгирования
 def setup_logging(config_logging, verbose_level=0):
@@ -31,35 +77,45 @@ def setup_logging(config_logging, verbose_level=0):
     else:
         # По умолчанию выводим только ошибки, если уровень не задан в конфиге
         level_str = config_logging.get('level', 'ERROR').upper()
-        log_level_map = {
-            'DEBUG': logging.DEBUG,
-            'INFO': logging.INFO,
-            'WARNING': logging.WARNING,
-            'ERROR': logging.ERROR
-        }
-        log_level = log_level_map.get(level_str, logging.ERROR)
+        log_level = LOG_LEVELS.get(level_str, logging.ERROR)
     
-    logger.setLevel(logging.DEBUG)  # Устанавливаем максимальный уровень для логгера
+    # Уровень для файла (по умолчанию в файл пишем все логи)
+    file_level = LOG_LEVELS.get(config_logging.get('file_level', 'DEBUG').upper(), logging.DEBUG)
     
     # Формат логов
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = []
     
     # Хендлер для записи в файл
     log_file = config_logging.get('file', '/var/log/asic2mqtt.log')
     try:
         file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(logging.DEBUG)  # В файл пишем все логи
+        file_handler.setLevel(file_level)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
     except Exception as e:
         print(f"Предупреждение: Не удалось создать файл логов {log_file}: {e}")
         print("Логи будут записываться только в консоль")
+        file_level = log_level
     
     # Хендлер для вывода в консоль
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)  # Уровень для консоли зависит от настроек
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
+    
+    # Записи, которые не попадут ни в один хендлер, отбрасываются сразу в logger.*
+    logger.setLevel(min(log_level, file_level))
+    
+    # Запись в файл и консоль выполняется в отдельном потоке, чтобы не блокировать опрос
+    global _log_listener
+    stop_logging()
+    log_queue = queue.SimpleQueue() if hasattr(queue, 'SimpleQueue') else queue.Queue()
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    _log_listener.start()
+    # При завершении дописываем все записи из очереди
+    atexit.register(stop_logging)
     
     return logger
 
@@ -74,13 +130,13 @@ def load_config(logger):
     try:
         with open(config_path, 'r') as f:
             config = json.load(f)
-        logger.debug(f"Конфигурация загружена успешно из {config_path}")
+        logger.debug("Конфигурация загружена успешно из %s", config_path)
         return config
     except FileNotFoundError:
-        logger.error(f"Файл {config_path} не найден. Пожалуйста, создайте его на основе config_example.json")
+        logger.error("Файл %s не найден. Пожалуйста, создайте его на основе config_example.json", config_path)
         exit(1)
     except json.JSONDecodeError as e:
-        logger.error(f"Ошибка в формате {config_path}. Проверьте файл конфигурации: {e}")
+        logger.error("Ошибка в формате %s. Проверьте файл конфигурации: %s", config_path, e)
         exit(1)
 
 # Функция для проверки доступности хоста
@@ -95,60 +151,266 @@ def is_host_available(host, timeout=1, logger=None):
         )
         result = output.returncode == 0
         if logger:
-            logger.debug(f"Пинг хоста {host}: {'успешно' if result else 'неудачно'}")
+            logger.debug("Пинг хоста %s: %s", host, 'успешно' if result else 'неудачно')
         return result
     except Exception as e:
         if logger:
-            logger.debug(f"Ошибка при пинге хоста {host}: {e}")
+            logger.debug("Ошибка при пинге хоста %s: %s", host, e)
         return False
 
 # Функция для получения данных от Whatsminer асика
 def get_whatsminer_data(ip, token, logger=None):
     """Получение данных от Whatsminer асика"""
+    # Клиенты асиков импортируются при первом обращении, как и драйверы
+    from whatsminer import WhatsminerAPI
     try:
         if logger:
-            logger.debug(f"Запрос данных summary от Whatsminer {ip}")
+            logger.debug("Запрос данных summary от Whatsminer %s", ip)
         summary_json = WhatsminerAPI.get_read_only_info(access_token=token, cmd="summary")
         
         if logger:
-            logger.debug(f"Запрос данных edevs от Whatsminer {ip}")
+            logger.debug("Запрос данных edevs от Whatsminer %s", ip)
         edevs_json = WhatsminerAPI.get_read_only_info(access_token=token, cmd="edevs")
         
         return summary_json, edevs_json
     except Exception as e:
         if logger:
-            logger.error(f"Ошибка при получении данных от Whatsminer {ip}: {e}")
+            logger.error("Ошибка при получении данных от Whatsminer %s: %s", ip, e)
         return None, None
 
 # Функция для получения данных от Antminer асика
 def get_antminer_data(ip, username=None, password=None, logger=None):
     """Получение данных от Antminer асика"""
+    from antminer.base import BaseClient
     try:
         if logger:
-            logger.debug(f"Подключение к Antminer {ip}")
+            logger.debug("Подключение к Antminer %s", ip)
         client = BaseClient(ip)
         
         # Получаем статистику
         if logger:
-            logger.debug(f"Запрос статистики от Antminer {ip}")
+            logger.debug("Запрос статистики от Antminer %s", ip)
         stats = client.stats()
         
         # Получаем информацию об устройствах
         if logger:
-            logger.debug(f"Запрос информации об устройствах от Antminer {ip}")
+            logger.debug("Запрос информации об устройствах от Antminer %s", ip)
         devs = client.devs()
         
         return stats, devs
     except Exception as e:
         if logger:
-            logger.error(f"Ошибка при получении данных от Antminer {ip}: {e}")
+            logger.error("Ошибка при получении данных от Antminer %s: %s", ip, e)
         return None, None
 
+# Функция опроса асика через драйвер
+def poll_asic(driver, asic_name, capabilities, logger=None):
+    """Опрос асика только теми командами, которые поддерживает его прошивка"""
+    supported = capabilities.get(asic_name)
+    if supported is None:
+        # Первый контакт с асиком - определяем набор поддерживаемых команд
+        supported = driver.probe()
+        capabilities.set(asic_name, supported)
+        if logger:
+            logger.info("Асик %s поддерживает команды: %s", asic_name, ', '.join(sorted(supported)) or 'нет')
+    
+    results, rejected = driver.poll(supported)
+    if rejected:
+        # Прошивка изменилась и перестала принимать команды
+        capabilities.discard(asic_name, rejected)
+        if logger:
+            logger.warning("Асик %s отклонил команды: %s", asic_name, ', '.join(sorted(rejected)))
+    return results
+
+# Результат опроса асика; в режиме --workers передается из процесса опроса в основной.
+# driver - имя драйвера, capabilities - поддерживаемые команды, poll_ts и latency - время
+# начала опроса и его длительность в секундах, snapshot - нормализованные показатели
+# (MinerSnapshot) для сводки, истории и API
+PollResult = collections.namedtuple('PollResult', 'asic_name state driver results capabilities poll_ts latency snapshot',
+                                    defaults=(None,))
+
+class MinerPoller(object):
+    """Проверка доступности, выбор драйвера и опрос асика"""
+    
+    def __init__(self, logger, log_limiter, rate_limit=None):
+        self.logger = logger
+        self.log_limiter = log_limiter
+        self.rate_limit = rate_limit or {}
+        self.capabilities = CapabilityCache()
+    
+    def setup(self):
+        """Подготовка процесса к опросу: пределы частоты запросов к асикам"""
+        configure_rate_limits(self.rate_limit)
+    
+    def poll(self, asic_name, asic_config):
+        """Опрос асика; None - асик пропущен из-за конфигурации"""
+        logger = self.logger
+        ip = asic_config.get('ip')
+        topic = asic_config.get('topic')
+        
+        if not ip or not topic:
+            self.log_limiter.log(logger, logging.WARNING, (asic_name, 'config'),
+                                 "Неполная конфигурация для асика %s", asic_name)
+            return None
+        
+        # Проверка доступности асика
+        if not is_host_available(ip, logger=logger):
+            self.log_limiter.log(logger, logging.WARNING, (asic_name, 'unavailable'),
+                                 "Асик %s (%s) недоступен", asic_name, ip)
+            return PollResult(asic_name, STATE_OFFLINE, None, None, None, time.time(), None)
+        
+        if self.log_limiter.reset((asic_name, 'unavailable')):
+            logger.warning("Асик %s (%s) снова доступен", asic_name, ip)
+        
+        logger.info("Обработка асика %s (%s)", asic_name, ip)
+        
+        # Выбираем драйвер по полю "driver" или по имени асика
+        driver_cls = resolve_driver(asic_name, asic_config)
+        if driver_cls is None:
+            self.log_limiter.log(logger, logging.WARNING, (asic_name, 'driver'),
+                                 "Не найден драйвер для асика %s", asic_name)
+            return None
+        
+        poll_started = time.time()
+        try:
+            driver = driver_cls(ip, asic_config, logger)
+            results = poll_asic(driver, asic_name, self.capabilities, logger)
+            latency = time.time() - poll_started
+            # Показатели нормализуются один раз на опрос, все потребители используют снимок
+            snapshot = driver.snapshot(asic_name, results, poll_started, latency) if results else None
+        except Exception as e:
+            self.log_limiter.log(logger, logging.ERROR, (asic_name, 'error'),
+                                 "Ошибка при работе с %s %s: %s", driver_cls.name, asic_name, e)
+            return PollResult(asic_name, STATE_ERROR, driver_cls.name, None, None, poll_started, None)
+        
+        self.log_limiter.reset((asic_name, 'error'))
+        return PollResult(asic_name, STATE_ONLINE, driver_cls.name, results,
+                          self.capabilities.get(asic_name) or frozenset(),
+                          poll_started, latency, snapshot)
+
+def poll_cycle(poller, asics, owns=None):
+    """
+    Один цикл опроса асиков с паузой после каждого опрошенного асика.
+    owns - проверка, что асик принадлежит этому узлу кластера.
+    """
+    for asic_name, asic_config in asics.items():
+        if owns is not None and not owns(asic_name):
+            continue
+        result = poller.poll(asic_name, asic_config)
+        if result is None:
+            continue
+        yield result
+        if result.state != STATE_OFFLINE:
+            time.sleep(ASIC_PAUSE)  # Небольшая пауза между запросами к разным асикам
+
+def concurrent_poll_cycle(poller, asics, controller, owns=None):
+    """
+    Один цикл опроса с несколькими одновременными опросами; их число
+    регулирует controller (см. concurrency.py). Асики ждут своей очереди по
+    группам, и опрос запускается в группе, где есть место, поэтому
+    заполненная группа не задерживает остальные. Результаты возвращаются по
+    мере готовности.
+    """
+    def poll(group, started, asic_name, asic_config):
+        result = None
+        try:
+            result = poller.poll(asic_name, asic_config)
+            return result
+        finally:
+            if result is None or result.state == STATE_OFFLINE:
+                controller.release(group, started)
+            else:
+                controller.release(group, started, result.latency, result.state == STATE_ERROR)
+    
+    # Очереди асиков по группам в порядке конфигурации
+    pending = collections.OrderedDict()
+    for asic_name, asic_config in asics.items():
+        if owns is None or owns(asic_name):
+            pending.setdefault(controller.group_for(asic_config), collections.deque()).append(
+                (asic_name, asic_config))
+    
+    futures = set()
+    try:
+        while pending or futures:
+            # Запускаем все опросы, для которых есть место, чередуя группы
+            while pending:
+                admitted = controller.try_acquire(pending)
+                if admitted is None:
+                    break
+                group, started = admitted
+                asic_name, asic_config = pending[group].popleft()
+                if pending[group]:
+                    pending.move_to_end(group)
+                else:
+                    del pending[group]
+                futures.add(controller.executor.submit(poll, group, started, asic_name, asic_config))
+            
+            # Завершение опроса освобождает место для следующих
+            done, futures = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result is not None:
+                    yield result
+    finally:
+        # Цикл прерван (например, Ctrl+C) - еще не начатые опросы отменяются
+        for future in futures:
+            future.cancel()
+
+def run_fleet_command(args, config, asics, logger):
+    """
+    Команда exec: выполнение команды на группе асиков; код возврата 1, если
+    были ошибки или асики, не ответившие на команду
+    """
+    configure_rate_limits(config.get('rate_limit', {}))
+    runner_config = dict(config.get('commands', {}))
+    for option in ('concurrency', 'timeout', 'retries'):
+        if getattr(args, option) is not None:
+            runner_config[option] = getattr(args, option)
+    runner = FleetCommandRunner(asics, runner_config, logger)
+    
+    if not (args.all or args.miners or args.group or args.driver or args.match):
+        logger.error("Не указаны асики: --miners, --group, --driver, --match или --all")
+        return 1
+    miners = select_miners(asics, args.miners.split(',') if args.miners else None,
+                           args.group, args.driver, args.match)
+    if not miners:
+        logger.error("Нет асиков, подходящих под условия")
+        return 1
+    report = runner.run(args.command, args.params, miners)
+    
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    else:
+        for asic_name, result in sorted(report['results'].items()):
+            if result['status'] == 'failed':
+                print(f"{asic_name}: ошибка после {result['attempts']} попыток: {result['error']}")
+            elif result['status'] == 'unknown':
+                print(f"{asic_name}: нет ответа, результат неизвестен: {result['error']}")
+        print(f"Команда {report['command']}: успешно {report['succeeded']} из {report['total']}, "
+              f"результат неизвестен на {report['unknown']} за {report['elapsed']:.1f} с")
+    return 0 if report['failed'] == 0 and report['unknown'] == 0 else 1
+
 def main():
     # Парсинг аргументов командной строки
     parser = argparse.ArgumentParser(description='Сбор статистики с асиков и отправка в MQTT')
     parser.add_argument('-v', '--verbose', action='count', default=0,
                         help='Уровень детализации логов (-v, -vv, -vvv)')
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help='Число процессов опроса (по умолчанию опрос в основном процессе)')
+    subparsers = parser.add_subparsers(dest='subcommand')
+    exec_parser = subparsers.add_parser('exec', help='Выполнение команды на группе асиков')
+    exec_parser.add_argument('command', help='Команда API асика, например switchpool')
+    exec_parser.add_argument('params', nargs='*',
+                             help='Параметры команды (для Whatsminer в виде key=value)')
+    exec_parser.add_argument('--miners', help='Имена асиков через запятую')
+    exec_parser.add_argument('--group', help='Значение поля "group" в конфигурации асиков')
+    exec_parser.add_argument('--driver', help='Драйвер асиков (antminer, whatsminer, ...)')
+    exec_parser.add_argument('--match', help='Маска имен асиков, например "s19-*"')
+    exec_parser.add_argument('--all', action='store_true', help='Выполнить команду на всех асиках')
+    exec_parser.add_argument('--concurrency', type=int, help='Сколько асиков обрабатывать одновременно')
+    exec_parser.add_argument('--timeout', type=float, help='Таймаут одной попытки, секунд')
+    exec_parser.add_argument('--retries', type=int, help='Число повторов, если команда не была отправлена')
+    exec_parser.add_argument('--json', action='store_true', help='Вывести полный отчет в JSON')
     
     args = parser.parse_args()
     
@@ -162,97 +424,331 @@ def main():
     logger = setup_logging(config_logging, args.verbose)
     logger.info("Запуск скрипта сбора статистики с асиков")
     
+    # Повторяющиеся сообщения по асикам (недоступен, ошибка опроса) пишутся раз в окно
+    log_limiter = RateLimiter(config_logging.get('rate_limit_window', 60),
+                              config_logging.get('rate_limit_max_window', 3600))
+    
     # Получение конфигурации асиков
     asics = config.get('asics', {})
-    mqtt_config = config.get('mqtt', {})
     
-    # Конфигурация MQTT
-    broker_address = mqtt_config.get('broker_address', 'localhost')
-    broker_port = mqtt_config.get('broker_port', 1883)
-    mqtt_user = mqtt_config.get('username', '')
-    mqtt_password = mqtt_config.get('password', '')
+    # Драйверы из сторонних плагинов
+    load_plugins(logger)
     
-    # Создание клиента MQTT
-    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-    if mqtt_user and mqtt_password:
-        client.username_pw_set(mqtt_user, mqtt_password)
+    if args.subcommand == 'exec':
+        exit(run_fleet_command(args, config, asics, logger))
     
-    # Подключение к MQTT Брокеру
-    try:
-        client.connect(broker_address, broker_port, 60)
-        logger.info(f"Подключено к MQTT брокеру {broker_address}:{broker_port}")
-    except Exception as e:
-        logger.error(f"Ошибка подключения к MQTT брокеру: {e}")
+    # Опрос асиков; в режиме --workers каждый процесс опроса получает свою копию
+    poller = MinerPoller(logger, log_limiter, config.get('rate_limit', {}))
+    poller.setup()
+    
+    # Состояние опроса с прошлого запуска: поддерживаемые команды асиков и
+    # порядок первого цикла (сначала асики, которые были доступны)
+    state_config = config.get('state', {})
+    warm_state = None
+    first_cycle = asics
+    if state_config.get('enabled'):
+        warm_state = WarmState(state_config, logger)
+        if warm_state.load():
+            restored = warm_state.restore(poller.capabilities, asics)
+            first_cycle = warm_state.order(asics)
+            logger.info("Восстановлено состояние асиков из %s, команды известны для %d асиков",
+                        warm_state.path, restored)
+    
+    # Один брокер (объект) или несколько (список); у каждого свой клиент и очередь.
+    # Срок жизни телеметрии в MQTT v5 по умолчанию отсчитывается от длительности цикла
+    publisher = BrokerFanout(config.get('mqtt', {}), logger, interval=len(asics) * ASIC_PAUSE + CYCLE_PAUSE)
+    
+    # Подписки восстанавливаются при каждом переподключении к брокерам
+    subscribers = []
+    
+    # MQTT discovery для Home Assistant
+    ha_config = config.get('homeassistant', {})
+    discovery = None
+    if ha_config.get('enabled'):
+        discovery = DiscoveryPublisher(publisher, ha_config, logger)
+        subscribers.append(discovery.subscribe)
+    
+    # Кластер: асики делятся между экземплярами asic2mqtt, объявляющими себя через MQTT
+    cluster_config = config.get('cluster', {})
+    cluster = None
+    if cluster_config.get('enabled'):
+        if args.workers > 0:
+            logger.error("Режим кластера не поддерживается вместе с --workers")
+            exit(1)
+        cluster = ClusterMembership(cluster_config, logger)
+        subscribers.append(cluster.subscribe)
+        # При обрыве соединения брокер сам удалит объявление узла
+        publisher.will_set(cluster.node_topic(), '', retain=True)
+        logger.info("Узел кластера %s, аренда %s секунд", cluster.node_id, cluster.lease)
+    
+    # История метрик в памяти с запросами через MQTT
+    history_config = config.get('history', {})
+    history = None
+    if history_config.get('enabled'):
+        history = HistoryStore(history_config, asics, logger, owns=cluster.owns if cluster else None)
+        subscribers.append(history.subscribe)
+        logger.info("История метрик: %d байт на асик", history.bytes_per_miner())
+    
+    # Последние результаты опроса и внеплановые опросы для API и запросов через MQTT
+    api_config = config.get('api', {})
+    refresh_config = config.get('refresh', {})
+    cache = None
+    if api_config.get('enabled') or refresh_config.get('enabled'):
+        def refresh_poll(asic_name):
+            # Асики других узлов кластера опрашивают их владельцы
+            if cluster and not cluster.owns(asic_name):
+                return None
+            return poller.poll(asic_name, asics[asic_name])
+        
+        # Один интервал между внеплановыми опросами асика для API и запросов через MQTT
+        cache = MinerCache(api_config.get('max_age', DEFAULT_MAX_AGE), refresh_poll, logger,
+                           refresh_config.get('min_interval', DEFAULT_MIN_INTERVAL))
+    
+    # Внеплановый опрос асика по запросу в {topic}/refresh
+    refresher = None
+    if refresh_config.get('enabled'):
+        refresher = RefreshRequests(refresh_config, asics, cache, logger, owns=cluster.owns if cluster else None)
+        subscribers.append(refresher.subscribe)
+    
+    # Выполнение команд на группе асиков по запросу в {topic}/run
+    commands_config = config.get('commands', {})
+    if commands_config.get('enabled'):
+        command_requests = CommandRequests(commands_config, FleetCommandRunner(asics, commands_config, logger), logger,
+                                           owns=cluster.owns if cluster else None,
+                                           node_id=cluster.node_id if cluster else None)
+        subscribers.append(command_requests.subscribe)
+    
+    # Локальный API последних результатов опроса для сторонних скриптов
+    api_server = None
+    if api_config.get('enabled'):
+        try:
+            api_server = ApiServer(api_config, SnapshotApi(cache, asics, logger), logger)
+        except OSError as e:
+            logger.error("Не удалось запустить API асиков: %s", e)
+            exit(1)
+        api_server.start()
+    
+    # Подключение к MQTT брокерам; недоступные брокеры переподключаются в фоне
+    if not publisher.start(subscribers):
+        logger.error("Не удалось подключиться ни к одному MQTT брокеру")
+        publisher.stop()
+        if api_server:
+            api_server.stop()
         exit(1)
+    if cluster:
+        cluster.start(publisher)
+    
+    # Публикация отдельных метрик в собственные подтопики
+    flatten_config = config.get('flatten', {})
+    flatten_enabled = flatten_config.get('enabled', False)
+    
+    # Обнаружение аномалий по свежим значениям метрик
+    anomaly_config = config.get('anomaly', {})
+    detector = AnomalyDetector(anomaly_config, logger) if anomaly_config.get('enabled') else None
+    
+    # Метрики извлекаются один раз на опрос и для публикации, и для детектора.
+    # Метрики производных данных драйвера (цепи Antminer) не входят в JSON-топики,
+    # поэтому публикуются и без flatten
+    extractor = MetricExtractor(flatten_config, logger)
+    
+    # Отбор полей перед сериализацией и формат сообщений по подтопикам
+    encoder = PayloadEncoder(config.get('encoding', {}), logger)
+    projector = PayloadProjector(config.get('projection', {}), logger, encoder)
+    
+    # Сводка по всему парку асиков
+    fleet_config = config.get('fleet', {})
+    # В режиме кластера у каждого узла свои топики сводки и снимка, иначе
+    # узлы перезаписывали бы retained-сообщения друг друга
+    node_id = cluster.node_id if cluster else None
+    fleet = FleetAggregator(fleet_config, logger, node_id) if fleet_config.get('enabled') else None
+    
+    # Снимок всего парка одним сжатым сообщением
+    snapshot_config = config.get('snapshot', {})
+    snapshot = SnapshotBatcher(snapshot_config, logger, node_id) if snapshot_config.get('enabled') else None
+    per_miner_topics = snapshot is None or snapshot.per_miner
+    
+    # Экземпляры драйверов для обработки результатов опроса
+    drivers = {}
+    
+    def process(result, requests=()):
+        """
+        Публикация и учет результата опроса асика; requests - запросы
+        внепланового опроса, идентификаторы которых передаются в MQTT v5
+        """
+        asic_name = result.asic_name
+        if cache:
+            cache.update(result)
+        if warm_state:
+            warm_state.update(result, asics[asic_name])
+        if result.state != STATE_ONLINE:
+            if fleet:
+                fleet.set_state(asic_name, result.state)
+            return
+        
+        asic_config = asics[asic_name]
+        topic = asic_config['topic']
+        driver = drivers.get(asic_name)
+        if driver is None or driver.name != result.driver:
+            driver = drivers[asic_name] = get_driver(result.driver)(asic_config['ip'], asic_config, logger)
+        results = result.results
+        
+        try:
+            # Время опроса и задержка ответа передаются в свойствах сообщений MQTT v5
+            poll_properties = (('poll_ts', int(result.poll_ts)),
+                               ('latency_ms', int(result.latency * 1000)))
+            poll_properties += tuple(('correlation_id', request.id) for request in requests
+                                     if request.id is not None)
+            
+            if per_miner_topics:
+                for command, data in results.items():
+                    subtopic = driver.topic_for(command)
+                    encoded = projector.encode(subtopic, data)
+                    properties = poll_properties
+                    if encoded.content_encoding:
+                        properties += (('content_encoding', encoded.content_encoding),)
+                    publisher.publish(f"{topic}/{subtopic}{encoded.suffix}", encoded.payload,
+                                      user_properties=properties, content_type=encoded.content_type)
+                    logger.debug("Отправлены данные %s для %s", command, asic_name)
+            
+            if snapshot and results:
+                snapshot.add(asic_name, topic, dict(
+                    (driver.topic_for(command), projector.project(driver.topic_for(command), data))
+                    for command, data in results.items()
+                ), result.poll_ts)
+            
+            derived = {}
+            metric_values = ()
+            if (flatten_enabled or detector) and results:
+                metric_values = extractor.extract(driver, results, derived=derived)
+            
+            published = metric_values
+            if not flatten_enabled and results:
+                published = extractor.extract(driver, results, derived_only=True, derived=derived)
+            for subtopic, value in published:
+                publisher.publish(f"{topic}/{subtopic}", str(value), user_properties=poll_properties)
+            
+            if detector:
+                for event in detector.update(asic_name, metric_values):
+                    publisher.publish(f"{topic}/alerts", json.dumps(event))
+            
+            if discovery and results:
+                discovery.update(asic_name, driver, topic, result.capabilities, results)
+            
+            # Нормализованные показатели для сводки и истории
+            miner_snapshot = result.snapshot
+            
+            if fleet:
+                if miner_snapshot is not None:
+                    fleet.update(asic_name, miner_snapshot)
+                else:
+                    fleet.set_state(asic_name, STATE_ERROR)
+            
+            if history and miner_snapshot is not None:
+                history.record(asic_name, miner_snapshot)
+            
+            log_limiter.reset((asic_name, 'publish'))
+        except Exception as e:
+            log_limiter.log(logger, logging.ERROR, (asic_name, 'publish'),
+                            "Ошибка при обработке данных %s %s: %s", driver.name, asic_name, e)
+            if fleet:
+                fleet.set_state(asic_name, STATE_ERROR)
+    
+    def publish_due():
+        # Результаты внеплановых опросов публикуются как плановые, затем
+        # публикуются ответы на запросы
+        if cache:
+            for asic_name, result, requests in cache.drain():
+                if result is not None:
+                    process(result, requests)
+                if refresher and requests:
+                    refresher.respond(publisher, result, requests)
+        if fleet:
+            fleet.publish_due(publisher)
+        if snapshot:
+            snapshot.publish_due(publisher)
+    
+    def end_cycle():
+        if controller:
+            controller.report()
+        if snapshot:
+            snapshot.publish_due(publisher, cycle_end=True)
+        projector.report()
+        # Состояние сохраняется каждый цикл: процесс могут остановить без штатного завершения
+        if warm_state:
+            warm_state.save()
+    
+    # Одновременный опрос нескольких асиков с адаптивным пределом
+    concurrency_config = config.get('concurrency', {})
+    controller = None
+    if concurrency_config.get('enabled'):
+        if args.workers > 0:
+            logger.warning("Одновременный опрос не используется вместе с --workers")
+        else:
+            controller = ConcurrencyController(concurrency_config, logger)
+    
+    # Процессы опроса для больших парков
+    pool = None
+    if args.workers > 0:
+        pool = WorkerPool(first_cycle, args.workers, poller, poll_cycle, logger, CYCLE_PAUSE)
+        pool.start()
     
     # Цикл для публикации сообщений
     try:
-        while True:
-            # Обработка каждого асика из конфигурации
-            for asic_name, asic_config in asics.items():
-                ip = asic_config.get('ip')
-                topic = asic_config.get('topic')
-                username = asic_config.get('username')
-                password = asic_config.get('password')
-                
-                if not ip or not topic:
-                    logger.warning(f"Неполная конфигурация для асика {asic_name}")
-                    continue
-                
-                # Проверка доступности асика
-                if not is_host_available(ip, logger=logger):
-                    logger.warning(f"Асик {asic_name} ({ip}) недоступен")
-                    continue
-                
-                logger.info(f"Обработка асика {asic_name} ({ip})")
+        if pool:
+            # Результаты приходят из процессов опроса по мере готовности
+            for result in pool.results():
+                if result is CYCLE_END:
+                    end_cycle()
+                    logger.info("Цикл завершен во всех процессах опроса")
+                elif result is not None:
+                    process(result)
+                publish_due()
+        else:
+            cycle_asics = first_cycle
+            while True:
+                publish_due()
                 
-                # Определяем тип асика по имени или другим признакам
-                if 'whatsminer' in asic_name.lower():
-                    # Работа с Whatsminer асиком
-                    try:
-                        token = WhatsminerAccessToken(ip_address=ip)
-                        summary_data, edevs_data = get_whatsminer_data(ip, token, logger)
-                        
-                        if summary_data:
-                            message = json.dumps(summary_data)
-                            client.publish(f"{topic}/summary", message)
-                            logger.debug(f"Отправлены данные summary для {asic_name}")
-                        
-                        if edevs_data:
-                            message = json.dumps(edevs_data)
-                            client.publish(f"{topic}/edevs", message)
-                            logger.debug(f"Отправлены данные edevs для {asic_name}")
-                    except Exception as e:
-                        logger.error(f"Ошибка при работе с Whatsminer {asic_name}: {e}")
+                # Обработка каждого асика из конфигурации
+                owns = cluster.owns if cluster else None
+                if controller:
+                    results = concurrent_poll_cycle(poller, cycle_asics, controller, owns)
+                else:
+                    results = poll_cycle(poller, cycle_asics, owns)
+                for result in results:
+                    process(result)
+                    publish_due()
+                cycle_asics = asics
                 
-                elif 'antminer' in asic_name.lower():
-                    # Работа с Antminer асиком
-                    try:
-                        stats_data, devs_data = get_antminer_data(ip, username, password, logger)
-                        
-                        if stats_data:
-                            message = json.dumps(stats_data)
-                            client.publish(f"{topic}/stats", message)
-                            logger.debug(f"Отправлены данные stats для {asic_name}")
-                        
-                        if devs_data:
-                            message = json.dumps(devs_data)
-                            client.publish(f"{topic}/devs", message)
-                            logger.debug(f"Отправлены данные devs для {asic_name}")
-                    except Exception as e:
-                        logger.error(f"Ошибка при работе с Antminer {asic_name}: {e}")
+                # Асики, перешедшие к другим узлам кластера, исключаются из сводки
+                if cluster and fleet:
+                    for asic_name in asics:
+                        if not cluster.owns(asic_name):
+                            fleet.forget(asic_name)
                 
-                time.sleep(1)  # Небольшая пауза между запросами к разным асикам
-            
-            logger.info("Цикл завершен, ожидание 5 секунд...")
-            time.sleep(5)  # Ожидание 5 секунд перед следующим циклом
+                end_cycle()
+                logger.info("Цикл завершен, ожидание %d секунд...", CYCLE_PAUSE)
+                time.sleep(CYCLE_PAUSE)  # Ожидание перед следующим циклом
             
     except KeyboardInterrupt:
         logger.info("Скрипт остановлен пользователем.")
     
-    # Отключение от MQTT Брокера
-    client.disconnect()
-    logger.info("Отключено от MQTT брокера")
+    if api_server:
+        api_server.stop()
+    if pool:
+        pool.stop()
+    if controller:
+        controller.shutdown()
+    
+    if cluster:
+        cluster.leave(publisher)
+    
+    if warm_state:
+        warm_state.save()
+    
+    # Отправка оставшихся сообщений и отключение от MQTT брокеров
+    publisher.stop()
+    logger.info("Отключено от MQTT брокеров")
+    stop_logging()
 
 if __name__ == "__main__":
     main()
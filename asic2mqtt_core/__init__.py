@@ -0,0 +1,4 @@
+"""
+Внутренние компоненты asic2mqtt: драйверы асиков и вспомогательные механизмы
+основного цикла опроса
+"""
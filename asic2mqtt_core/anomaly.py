@@ -0,0 +1,142 @@
+"""
+Потоковое обнаружение аномалий в метриках асиков
+
+Для каждого ряда (метрика асика, цепи или вентилятора) поддерживается
+экспоненциально взвешенное среднее и дисперсия (EWMA/EWMVar) - состояние
+фиксированного размера, которое обновляется за O(1) на каждом опросе.
+Значение сравнивается с базовой линией до ее обновления, поэтому проблема
+обнаруживается уже на следующем опросе после ее появления.
+
+Событие публикуется только при переходе ряда в аномальное состояние
+("alert") и при возврате к норме ("resolved"). Пока ряд в аномальном
+состоянии, базовая линия не обновляется, чтобы не привыкать к сбою.
+"""
+
+import math
+import time
+
+from asic2mqtt_core.drivers import to_float
+
+KIND_DROP = 'drop'
+KIND_SPIKE = 'spike'
+KIND_STALL = 'stall'
+
+# Имя метрики (первый сегмент подтопика из metrics.py) -> тип проверки
+DEFAULT_RULES = {
+    'hashrate': KIND_DROP,
+    'chain_hashrate': KIND_DROP,
+    'temperature': KIND_SPIKE,
+    'chain_temp': KIND_SPIKE,
+    'fan': KIND_STALL,
+    'fan_in': KIND_STALL,
+    'fan_out': KIND_STALL,
+}
+
+DEFAULT_ALPHA = 0.1
+# Отклонение в стандартных отклонениях, после которого значение аномально
+DEFAULT_THRESHOLD = 4.0
+# Число значений для построения базовой линии до первых проверок
+DEFAULT_WARMUP = 10
+# Минимальное относительное падение хэшрейта
+DEFAULT_MIN_DROP = 0.2
+# Минимальный рост температуры, °C
+DEFAULT_MIN_RISE = 5.0
+# Обороты, ниже которых вентилятор считается остановившимся
+DEFAULT_STALL_RPM = 300
+
+
+class Baseline(object):
+    """EWMA и EWMVar одного ряда"""
+
+    __slots__ = ('mean', 'var', 'count', 'active')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+        self.active = False
+
+    def update(self, value, alpha):
+        if self.count == 0:
+            self.mean = value
+        else:
+            delta = value - self.mean
+            self.mean += alpha * delta
+            self.var = (1 - alpha) * (self.var + alpha * delta * delta)
+        self.count += 1
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+
+class AnomalyDetector(object):
+    """Обнаружение падения хэшрейта, скачков температуры и остановки вентиляторов"""
+
+    def __init__(self, config=None, logger=None):
+        config = config or {}
+        self.logger = logger
+        self.rules = dict(DEFAULT_RULES)
+        self.rules.update(config.get('rules', {}))
+        self.alpha = config.get('alpha', DEFAULT_ALPHA)
+        self.threshold = config.get('threshold', DEFAULT_THRESHOLD)
+        self.warmup = config.get('warmup', DEFAULT_WARMUP)
+        self.min_drop = config.get('min_drop', DEFAULT_MIN_DROP)
+        self.min_rise = config.get('min_rise', DEFAULT_MIN_RISE)
+        self.stall_rpm = config.get('stall_rpm', DEFAULT_STALL_RPM)
+        # (asic_name, подтопик метрики) -> Baseline
+        self._baselines = {}
+
+    def is_anomalous(self, kind, value, baseline):
+        if kind == KIND_STALL:
+            # Остановку вентилятора видно сразу, без базовой линии
+            return value < self.stall_rpm and baseline.mean >= self.stall_rpm
+        if baseline.count < self.warmup:
+            return False
+        deviation = self.threshold * baseline.std
+        if kind == KIND_DROP:
+            return value < baseline.mean - deviation and value < baseline.mean * (1 - self.min_drop)
+        if kind == KIND_SPIKE:
+            return value > baseline.mean + deviation and value - baseline.mean > self.min_rise
+        return False
+
+    def update(self, asic_name, metric_values, now=None):
+        """
+        Обработка свежих значений метрик асика.
+
+        metric_values - список (подтопик, значение) из MetricExtractor.
+        Возвращает список событий для публикации.
+        """
+        now = time.time() if now is None else now
+        events = []
+        for subtopic, raw_value in metric_values:
+            kind = self.rules.get(subtopic.split('/', 1)[0])
+            if kind is None:
+                continue
+            value = to_float(raw_value)
+            if value is None:
+                continue
+
+            key = (asic_name, subtopic)
+            baseline = self._baselines.get(key)
+            if baseline is None:
+                baseline = self._baselines[key] = Baseline()
+
+            anomalous = self.is_anomalous(kind, value, baseline)
+            if anomalous != baseline.active:
+                baseline.active = anomalous
+                events.append({
+                    'series': subtopic,
+                    'kind': kind,
+                    'state': 'alert' if anomalous else 'resolved',
+                    'value': value,
+                    'baseline': round(baseline.mean, 3),
+                    'std': round(baseline.std, 3),
+                    'ts': int(now),
+                })
+                if self.logger:
+                    self.logger.warning("Асик %s: %s %s (%s: %.2f, норма %.2f)", asic_name, subtopic,
+                                        'аномалия' if anomalous else 'в норме', kind, value, baseline.mean)
+            if not anomalous:
+                baseline.update(value, self.alpha)
+        return events
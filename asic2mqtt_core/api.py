@@ -0,0 +1,309 @@
+"""
+Локальный API последних результатов опроса асиков
+
+Сторонние скрипты и страницы получают данные асиков у asic2mqtt, а не
+открывают собственные соединения к их API. Сервер HTTP (на TCP-порту или
+Unix-сокете) отдает последние результаты команд (stats, devs, summary,
+edevs, ...) каждого асика вместе с их возрастом:
+
+    GET /miners                   - список асиков, состояние, возраст данных и
+                                    нормализованные показатели (MinerSnapshot)
+    GET /miners/{имя}             - показатели и все команды асика
+    GET /miners/{имя}/{команда}   - одна команда
+
+Если данные старше max_age секунд (можно задать параметром запроса
+``?max_age=``), асик опрашивается заново, но не чаще чем раз в
+min_interval секунд после предыдущего опроса (планового или
+внепланового), иначе отдаются имеющиеся данные. Одновременные запросы
+устаревшей записи ждут один общий опрос. Результаты таких опросов
+публикуются в MQTT основным циклом так же, как результаты плановых опросов.
+"""
+
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from asic2mqtt_core.fleet import STATE_ONLINE
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8199
+DEFAULT_MAX_AGE = 60
+
+
+class _Flight(object):
+    """Внеплановый опрос, результат которого ждут все запросившие его"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.requests = []
+
+
+class MinerCache(object):
+    """
+    Последние результаты опроса асиков. poll(asic_name) - внеплановый опрос,
+    возвращает PollResult или None, если асик опрашивать нельзя.
+    """
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE, poll=None, logger=None, min_interval=0):
+        self.max_age = max_age
+        self.logger = logger
+        self.min_interval = min_interval
+        self._poll = poll
+        # имя асика -> состояние, драйвер, результаты команд и время опросов
+        self._entries = {}
+        self._flights = {}
+        # имя асика -> время начала последнего внепланового опроса
+        self._last = {}
+        self._lock = threading.Lock()
+        # Результаты внеплановых опросов для публикации основным циклом
+        self.refreshed = queue.Queue()
+
+    def update(self, result):
+        """Учет результата опроса; результаты недоступного асика сохраняются"""
+        with self._lock:
+            entry = self._entries.get(result.asic_name)
+            if entry is None:
+                entry = self._entries[result.asic_name] = {'results': {}, 'poll_ts': None, 'driver': None,
+                                                           'snapshot': None}
+            entry['state'] = result.state
+            entry['checked'] = result.poll_ts
+            if result.state == STATE_ONLINE and result.results is not None:
+                entry['results'] = result.results
+                entry['poll_ts'] = result.poll_ts
+                entry['driver'] = result.driver
+                entry['snapshot'] = result.snapshot
+
+    def get(self, asic_name, max_age=None, now=None):
+        """Запись асика; устаревшая или отсутствующая обновляется опросом"""
+        max_age = self.max_age if max_age is None else max_age
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(asic_name)
+        if entry is None or now - entry['checked'] >= max_age:
+            if self.admit(asic_name, now) is None:
+                self.refresh(asic_name)
+                with self._lock:
+                    entry = self._entries.get(asic_name)
+        return dict(entry) if entry is not None else None
+
+    def entries(self):
+        with self._lock:
+            return dict((asic_name, dict(entry)) for asic_name, entry in self._entries.items())
+
+    def admit(self, asic_name, now=None):
+        """
+        Разрешение внепланового опроса асика для API и запросов через MQTT.
+        Возвращает None, если опрос можно начать (он сразу отмечается) или к
+        идущему опросу можно присоединиться, иначе сколько секунд осталось до
+        разрешенного опроса. Интервал отсчитывается и от планового опроса.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            # К уже идущему опросу можно присоединиться без ограничения
+            if asic_name in self._flights:
+                return None
+            entry = self._entries.get(asic_name)
+            last = max(self._last.get(asic_name, 0), entry['checked'] if entry else 0)
+            if last and now - last < self.min_interval:
+                return self.min_interval - (now - last)
+            self._last[asic_name] = now
+        return None
+
+    def refreshing(self, asic_name):
+        """Идет ли сейчас внеплановый опрос асика"""
+        with self._lock:
+            return asic_name in self._flights
+
+    def refresh(self, asic_name, request=None):
+        """
+        Внеплановый опрос асика. Если опрос этого асика уже идет, вызов ждет
+        его завершения и получает тот же результат. request - запрос, на
+        который нужно ответить после публикации результата (см. refresh.py).
+        """
+        if self._poll is None:
+            return None
+        with self._lock:
+            flight = self._flights.get(asic_name)
+            leader = flight is None
+            if leader:
+                flight = self._flights[asic_name] = _Flight()
+            if request is not None:
+                flight.requests.append(request)
+        if not leader:
+            flight.done.wait()
+            return flight.result
+
+        try:
+            flight.result = self._poll(asic_name)
+            if flight.result is not None:
+                self.update(flight.result)
+        except Exception as e:
+            if self.logger:
+                self.logger.error("Ошибка внепланового опроса %s: %s", asic_name, e)
+        finally:
+            with self._lock:
+                self._flights.pop(asic_name, None)
+                requests = tuple(flight.requests)
+            if flight.result is not None or requests:
+                self.refreshed.put((asic_name, flight.result, requests))
+            flight.done.set()
+        return flight.result
+
+    def drain(self):
+        """
+        Внеплановые опросы, завершенные с прошлого вызова: (имя асика,
+        PollResult или None, запросы)
+        """
+        while True:
+            try:
+                yield self.refreshed.get_nowait()
+            except queue.Empty:
+                return
+
+
+def _age(timestamp, now):
+    return None if timestamp is None else round(now - timestamp, 3)
+
+
+class SnapshotApi(object):
+    """Обработка запросов API; сервер только передает путь и отдает ответ"""
+
+    def __init__(self, cache, asics, logger=None):
+        self.cache = cache
+        self.asics = asics
+        self.logger = logger
+
+    def handle(self, path, now=None):
+        """Ответ на GET-запрос: (HTTP-статус, объект для JSON)"""
+        url = urlsplit(path)
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+        query = parse_qs(url.query)
+        max_age = None
+        if 'max_age' in query:
+            try:
+                max_age = float(query['max_age'][0])
+            except ValueError:
+                return 400, {'error': 'max_age должен быть числом'}
+
+        if parts == ['miners']:
+            now = time.time() if now is None else now
+            entries = self.cache.entries()
+            miners = []
+            for asic_name in self.asics:
+                entry = entries.get(asic_name, {})
+                miner = {
+                    'name': asic_name,
+                    'state': entry.get('state'),
+                    'poll_ts': entry.get('poll_ts'),
+                    'age': _age(entry.get('poll_ts'), now),
+                }
+                # Нормализованные показатели (хэшрейт, температура, ...) из MinerSnapshot
+                if entry.get('snapshot') is not None:
+                    miner.update(entry['snapshot'].values())
+                miners.append(miner)
+            return 200, {'miners': miners}
+
+        if len(parts) not in (2, 3) or parts[0] != 'miners':
+            return 404, {'error': 'Неизвестный путь'}
+        asic_name = parts[1]
+        if asic_name not in self.asics:
+            return 404, {'error': 'Асик {} не найден'.format(asic_name)}
+
+        entry = self.cache.get(asic_name, max_age)
+        now = time.time() if now is None else now
+        if entry is None:
+            return 503, {'error': 'Нет данных асика {}'.format(asic_name)}
+        response = {
+            'name': asic_name,
+            'state': entry['state'],
+            'driver': entry['driver'],
+            'poll_ts': entry['poll_ts'],
+            'age': _age(entry['poll_ts'], now),
+        }
+        if len(parts) == 2:
+            if entry['snapshot'] is not None:
+                response['snapshot'] = entry['snapshot'].as_dict()
+            response['commands'] = entry['results']
+            return 200, response
+
+        command = parts[2]
+        if command not in entry['results']:
+            return 404, {'error': 'Нет данных команды {} асика {}'.format(command, asic_name)}
+        response['command'] = command
+        response['data'] = entry['results'][command]
+        return 200, response
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'asic2mqtt'
+
+    def do_GET(self):
+        api = self.server.api
+        try:
+            status, body = api.handle(self.path)
+        except Exception as e:
+            if api.logger:
+                api.logger.error("Ошибка обработки запроса API %s: %s", self.path, e)
+            status, body = 500, {'error': str(e)}
+        payload = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.api.logger:
+            self.server.api.logger.debug("API: " + format, *args)
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def get_request(self):
+            # У Unix-сокета нет адреса клиента, BaseHTTPRequestHandler ждет кортеж
+            request, _ = super(_UnixHTTPServer, self).get_request()
+            return request, ('local', 0)
+
+
+class ApiServer(object):
+    """HTTP-сервер API в фоновом потоке: TCP (host, port) или Unix-сокет (socket)"""
+
+    def __init__(self, config, api, logger=None):
+        self.logger = logger
+        self.socket_path = config.get('socket')
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                # Сокет остался от прошлого запуска
+                os.unlink(self.socket_path)
+            self.server = _UnixHTTPServer(self.socket_path, _Handler)
+            self.address = self.socket_path
+        else:
+            host = config.get('host', DEFAULT_HOST)
+            port = config.get('port', DEFAULT_PORT)
+            self.server = ThreadingHTTPServer((host, port), _Handler)
+            self.server.daemon_threads = True
+            self.address = '{}:{}'.format(host, self.server.server_address[1])
+        self.server.api = api
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='asic2mqtt-api', daemon=True)
+        self._thread.start()
+        if self.logger:
+            self.logger.info("API асиков доступен на %s", self.address)
+
+    def stop(self):
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread = None
+        self.server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
@@ -0,0 +1,212 @@
+"""
+Публикация в несколько MQTT брокеров
+
+Каждый брокер из конфигурации получает собственный клиент paho с сетевым
+потоком, ограниченную очередь исходящих сообщений и поток, который
+разбирает эту очередь. Цикл опроса только кладет сообщение в очереди
+брокеров, поэтому медленный или недоступный брокер не задерживает ни опрос,
+ни публикацию в остальные брокеры: при переполнении его очереди новые
+сообщения для него отбрасываются.
+
+Для каждого брокера можно задать префикс топиков и фильтры (MQTT-маски),
+определяющие, какие сообщения ему отправляются. Префикс действует и на
+подписки: подписчики (история, внеплановый опрос, команды, кластер)
+получают не клиент paho, а BrokerSession, которая добавляет префикс к
+подпискам, убирает его из топиков входящих сообщений и отправляет ответы
+через очередь брокера.
+"""
+
+import logging
+import queue
+import threading
+
+from paho.mqtt.client import topic_matches_sub
+
+from asic2mqtt_core.logs import RateLimiter
+from asic2mqtt_core.publisher import Publisher, create_client
+
+DEFAULT_PORT = 1883
+DEFAULT_KEEPALIVE = 60
+DEFAULT_QUEUE_SIZE = 10000
+# Сколько ждать отправки оставшихся сообщений при остановке, секунд
+STOP_TIMEOUT = 5
+
+
+def broker_configs(mqtt_config):
+    """Список конфигураций брокеров: секция mqtt - объект или список объектов"""
+    if isinstance(mqtt_config, list):
+        return mqtt_config
+    return [mqtt_config]
+
+
+class PrefixedMessage(object):
+    """Входящее сообщение paho с топиком без префикса брокера"""
+
+    def __init__(self, message, topic):
+        self._message = message
+        self.topic = topic
+
+    def __getattr__(self, name):
+        return getattr(self._message, name)
+
+
+class BrokerSession(object):
+    """
+    Клиент брокера для подписчиков: методы subscribe(),
+    message_callback_add() и publish() клиента paho, но с топиками без
+    префикса брокера.
+    """
+
+    def __init__(self, target):
+        self.target = target
+
+    def subscribe(self, topic, qos=0):
+        return self.target.client.subscribe(self.target.prefix + topic, qos)
+
+    def message_callback_add(self, sub, callback):
+        prefix = self.target.prefix
+
+        def on_message(client, userdata, message):
+            if prefix:
+                message = PrefixedMessage(message, message.topic[len(prefix):])
+            callback(self, userdata, message)
+
+        self.target.client.message_callback_add(prefix + sub, on_message)
+
+    def publish(self, topic, payload=None, qos=0, retain=False, **kwargs):
+        """Ответ на запрос уходит в тот брокер, откуда пришел запрос, без учета фильтров"""
+        return self.target.enqueue(topic, payload, qos, retain, **kwargs)
+
+
+class BrokerTarget(object):
+    """Один брокер: клиент, очередь исходящих сообщений и поток публикации"""
+
+    def __init__(self, config, logger=None, interval=None):
+        self.logger = logger
+        self.address = config.get('broker_address', 'localhost')
+        self.port = config.get('broker_port', DEFAULT_PORT)
+        self.name = config.get('name') or '{}:{}'.format(self.address, self.port)
+        self.prefix = config.get('prefix', '')
+        self.filters = tuple(config.get('topics', ('#',)))
+        self.client = create_client(config)
+        self.publisher = Publisher(self.client, config, logger, interval)
+        self.queue = queue.Queue(config.get('queue_size', DEFAULT_QUEUE_SIZE))
+        self.dropped = 0
+        self._limiter = RateLimiter()
+        # топик -> проходит ли он фильтры; набор топиков постоянный
+        self._accepted = {}
+        self._thread = None
+        self.session = BrokerSession(self)
+
+    def accepts(self, topic):
+        accepted = self._accepted.get(topic)
+        if accepted is None:
+            accepted = any(topic_matches_sub(pattern, topic) for pattern in self.filters)
+            self._accepted[topic] = accepted
+        return accepted
+
+    def start(self, subscribers=()):
+        """Подключение к брокеру и запуск сетевого потока и потока публикации"""
+        def on_connect(client, userdata, flags, reason_code, properties):
+            self.publisher.on_connect(properties)
+            for subscribe in subscribers:
+                subscribe(self.session)
+
+        def on_disconnect(client, userdata, flags, reason_code, properties):
+            self.publisher.on_disconnect()
+
+        self.client.on_connect = on_connect
+        self.client.on_disconnect = on_disconnect
+
+        connected = True
+        try:
+            self.client.connect(self.address, self.port, DEFAULT_KEEPALIVE)
+            if self.logger:
+                self.logger.info("Подключено к MQTT брокеру %s", self.name)
+        except Exception as e:
+            connected = False
+            if self.logger:
+                self.logger.error("Ошибка подключения к MQTT брокеру %s: %s", self.name, e)
+            # Сетевой поток paho будет переподключаться в фоне
+            self.client.connect_async(self.address, self.port, DEFAULT_KEEPALIVE)
+
+        self.client.loop_start()
+        self._thread = threading.Thread(target=self._run, name='mqtt-{}'.format(self.name), daemon=True)
+        self._thread.start()
+        return connected
+
+    def publish(self, topic, payload=None, qos=0, retain=False, **kwargs):
+        """Постановка сообщения в очередь брокера; False - отфильтровано или очередь полна"""
+        if not self.accepts(topic):
+            return False
+        return self.enqueue(topic, payload, qos, retain, **kwargs)
+
+    def enqueue(self, topic, payload=None, qos=0, retain=False, **kwargs):
+        """Постановка сообщения в очередь без проверки фильтров; топик - без префикса"""
+        try:
+            self.queue.put_nowait((self.prefix + topic, payload, qos, retain, kwargs))
+        except queue.Full:
+            self.dropped += 1
+            if self.logger:
+                self._limiter.log(self.logger, logging.WARNING, 'overflow',
+                                  "Очередь MQTT брокера %s переполнена, сообщения отбрасываются", self.name)
+            return False
+        self._limiter.reset('overflow')
+        return True
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            topic, payload, qos, retain, kwargs = item
+            try:
+                self.publisher.publish(topic, payload, qos, retain, **kwargs)
+            except Exception as e:
+                if self.logger:
+                    self._limiter.log(self.logger, logging.ERROR, 'publish',
+                                      "Ошибка публикации в MQTT брокер %s: %s", self.name, e)
+
+    def stop(self):
+        """Отправка оставшихся сообщений и отключение от брокера"""
+        if self._thread is not None:
+            try:
+                self.queue.put(None, timeout=STOP_TIMEOUT)
+            except queue.Full:
+                pass
+            self._thread.join(STOP_TIMEOUT)
+            self._thread = None
+        self.client.disconnect()
+        self.client.loop_stop()
+
+
+class BrokerFanout(object):
+    """
+    Публикация одного и того же сообщения во все брокеры.
+
+    Метод publish() совместим с клиентом paho, поэтому объект передается
+    вместо клиента в DiscoveryPublisher, FleetAggregator и SnapshotBatcher.
+    """
+
+    def __init__(self, mqtt_config, logger=None, interval=None):
+        self.logger = logger
+        self.targets = [BrokerTarget(config, logger, interval) for config in broker_configs(mqtt_config)]
+
+    def start(self, subscribers=()):
+        """Подключение ко всем брокерам; True, если подключился хотя бы один"""
+        results = [target.start(subscribers) for target in self.targets]
+        return any(results)
+
+    def publish(self, topic, payload=None, qos=0, retain=False, **kwargs):
+        for target in self.targets:
+            target.publish(topic, payload, qos, retain, **kwargs)
+
+    def will_set(self, topic, payload=None, retain=False):
+        """Last will для всех брокеров; вызывается до start()"""
+        for target in self.targets:
+            if target.accepts(topic):
+                target.client.will_set(target.prefix + topic, payload, retain=retain)
+
+    def stop(self):
+        for target in self.targets:
+            target.stop()
@@ -0,0 +1,139 @@
+"""
+Кластер из нескольких экземпляров asic2mqtt
+
+Узлы кластера объявляют себя retained-сообщениями в
+``{topic}/nodes/{node_id}`` и подписываются на объявления друг друга.
+Объявление - это аренда: узел считается живым lease секунд после
+последнего полученного объявления и продлевает аренду каждые
+heartbeat секунд из фонового потока, чтобы долгий цикл опроса не
+приводил к истечению аренды. Асики делятся между живыми узлами
+rendezvous-хэшированием, поэтому каждый асик опрашивает ровно один
+узел, а асики остановившегося узла переходят к оставшимся после
+истечения его аренды. После запуска узел не берет асики один интервал
+heartbeat, пока не получит объявления остальных узлов.
+
+При штатной остановке узел удаляет свое объявление сам, при обрыве
+соединения это делает брокер по last will.
+"""
+
+import json
+import socket
+import threading
+import time
+
+from asic2mqtt_core.sharding import rendezvous_owner
+
+DEFAULT_TOPIC = 'asic2mqtt/cluster'
+DEFAULT_LEASE = 30
+
+
+class ClusterMembership(object):
+    """Объявления узла, аренды соседей и распределение асиков"""
+
+    def __init__(self, config=None, logger=None):
+        config = config or {}
+        self.logger = logger
+        self.node_id = config.get('node_id') or socket.gethostname()
+        self.topic = config.get('topic', DEFAULT_TOPIC).rstrip('/')
+        self.lease = config.get('lease', DEFAULT_LEASE)
+        self.heartbeat = config.get('heartbeat', self.lease / 3.0)
+        self._next_heartbeat = 0
+        # До этого времени узел не опрашивает асики (см. start)
+        self._claim_after = None
+        self._stop = threading.Event()
+        self._thread = None
+        # node_id -> время окончания аренды (по локальным часам)
+        self._leases = {}
+        self._members = None
+        self._lock = threading.Lock()
+
+    def node_topic(self, node_id=None):
+        return '{}/nodes/{}'.format(self.topic, node_id or self.node_id)
+
+    def subscribe(self, client):
+        """Подписка на объявления узлов"""
+        pattern = '{}/nodes/+'.format(self.topic)
+        client.message_callback_add(pattern, self._on_announce)
+        client.subscribe(pattern)
+
+    def _on_announce(self, client, userdata, message):
+        self.handle_announce(message.topic, message.payload)
+
+    def handle_announce(self, topic, payload, now=None):
+        node_id = topic.rsplit('/', 1)[-1]
+        if node_id == self.node_id:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            if not payload:
+                # Узел остановлен или брокер опубликовал его last will
+                self._leases.pop(node_id, None)
+                return
+            try:
+                lease = float(json.loads(payload).get('lease', self.lease))
+            except (ValueError, AttributeError, TypeError):
+                # Объявление приходит из сети: неверное поле lease не должно
+                # прерывать сетевой поток MQTT
+                lease = self.lease
+            self._leases[node_id] = now + lease
+
+    def members(self, now=None):
+        """Живые узлы кластера, включая этот"""
+        now = time.time() if now is None else now
+        with self._lock:
+            alive = [node_id for node_id, expires in self._leases.items() if expires > now]
+        alive.append(self.node_id)
+        return tuple(sorted(alive))
+
+    def owns(self, asic_name, now=None):
+        """Опрашивает ли этот узел асик"""
+        now = time.time() if now is None else now
+        if self._claim_after is not None and now < self._claim_after:
+            return False
+        members = self.members(now)
+        if members != self._members:
+            if self.logger:
+                self.logger.warning("Состав кластера: %s", ', '.join(members))
+            self._members = members
+        return rendezvous_owner(asic_name, members) == self.node_id
+
+    def announcement(self):
+        return json.dumps({'node': self.node_id, 'lease': self.lease, 'ts': int(time.time())})
+
+    def publish_due(self, client, now=None):
+        """Продление аренды узла, если с прошлого объявления прошел интервал"""
+        now = time.time() if now is None else now
+        if now < self._next_heartbeat:
+            return False
+        self._next_heartbeat = now + self.heartbeat
+        client.publish(self.node_topic(), self.announcement(), retain=True)
+        return True
+
+    def start(self, client, now=None):
+        """
+        Вступление в кластер после подключения к брокеру. Асики распределяются
+        через интервал heartbeat, когда придут объявления остальных узлов,
+        иначе узел на первом цикле счел бы себя единственным.
+        """
+        now = time.time() if now is None else now
+        self._claim_after = now + self.heartbeat
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(client,), name='asic2mqtt-cluster', daemon=True)
+        self._thread.start()
+
+    def _run(self, client):
+        while not self._stop.is_set():
+            try:
+                self.publish_due(client)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Не удалось продлить аренду узла %s: %s", self.node_id, e)
+            self._stop.wait(max(0.0, self._next_heartbeat - time.time()))
+
+    def leave(self, client):
+        """Штатный выход из кластера: асики узла сразу переходят к остальным"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        client.publish(self.node_topic(), '', retain=True)
@@ -0,0 +1,219 @@
+"""
+Выполнение управляющих команд на группе асиков
+
+Команда (switchpool, addpool, restart, ...) отправляется всем выбранным
+асикам одновременно, но не больше чем concurrency за раз. Таймаут сокета
+каждой попытки - timeout секунд. Повторяется (до retries раз) только
+попытка, на которой команда не была отправлена, например асик не принял
+соединение. Если команда отправлена, но ответа нет, ее результат
+неизвестен (status "unknown"): повтор мог бы выполнить ее второй раз.
+Отказ асика выполнить команду тоже не повторяется. Итог - один отчет по
+всем асикам.
+
+Команды запускаются из командной строки (``asic2mqtt exec``) или через
+MQTT: запрос публикуется в ``{topic}/run``, отчет приходит в
+``{topic}/result`` (или в топик из поля response_topic).
+"""
+
+import fnmatch
+import json
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from asic2mqtt_core.drivers import CommandNotSent, resolve_driver
+
+DEFAULT_TOPIC = 'asic2mqtt/commands'
+DEFAULT_CONCURRENCY = 32
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_DELAY = 1
+# Команды, которые можно выполнить через MQTT, если в конфигурации не задан allow
+DEFAULT_ALLOWED = ('switchpool', 'addpool', 'enablepool', 'disablepool', 'removepool', 'restart')
+# Условия выбора асиков; без них команда выполняется на всем парке только
+# при явном "all": true
+SELECTORS = ('miners', 'group', 'driver', 'match')
+
+# Итог команды на асике: выполнена, не выполнена, неизвестен (нет ответа
+# на отправленную команду)
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+STATUS_UNKNOWN = 'unknown'
+
+# Результат команды на одном асике: итог, число попыток, длительность в
+# секундах, ответ асика или текст ошибки
+CommandResult = namedtuple('CommandResult', 'asic_name status attempts elapsed response error')
+
+
+def select_miners(asics, miners=None, group=None, driver=None, match=None):
+    """
+    Имена асиков, подходящих под все заданные условия: список имен, поле
+    "group" конфигурации, драйвер и маска имени (fnmatch)
+    """
+    selected = []
+    for asic_name, asic_config in asics.items():
+        if miners is not None and asic_name not in miners:
+            continue
+        if group and asic_config.get('group') != group:
+            continue
+        if driver:
+            driver_cls = resolve_driver(asic_name, asic_config)
+            if driver_cls is None or driver_cls.name != driver:
+                continue
+        if match and not fnmatch.fnmatchcase(asic_name, match):
+            continue
+        selected.append(asic_name)
+    return selected
+
+
+class FleetCommandRunner(object):
+    """Выполнение команды на группе асиков с ограничением параллелизма"""
+
+    def __init__(self, asics, config=None, logger=None):
+        config = config or {}
+        self.asics = asics
+        self.logger = logger
+        self.concurrency = config.get('concurrency', DEFAULT_CONCURRENCY)
+        self.timeout = config.get('timeout', DEFAULT_TIMEOUT)
+        self.retries = config.get('retries', DEFAULT_RETRIES)
+        self.retry_delay = config.get('retry_delay', DEFAULT_RETRY_DELAY)
+
+    def execute(self, asic_name, command, params):
+        """Одна попытка выполнить команду на асике"""
+        asic_config = self.asics[asic_name]
+        driver_cls = resolve_driver(asic_name, asic_config)
+        if driver_cls is None:
+            raise ValueError("Не найден драйвер для асика {}".format(asic_name))
+        # Попытку ограничивает таймаут сокета драйвера
+        driver = driver_cls(asic_config['ip'], dict(asic_config, timeout=self.timeout), self.logger)
+        return driver.execute(command, params)
+
+    def run_one(self, asic_name, command, params=()):
+        started = time.time()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                response = self.execute(asic_name, command, params)
+                return CommandResult(asic_name, STATUS_OK, attempts, time.time() - started, response, None)
+            except CommandNotSent as e:
+                # Команда не дошла до асика - ее можно повторить
+                if attempts > self.retries:
+                    return CommandResult(asic_name, STATUS_FAILED, attempts, time.time() - started, None,
+                                         str(e) or repr(e))
+                time.sleep(self.retry_delay)
+            except OSError as e:
+                # Команда отправлена, но ответа нет (таймаут, разрыв соединения):
+                # выполнил ли ее асик, неизвестно, поэтому она не повторяется
+                return CommandResult(asic_name, STATUS_UNKNOWN, attempts, time.time() - started, None,
+                                     str(e) or repr(e))
+            except Exception as e:
+                # Асик получил команду и отказался ее выполнить
+                return CommandResult(asic_name, STATUS_FAILED, attempts, time.time() - started, None,
+                                     str(e) or repr(e))
+
+    def run(self, command, params=(), miners=None):
+        """Выполнение команды на асиках miners (по умолчанию на всех), отчет в виде словаря"""
+        miners = list(self.asics) if miners is None else [name for name in miners if name in self.asics]
+        started = time.time()
+        if self.logger:
+            self.logger.info("Команда %s для %d асиков", command, len(miners))
+        results = []
+        if miners:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(miners)),
+                                    thread_name_prefix='asic2mqtt-exec') as executor:
+                results = list(executor.map(lambda name: self.run_one(name, command, params), miners))
+        statuses = [result.status for result in results]
+        succeeded = statuses.count(STATUS_OK)
+        report = {
+            'command': command,
+            'params': list(params),
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': statuses.count(STATUS_FAILED),
+            'unknown': statuses.count(STATUS_UNKNOWN),
+            'elapsed': round(time.time() - started, 3),
+            'results': dict(
+                (result.asic_name, dict(
+                    {'status': result.status, 'attempts': result.attempts, 'elapsed': round(result.elapsed, 3)},
+                    **({'response': result.response} if result.status == STATUS_OK else {'error': result.error})
+                )) for result in results
+            ),
+        }
+        if self.logger:
+            self.logger.info("Команда %s выполнена на %d из %d асиков за %.1f с, результат неизвестен на %d",
+                             command, succeeded, len(results), report['elapsed'], report['unknown'])
+        return report
+
+
+def request_error(request):
+    """Текст ошибки в условиях выбора асиков и параметрах запроса или None"""
+    miners = request.get('miners')
+    if miners is not None and not (isinstance(miners, list) and all(isinstance(name, str) for name in miners)):
+        return 'Поле miners должно быть списком имен асиков'
+    for selector in ('group', 'driver', 'match'):
+        if request.get(selector) is not None and not isinstance(request[selector], str):
+            return 'Поле {} должно быть строкой'.format(selector)
+    if not isinstance(request.get('params', []), list):
+        return 'Поле params должно быть списком'
+    if request.get('all') is not True and all(request.get(selector) is None for selector in SELECTORS):
+        return 'Не указаны асики: нужно одно из полей {} или "all": true'.format(', '.join(SELECTORS))
+    return None
+
+
+class CommandRequests(object):
+    """
+    Прием команд через MQTT. owns - проверка, что асик принадлежит этому
+    узлу кластера: каждый узел выполняет команду на своих асиках и
+    публикует свой отчет.
+    """
+
+    def __init__(self, config, runner, logger=None, owns=None, node_id=None):
+        self.runner = runner
+        self.logger = logger
+        self.owns = owns
+        self.node_id = node_id
+        self.topic = config.get('topic', DEFAULT_TOPIC).rstrip('/')
+        self.allowed = frozenset(config.get('allow', DEFAULT_ALLOWED))
+
+    def subscribe(self, client):
+        request_topic = '{}/run'.format(self.topic)
+        client.message_callback_add(request_topic, self._on_request)
+        client.subscribe(request_topic)
+
+    def handle_request(self, payload):
+        """Выполнение запроса: (топик ответа, отчет)"""
+        try:
+            request = json.loads(payload or '{}')
+        except ValueError:
+            request = {}
+        if not isinstance(request, dict):
+            request = {}
+        response_topic = request.get('response_topic') or '{}/result'.format(self.topic)
+        command = request.get('command')
+        error = request_error(request)
+        if not command:
+            report = {'error': 'Не указана команда'}
+        elif command not in self.allowed:
+            report = {'command': command, 'error': 'Команда {} не разрешена'.format(command)}
+        elif error is not None:
+            report = {'command': command, 'error': error}
+        else:
+            miners = select_miners(self.runner.asics, request.get('miners'), request.get('group'),
+                                   request.get('driver'), request.get('match'))
+            if self.owns is not None:
+                miners = [name for name in miners if self.owns(name)]
+            report = self.runner.run(command, [str(param) for param in request.get('params', ())], miners)
+        if 'id' in request:
+            report['id'] = request['id']
+        if self.node_id:
+            report['node'] = self.node_id
+        return response_topic, report
+
+    def _on_request(self, client, userdata, message):
+        # Команда на тысяче асиков не должна занимать сетевой поток MQTT
+        def run():
+            response_topic, report = self.handle_request(message.payload.decode('utf-8', 'replace'))
+            client.publish(response_topic, json.dumps(report, default=str))
+        threading.Thread(target=run, name='asic2mqtt-command-request', daemon=True).start()
@@ -0,0 +1,142 @@
+"""
+Адаптивное ограничение числа одновременных опросов (AIMD)
+
+Предел одновременных опросов подбирается автоматически: после каждого
+быстрого успешного опроса предел растет аддитивно (на increase за "раунд"
+из limit опросов), а после таймаута, ошибки или ответа медленнее
+latency_target уменьшается мультипликативно (в decrease раз). Так предел
+сходится к наибольшему параллелизму, который выдерживают сеть и
+контроллеры асиков.
+
+Пределы действуют одновременно на весь парк и на каждую группу асиков -
+подсеть (по умолчанию /24) или значение поля "group" в конфигурации асика,
+например коммутатор, к которому подключены асики. Опрос запускается только
+когда в обоих пределах есть место (try_acquire), поэтому асики групп, у
+которых место есть, не ждут за асиками заполненной группы.
+"""
+
+import ipaddress
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_GLOBAL = {'initial': 4, 'min': 1, 'max': 64}
+DEFAULT_GROUP = {'initial': 2, 'min': 1, 'max': 16}
+DEFAULT_INCREASE = 1.0
+DEFAULT_DECREASE = 0.5
+DEFAULT_LATENCY_TARGET = 2.0
+DEFAULT_SUBNET_PREFIX = 24
+
+
+class AIMDLimit(object):
+    """Предел одновременных запросов, регулируемый по AIMD"""
+
+    def __init__(self, initial, minimum, maximum, increase=DEFAULT_INCREASE, decrease=DEFAULT_DECREASE,
+                 latency_target=DEFAULT_LATENCY_TARGET):
+        # При пределе меньше единицы не начался бы ни один запрос
+        if minimum < 1 or maximum < minimum:
+            raise ValueError("Неверный предел одновременных запросов: min={}, max={} (нужно 1 <= min <= max)"
+                             .format(minimum, maximum))
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.inflight = 0
+        self._last_decrease = 0
+
+    def available(self):
+        return self.inflight < int(self.limit)
+
+    def on_result(self, started, latency, failed, now=None):
+        """Учет результата запроса, начатого в started"""
+        now = time.time() if now is None else now
+        if failed or latency > self.latency_target:
+            # Перегрузку видят все запросы, начатые до снижения предела,
+            # поэтому одна перегрузка уменьшает его только один раз
+            if started >= self._last_decrease:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+
+class ConcurrencyController(object):
+    """Общий предел и пределы групп асиков; опрос начинается, когда оба позволяют"""
+
+    def __init__(self, config=None, logger=None):
+        config = config or {}
+        self.logger = logger
+        self.subnet_prefix = config.get('subnet_prefix', DEFAULT_SUBNET_PREFIX)
+        self._global_config = dict(DEFAULT_GLOBAL, **config.get('global', {}))
+        self._group_config = dict(DEFAULT_GROUP, **config.get('group', {}))
+        self._common = {
+            'increase': config.get('increase', DEFAULT_INCREASE),
+            'decrease': config.get('decrease', DEFAULT_DECREASE),
+            'latency_target': config.get('latency_target', DEFAULT_LATENCY_TARGET),
+        }
+        self.global_limit = self._make_limit(self._global_config)
+        self.groups = {}
+        self._cond = threading.Condition()
+        # Потоков столько, сколько опросов может идти одновременно при максимальном пределе
+        self.executor = ThreadPoolExecutor(max_workers=self._global_config['max'],
+                                           thread_name_prefix='asic2mqtt-poll')
+
+    def _make_limit(self, config):
+        return AIMDLimit(config['initial'], config['min'], config['max'], **self._common)
+
+    def group_for(self, asic_config):
+        """Группа асика: поле "group" или подсеть его IP-адреса"""
+        group = asic_config.get('group')
+        if group:
+            return group
+        try:
+            return str(ipaddress.ip_network('{}/{}'.format(asic_config['ip'], self.subnet_prefix), strict=False))
+        except (KeyError, ValueError):
+            return asic_config.get('ip')
+
+    def _group_limit(self, group):
+        limit = self.groups.get(group)
+        if limit is None:
+            limit = self.groups[group] = self._make_limit(self._group_config)
+        return limit
+
+    def try_acquire(self, groups):
+        """
+        Начало опроса в первой из групп groups, где есть место, без ожидания.
+        Возвращает (группа, время начала) или None, если места нет.
+        """
+        with self._cond:
+            if not self.global_limit.available():
+                return None
+            for group in groups:
+                limit = self._group_limit(group)
+                if limit.available():
+                    self.global_limit.inflight += 1
+                    limit.inflight += 1
+                    return group, time.time()
+        return None
+
+    def release(self, group, started, latency=None, failed=False):
+        """
+        Завершение опроса. Без latency и failed (асик пропущен или не отвечает
+        на ping) пределы не меняются.
+        """
+        now = time.time()
+        with self._cond:
+            limits = (self.global_limit, self.groups[group])
+            for limit in limits:
+                limit.inflight -= 1
+                if failed or latency is not None:
+                    limit.on_result(started, latency, failed, now)
+            self._cond.notify_all()
+
+    def report(self):
+        if self.logger:
+            with self._cond:
+                groups = ', '.join('{}: {:.1f}'.format(group, limit.limit) for group, limit in sorted(self.groups.items()))
+                self.logger.info("Предел одновременных опросов: %.1f (группы: %s)", self.global_limit.limit, groups)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,331 @@
+"""
+Драйверы семейств асиков и реестр плагинов
+
+Драйвер описывает, какие команды отправлять асику, как разбирать ответы и
+в какие подтопики MQTT публиковать результат. Встроенные драйверы (Antminer,
+Whatsminer) импортируются и регистрируются при первом обращении к ним, чтобы
+не загружать клиенты семейств асиков, которых нет в конфигурации; сторонние
+подключаются через entry points группы ``asic2mqtt.drivers``.
+"""
+
+import importlib
+import math
+import time
+from collections import namedtuple
+
+from antminer.constants import DEFAULT_BURST, DEFAULT_RATE_LIMIT
+from asic2mqtt_core.model import MinerSnapshot
+
+# Группа entry points, через которую плагины регистрируют свои драйверы
+ENTRY_POINT_GROUP = 'asic2mqtt.drivers'
+
+# Повторная проверка поддерживаемых команд раз в сутки, чтобы заметить
+# обновление прошивки
+DEFAULT_CAPABILITY_TTL = 24 * 60 * 60
+
+# Встроенные драйверы: имя -> модуль, который регистрирует драйвер при импорте
+BUILTIN_DRIVERS = {
+    'antminer': 'asic2mqtt_core.drivers.antminer',
+    'whatsminer': 'asic2mqtt_core.drivers.whatsminer',
+}
+
+_registry = {}
+# Пределы частоты запросов из последнего вызова configure_rate_limits();
+# драйверы, загруженные позже, получают их при регистрации
+_rate_limits = None
+
+# Ключевая метрика асика: команда, путь к значению в ответе (ключи и индексы),
+# человекочитаемое имя, единица измерения и device_class Home Assistant
+Sensor = namedtuple('Sensor', 'command path name unit device_class')
+
+
+class CommandNotSupported(Exception):
+    """Прошивка асика не поддерживает команду"""
+
+    def __init__(self, command, response=None):
+        super(CommandNotSupported, self).__init__(command)
+        self.command = command
+        self.response = response
+
+
+class CommandNotSent(Exception):
+    """
+    Управляющая команда не отправлена асику (нет соединения и т.п.); в
+    отличие от ошибки после отправки, ее можно безопасно повторить
+    """
+
+    def __init__(self, command, error=None):
+        super(CommandNotSent, self).__init__("{}: {}".format(command, error))
+        self.command = command
+        self.error = error
+
+
+class Driver(object):
+    """
+    Базовый класс драйвера асика.
+
+    Наследник задает имя драйвера, упорядоченный список команд опроса и
+    соответствие команд подтопикам, а также реализует fetch(). Экземпляр
+    драйвера создается на каждый опрос конкретного асика.
+    """
+
+    # Имя драйвера, используется в поле "driver" конфигурации асика
+    name = None
+    # Команды в порядке опроса
+    commands = ()
+    # Команда -> подтопик MQTT (по умолчанию совпадает с именем команды)
+    topics = {}
+    # Команда -> функция разбора ответа
+    parsers = {}
+    # Ключевые метрики для Home Assistant и других потребителей
+    sensors = ()
+    # Производитель для описания устройства в Home Assistant
+    manufacturer = None
+    # Метрики для публикации в отдельные подтопики: имя -> путь, см. metrics.py
+    metrics = {}
+    # Производные данные для путей метрик: имя -> функция(results). В отличие
+    # от результатов команд они не публикуются и не меняют ответы асика
+    derived = {}
+    # Ограничение частоты запросов к асикам семейства (HostRateLimiter), общее
+    # для всех экземпляров драйвера
+    limiter = None
+
+    def __init__(self, ip, asic_config=None, logger=None):
+        self.ip = ip
+        self.asic_config = asic_config or {}
+        self.logger = logger
+        # Модель из конфигурации выбирает пределы частоты до первого ответа асика
+        if self.limiter is not None and self.asic_config.get('model'):
+            self.limiter.set_model(ip, self.asic_config['model'])
+
+    @classmethod
+    def matches(cls, asic_name, asic_config):
+        """Подходит ли драйвер асику, для которого явно не указан драйвер"""
+        return bool(cls.name) and cls.name in asic_name.lower()
+
+    def topic_for(self, command):
+        """Подтопик, в который публикуется результат команды"""
+        return self.topics.get(command, command)
+
+    def summarize(self, results):
+        """
+        Нормализованные показатели асика для сводки по парку: hashrate (GH/s),
+        temperature (максимальная, °C), accepted и rejected. Отсутствующие
+        показатели не включаются.
+        """
+        return {}
+
+    def snapshot(self, asic_name, results, poll_ts=None, latency=None):
+        """
+        Нормализованный снимок асика (MinerSnapshot) по результатам опроса;
+        по умолчанию из показателей summarize(), драйверы добавляют
+        показатели по цепям
+        """
+        return MinerSnapshot(asic_name, self.name, poll_ts, latency, **self.summarize(results))
+
+    def fetch(self, command):
+        """Выполнение команды на асике, возвращает сырой ответ"""
+        raise NotImplementedError
+
+    def execute(self, command, params=()):
+        """
+        Выполнение управляющей команды (switchpool, restart, ...) с
+        параметрами params (список строк), возвращает сырой ответ. Ошибка
+        до отправки команды - CommandNotSent, таймаут ответа - socket.timeout.
+        """
+        raise NotImplementedError("Драйвер {} не выполняет команды".format(self.name))
+
+    def parse(self, command, response):
+        """Разбор ответа команды"""
+        parser = self.parsers.get(command)
+        if parser is None:
+            return response
+        return parser(response)
+
+    def probe(self):
+        """
+        Определение команд, которые поддерживает прошивка асика.
+
+        По умолчанию каждая команда выполняется один раз; драйверы, у которых
+        есть более дешевый способ проверки, переопределяют этот метод.
+        """
+        supported = set()
+        for command in self.commands:
+            try:
+                self.fetch(command)
+            except CommandNotSupported:
+                continue
+            supported.add(command)
+        return frozenset(supported)
+
+    def poll(self, capabilities=None):
+        """
+        Опрос асика командами из набора capabilities.
+
+        Возвращает словарь {команда: данные}. Если асик отказался выполнить
+        команду, она попадает в множество отклоненных, которое возвращается
+        вторым элементом.
+        """
+        results = {}
+        rejected = set()
+        for command in self.commands:
+            if capabilities is not None and command not in capabilities:
+                continue
+            try:
+                response = self.fetch(command)
+            except CommandNotSupported:
+                rejected.add(command)
+                continue
+            data = self.parse(command, response)
+            if data:
+                results[command] = data
+        return results, rejected
+
+
+def extract(data, path):
+    """Значение по пути из ключей и индексов или None, если его нет"""
+    for key in path:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return data
+
+
+def to_float(value):
+    """
+    Число из ответа асика (некоторые прошивки отдают числа строками) или
+    None; "nan" и "inf" тоже дают None
+    """
+    if isinstance(value, bool):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+class CapabilityCache(object):
+    """Кэш поддерживаемых асиком команд"""
+
+    def __init__(self, ttl=DEFAULT_CAPABILITY_TTL):
+        self.ttl = ttl
+        self._entries = {}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        capabilities, probed_at = entry
+        if self.ttl and time.time() - probed_at > self.ttl:
+            del self._entries[key]
+            return None
+        return capabilities
+
+    def set(self, key, capabilities, probed_at=None):
+        self._entries[key] = (frozenset(capabilities), time.time() if probed_at is None else probed_at)
+
+    def entries(self):
+        """Записи кэша {ключ: (команды, время проверки)}"""
+        return dict(self._entries)
+
+    def discard(self, key, commands):
+        """Исключение команд, которые асик перестал выполнять"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries[key] = (entry[0] - frozenset(commands), entry[1])
+
+
+def register_driver(driver_cls):
+    """Регистрация класса драйвера; можно использовать как декоратор"""
+    if not driver_cls.name:
+        raise ValueError("Драйвер {} не задает имя".format(driver_cls.__name__))
+    _registry[driver_cls.name] = driver_cls
+    if _rate_limits is not None and driver_cls.limiter is not None:
+        driver_cls.limiter.configure(*_rate_limits)
+    return driver_cls
+
+
+def _load_builtin(name):
+    """Импорт модуля встроенного драйвера, если он еще не загружен"""
+    if name not in _registry and name in BUILTIN_DRIVERS:
+        importlib.import_module(BUILTIN_DRIVERS[name])
+    return _registry.get(name)
+
+
+def get_driver(name):
+    return _registry.get(name) or _load_builtin(name)
+
+
+def available_drivers():
+    return list(_registry) + [name for name in BUILTIN_DRIVERS if name not in _registry]
+
+
+def _iter_entry_points(group):
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        # Python 3.7: importlib.metadata доступен только как отдельный пакет
+        try:
+            from importlib_metadata import entry_points
+        except ImportError:
+            return []
+
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        return list(eps.select(group=group))
+    return list(eps.get(group, []))
+
+
+def load_plugins(logger=None):
+    """Загрузка драйверов, объявленных через entry points"""
+    loaded = []
+    for entry_point in _iter_entry_points(ENTRY_POINT_GROUP):
+        try:
+            driver_cls = entry_point.load()
+            register_driver(driver_cls)
+            loaded.append(driver_cls.name)
+        except Exception as e:
+            if logger:
+                logger.error("Не удалось загрузить драйвер %s: %s", entry_point.name, e)
+            continue
+        if logger:
+            logger.debug("Загружен драйвер %s из плагина %s", driver_cls.name, entry_point.name)
+    return loaded
+
+
+def configure_rate_limits(config=None):
+    """
+    Настройка ограничения частоты запросов всех драйверов с limiter из
+    секции rate_limit: rate и burst по умолчанию, max_wait и пределы по
+    моделям {префикс модели: {rate, burst}}
+    """
+    global _rate_limits
+    config = config or {}
+    rate = config.get('rate', DEFAULT_RATE_LIMIT)
+    burst = config.get('burst', DEFAULT_BURST)
+    models = dict((model, (limits.get('rate', rate), limits.get('burst', burst)))
+                  for model, limits in config.get('models', {}).items())
+    _rate_limits = (rate, burst, models, config.get('max_wait'))
+    # У драйверов одного семейства может быть общий ограничитель
+    limiters = set(driver_cls.limiter for driver_cls in _registry.values() if driver_cls.limiter is not None)
+    for limiter in limiters:
+        limiter.configure(*_rate_limits)
+    return len(limiters)
+
+
+def resolve_driver(asic_name, asic_config):
+    """Выбор класса драйвера для асика: явно из конфигурации или по имени асика"""
+    name = asic_config.get('driver')
+    if name:
+        return get_driver(name)
+
+    for driver_cls in list(_registry.values()):
+        if driver_cls.matches(asic_name, asic_config):
+            return driver_cls
+    # Незагруженный встроенный драйвер выбирается так же, как в Driver.matches()
+    for name in BUILTIN_DRIVERS:
+        if name not in _registry and name in asic_name.lower():
+            return _load_builtin(name)
+    return None
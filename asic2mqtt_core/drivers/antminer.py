@@ -0,0 +1,197 @@
+"""
+Драйвер асиков Antminer (cgminer/bmminer API на порту 4028)
+"""
+
+import re
+
+from antminer import base, chains
+from antminer.constants import DEFAULT_TIMEOUT, DEFAULT_WEB_PASSWORD, DEFAULT_WEB_PORT, DEFAULT_WEB_USERNAME
+from antminer.exceptions import APIException, RateLimited, WebError
+from antminer.web import WebClient
+
+from asic2mqtt_core.drivers import (
+    Driver, CommandNotSent, CommandNotSupported, Sensor, extract, register_driver, to_float
+)
+from asic2mqtt_core.model import MinerSnapshot
+
+# Код ответа cgminer для неизвестной прошивке команды (INVCMD)
+INVCMD = 14
+
+# Команды веб-интерфейса (CGI) называются web/<имя>, например web/get_system_info
+WEB_PREFIX = 'web/'
+
+# Температуры чипов по цепям (temp2_N) и, на старых прошивках, плат (tempN)
+CHIP_TEMP_KEY = re.compile(r'^temp2_\d+$')
+BOARD_TEMP_KEY = re.compile(r'^temp\d+$')
+# Хэшрейт по цепям (chain_rateN)
+CHAIN_RATE_KEY = re.compile(r'^chain_rate(\d+)$')
+
+
+def chain_series(info, pattern):
+    """Значения полей вида <имя>N в порядке номеров цепей"""
+    keys = [(int(re.search(r'\d+$', key).group()), key) for key in info if pattern.match(key)]
+    return [to_float(info[key]) for _, key in sorted(keys)]
+
+
+def chain_metrics(results):
+    """
+    Производные метрики по цепям из ответа stats (см. antminer.chains):
+    {номер цепи: {chip_temp_min, chip_temp_max, chips, failed_chips, freq_avg}}
+    """
+    info = extract(results, ('stats', 'STATS', 1))
+    if not isinstance(info, dict):
+        return None
+    return chains.decode(info).metrics() or None
+
+
+@register_driver
+class AntminerDriver(Driver):
+    name = 'antminer'
+    commands = ('stats', 'devs')
+    topics = {
+        'stats': 'stats',
+        'devs': 'devs',
+    }
+    derived = {
+        'chains': chain_metrics,
+    }
+    manufacturer = 'Bitmain'
+    # Общий для всех клиентов antminer, см. antminer.base.Core
+    limiter = base.Core.limiter
+    sensors = (
+        Sensor('stats', ('STATS', 1, 'GHS 5s'), 'Hashrate', 'GH/s', None),
+        Sensor('stats', ('STATS', 1, 'GHS av'), 'Hashrate average', 'GH/s', None),
+        Sensor('stats', ('STATS', 1, 'Elapsed'), 'Uptime', 's', 'duration'),
+    ) + tuple(
+        Sensor('stats', ('STATS', 1, 'fan{}'.format(n)), 'Fan {}'.format(n), 'RPM', None)
+        for n in range(1, 5)
+    ) + tuple(
+        Sensor('stats', ('STATS', 1, 'temp2_{}'.format(n)), 'Chain {} chip temperature'.format(n), '°C', 'temperature')
+        for n in range(1, 5)
+    )
+    metrics = {
+        'hashrate': 'stats/STATS/1/GHS 5s',
+        'hashrate_avg': 'stats/STATS/1/GHS av',
+        'chain_hashrate': 'stats/STATS/1/chain_rate[0-9]*',
+        'fan': 'stats/STATS/1/fan[0-9]*',
+        'chain_temp': 'stats/STATS/1/temp2_[0-9]*',
+        'accepted': 'devs/DEVS/*/Accepted',
+        'rejected': 'devs/DEVS/*/Rejected',
+        'chip_temp_min': 'chains/*/chip_temp_min',
+        'chip_temp_max': 'chains/*/chip_temp_max',
+        'failed_chips': 'chains/*/failed_chips',
+        'chain_freq': 'chains/*/freq_avg',
+    }
+
+    def __init__(self, ip, asic_config=None, logger=None):
+        super(AntminerDriver, self).__init__(ip, asic_config, logger)
+        # Таймаут сокета в секундах; зависший асик не блокирует опрос
+        timeout = self.asic_config.get('timeout', DEFAULT_TIMEOUT)
+        self.client = base.BaseClient(ip, timeout=timeout)
+        # CGI веб-интерфейса опрашиваются только если перечислены в поле "web"
+        self.web = None
+        web_commands = self.asic_config.get('web')
+        if web_commands:
+            self.commands = self.commands + tuple(WEB_PREFIX + name for name in web_commands)
+            self.web = WebClient(ip, self.asic_config.get('username') or DEFAULT_WEB_USERNAME,
+                                 self.asic_config.get('password') or DEFAULT_WEB_PASSWORD,
+                                 port=self.asic_config.get('web_port', DEFAULT_WEB_PORT), timeout=timeout)
+
+    def summarize(self, results):
+        values = {}
+        info = extract(results, ('stats', 'STATS', 1))
+        if isinstance(info, dict):
+            hashrate = to_float(info.get('GHS 5s'))
+            if hashrate is not None:
+                values['hashrate'] = hashrate
+            for pattern in (CHIP_TEMP_KEY, BOARD_TEMP_KEY):
+                temps = [to_float(v) for k, v in info.items() if pattern.match(k)]
+                temps = [t for t in temps if t]
+                if temps:
+                    values['temperature'] = max(temps)
+                    break
+
+        devs = extract(results, ('devs', 'DEVS'))
+        if isinstance(devs, list) and devs:
+            for field, key in (('Accepted', 'accepted'), ('Rejected', 'rejected')):
+                counts = [to_float(dev.get(field)) for dev in devs if isinstance(dev, dict)]
+                counts = [c for c in counts if c is not None]
+                if counts:
+                    values[key] = sum(counts)
+        return values
+
+    def snapshot(self, asic_name, results, poll_ts=None, latency=None):
+        info = extract(results, ('stats', 'STATS', 1))
+        chain_hashrate = chain_temps = ()
+        if isinstance(info, dict):
+            chain_hashrate = chain_series(info, CHAIN_RATE_KEY)
+            chain_temps = chain_series(info, CHIP_TEMP_KEY)
+        return MinerSnapshot(asic_name, self.name, poll_ts, latency, chain_hashrate, chain_temps,
+                             **self.summarize(results))
+
+    def fetch(self, command):
+        if self.logger:
+            self.logger.debug("Запрос %s от Antminer %s", command, self.ip)
+        if command.startswith(WEB_PREFIX):
+            try:
+                return self.web.cgi(command[len(WEB_PREFIX):])
+            except WebError as e:
+                if e.status == 404:
+                    raise CommandNotSupported(command)
+                raise
+        try:
+            if command == 'stats':
+                # stats требует исправления JSON, см. BaseClient.stats()
+                return self.client.stats()
+            return self.client.command(command)
+        except APIException as e:
+            if e.code == INVCMD:
+                raise CommandNotSupported(command, e.response)
+            raise
+
+    def execute(self, command, params=()):
+        if self.logger:
+            self.logger.debug("Команда %s %s для Antminer %s", command, ','.join(params), self.ip)
+        # Соединение устанавливается заранее: ошибка здесь значит, что команда
+        # не отправлена и ее можно повторить
+        try:
+            self.client.connect()
+        except OSError as e:
+            self.client.close()
+            raise CommandNotSent(command, e)
+        try:
+            return self.client.command(command, *params)
+        except RateLimited as e:
+            raise CommandNotSent(command, e)
+        finally:
+            # После отправки соединение закрывает сам клиент; открытым оно
+            # остается, только если команда не была отправлена
+            if self.client.conn is not None:
+                self.client.close()
+
+    def probe(self):
+        """Проверка команд через встроенную команду cgminer "check" """
+        supported = set()
+        for command in self.commands:
+            if command.startswith(WEB_PREFIX):
+                # CGI проверяется запросом: нет скрипта - 404
+                try:
+                    self.fetch(command)
+                except CommandNotSupported:
+                    continue
+                supported.add(command)
+                continue
+            try:
+                response = self.client.command('check', command)
+            except APIException as e:
+                if e.code == INVCMD:
+                    # Старые прошивки не знают "check" - проверяем командами
+                    return super(AntminerDriver, self).probe()
+                raise
+            try:
+                check = response['CHECK'][0]
+            except (KeyError, IndexError, TypeError):
+                return super(AntminerDriver, self).probe()
+            if check.get('Exists') == 'Y' and check.get('Access') == 'Y':
+                supported.add(command)
+        return frozenset(supported)
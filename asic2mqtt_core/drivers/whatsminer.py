@@ -0,0 +1,177 @@
+"""
+Драйвер асиков Whatsminer (read-only API на порту 4028)
+"""
+
+import base64
+import hashlib
+import json
+import socket
+
+import whatsminer
+from whatsminer.api import AES, add_to_16, crypt
+
+from antminer.exceptions import RateLimited
+from antminer.ratelimit import HostRateLimiter
+from asic2mqtt_core.drivers import (
+    Driver, CommandNotSent, CommandNotSupported, Sensor, extract, register_driver, to_float
+)
+from asic2mqtt_core.model import MinerSnapshot
+
+# Код ответа API Whatsminer для неизвестной команды
+INVALID_COMMAND = 14
+# Таймаут сокета команд на запись, секунд
+DEFAULT_TIMEOUT = 10
+# Наибольший размер ответа API, как в whatsminer.api.recv_all
+MAX_RESPONSE = 4000
+
+
+@register_driver
+class WhatsminerDriver(Driver):
+    name = 'whatsminer'
+    commands = ('summary', 'edevs')
+    topics = {
+        'summary': 'summary',
+        'edevs': 'edevs',
+    }
+    manufacturer = 'MicroBT'
+    limiter = HostRateLimiter()
+    sensors = (
+        Sensor('summary', ('SUMMARY', 0, 'MHS 5s'), 'Hashrate', 'MH/s', None),
+        Sensor('summary', ('SUMMARY', 0, 'MHS av'), 'Hashrate average', 'MH/s', None),
+        Sensor('summary', ('SUMMARY', 0, 'Temperature'), 'Temperature', '°C', 'temperature'),
+        Sensor('summary', ('SUMMARY', 0, 'Fan Speed In'), 'Fan in', 'RPM', None),
+        Sensor('summary', ('SUMMARY', 0, 'Fan Speed Out'), 'Fan out', 'RPM', None),
+        Sensor('summary', ('SUMMARY', 0, 'Power'), 'Power', 'W', 'power'),
+        Sensor('summary', ('SUMMARY', 0, 'Accepted'), 'Accepted shares', None, None),
+        Sensor('summary', ('SUMMARY', 0, 'Rejected'), 'Rejected shares', None, None),
+        Sensor('summary', ('SUMMARY', 0, 'Elapsed'), 'Uptime', 's', 'duration'),
+    ) + tuple(
+        Sensor('edevs', ('DEVS', n, 'Temperature'), 'Chain {} temperature'.format(n), '°C', 'temperature')
+        for n in range(3)
+    )
+    metrics = {
+        'hashrate': 'summary/SUMMARY/0/MHS 5s',
+        'hashrate_avg': 'summary/SUMMARY/0/MHS av',
+        'temperature': 'summary/SUMMARY/0/Temperature',
+        'fan_in': 'summary/SUMMARY/0/Fan Speed In',
+        'fan_out': 'summary/SUMMARY/0/Fan Speed Out',
+        'power': 'summary/SUMMARY/0/Power',
+        'accepted': 'summary/SUMMARY/0/Accepted',
+        'rejected': 'summary/SUMMARY/0/Rejected',
+        'chain_hashrate': 'edevs/DEVS/*/MHS 5s',
+        'chain_temp': 'edevs/DEVS/*/Temperature',
+    }
+
+    def __init__(self, ip, asic_config=None, logger=None):
+        super(WhatsminerDriver, self).__init__(ip, asic_config, logger)
+        self.token = whatsminer.WhatsminerAccessToken(ip_address=ip)
+
+    def summarize(self, results):
+        values = {}
+        summary = extract(results, ('summary', 'SUMMARY', 0))
+        temps = []
+        if isinstance(summary, dict):
+            hashrate = to_float(summary.get('MHS 5s'))
+            if hashrate is not None:
+                values['hashrate'] = hashrate / 1000.0
+            for field, key in (('Accepted', 'accepted'), ('Rejected', 'rejected')):
+                count = to_float(summary.get(field))
+                if count is not None:
+                    values[key] = count
+            temps.append(to_float(summary.get('Temperature')))
+
+        devs = extract(results, ('edevs', 'DEVS'))
+        if isinstance(devs, list):
+            temps.extend(to_float(dev.get('Temperature')) for dev in devs if isinstance(dev, dict))
+        temps = [t for t in temps if t]
+        if temps:
+            values['temperature'] = max(temps)
+        return values
+
+    def snapshot(self, asic_name, results, poll_ts=None, latency=None):
+        values = self.summarize(results)
+        values['power'] = to_float(extract(results, ('summary', 'SUMMARY', 0, 'Power')))
+        chain_hashrate = chain_temps = ()
+        devs = extract(results, ('edevs', 'DEVS'))
+        if isinstance(devs, list):
+            devs = [dev for dev in devs if isinstance(dev, dict)]
+            # MH/s в GH/s, как у остальных драйверов
+            hashrates = [to_float(dev.get('MHS 5s')) for dev in devs]
+            chain_hashrate = [None if hashrate is None else hashrate / 1000.0 for hashrate in hashrates]
+            chain_temps = [to_float(dev.get('Temperature')) for dev in devs]
+        return MinerSnapshot(asic_name, self.name, poll_ts, latency, chain_hashrate, chain_temps, **values)
+
+    def fetch(self, command):
+        if self.logger:
+            self.logger.debug("Запрос %s от Whatsminer %s", command, self.ip)
+        # Все команды read-only API без побочных эффектов, одинаковые запросы объединяются
+        response = self.limiter.call(
+            self.ip, command,
+            lambda: whatsminer.WhatsminerAPI.get_read_only_info(access_token=self.token, cmd=command))
+        if isinstance(response, dict) and response.get('STATUS') == 'E':
+            if response.get('Code') == INVALID_COMMAND:
+                raise CommandNotSupported(command, response)
+            raise Exception(response.get('Msg', response))
+        return response
+
+    def execute(self, command, params=()):
+        """
+        Команда API на запись; параметры передаются в виде key=value.
+        Нужен пароль администратора асика (поле "password" конфигурации).
+        """
+        password = self.asic_config.get('password')
+        if not password:
+            raise ValueError("Для команд Whatsminer {} нужен пароль администратора (password)".format(self.ip))
+        additional = dict(param.split('=', 1) for param in params if '=' in param)
+        if self.logger:
+            self.logger.debug("Команда %s %s для Whatsminer %s", command, additional, self.ip)
+
+        # Обмен с асиком повторяет WhatsminerAPI.exec_command, но с таймаутом
+        # сокета: клиент библиотеки ждет ответа без ограничения времени
+        def exec_command():
+            cipher, sign = self._write_token(command, password)
+            api_cmd = json.dumps(dict(additional, cmd=command, token=sign))
+            packet = json.dumps({'enc': 1, 'data': base64.b64encode(cipher.encrypt(add_to_16(api_cmd))).decode()})
+            response = json.loads(self._exchange(command, packet))
+            if response.get('STATUS') == 'E':
+                raise Exception(response.get('Msg', response))
+            plaintext = cipher.decrypt(base64.b64decode(response['enc'])).decode().split('\x00')[0]
+            return json.loads(plaintext)
+        try:
+            return self.limiter.call(self.ip, None, exec_command)
+        except RateLimited as e:
+            raise CommandNotSent(command, e)
+
+    def _exchange(self, command, packet):
+        """Запрос к API асика; ошибка соединения - CommandNotSent"""
+        timeout = self.asic_config.get('timeout', DEFAULT_TIMEOUT)
+        try:
+            conn = socket.create_connection((self.ip, self.token.port), timeout=timeout)
+        except OSError as e:
+            raise CommandNotSent(command, e)
+        with conn:
+            conn.sendall(packet.encode('utf-8'))
+            data = b''
+            while len(data) < MAX_RESPONSE:
+                chunk = conn.recv(MAX_RESPONSE - len(data))
+                if not chunk:
+                    break
+                data += chunk
+        return data.decode('utf-8')
+
+    def _write_token(self, command, password):
+        """
+        Шифр и подпись команд на запись по паролю администратора (как в
+        WhatsminerAccessToken). Команда еще не отправлена, поэтому любая
+        ошибка здесь - CommandNotSent.
+        """
+        try:
+            token_info = json.loads(self._exchange(command, json.dumps({'cmd': 'get_token'})))['Msg']
+            key = crypt(password, '$1$' + token_info['salt'] + '$').split('$')[3]
+            cipher = AES.new(hashlib.sha256(key.encode()).digest(), AES.MODE_ECB)
+            sign = crypt(key + token_info['time'], '$1$' + token_info['newsalt'] + '$').split('$')[3]
+        except CommandNotSent:
+            raise
+        except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+            raise CommandNotSent(command, e)
+        return cipher, sign
@@ -0,0 +1,117 @@
+"""
+Кодирование сообщений подтопиков: JSON, MessagePack или CBOR
+
+Формат задается для каждого подтопика в секции ``encoding`` конфигурации.
+Сообщения больше порога compress_threshold дополнительно сжимаются zlib.
+Потребитель узнает формат по свойствам Content Type и content_encoding
+сообщения MQTT v5 или по суффиксу топика (``stats.msgpack``,
+``stats.msgpack.zlib``), если он включен полем topic_suffix.
+
+JSON остается форматом по умолчанию: подтопики без настроек кодируются
+как раньше и публикуются без суффикса и свойств. Модули msgpack и cbor2
+импортируются, только когда формат выбран для какого-либо подтопика.
+"""
+
+import collections
+import importlib.util
+import json
+import zlib
+
+FORMAT_JSON = 'json'
+FORMAT_MSGPACK = 'msgpack'
+FORMAT_CBOR = 'cbor'
+
+CONTENT_TYPES = {
+    FORMAT_JSON: 'application/json',
+    FORMAT_MSGPACK: 'application/msgpack',
+    FORMAT_CBOR: 'application/cbor',
+}
+
+COMPRESSION_ZLIB = 'zlib'
+COMPRESSION_LEVEL = 6
+
+# payload - str или bytes; content_type и content_encoding - None для JSON по умолчанию
+EncodedPayload = collections.namedtuple('EncodedPayload', 'payload suffix content_type content_encoding')
+
+
+# Модули форматов, кроме JSON
+_MODULES = {
+    FORMAT_MSGPACK: 'msgpack',
+    FORMAT_CBOR: 'cbor2',
+}
+
+
+def _msgpack_serializer():
+    import msgpack
+    return lambda data: msgpack.packb(data, use_bin_type=True)
+
+
+def _cbor_serializer():
+    import cbor2
+    return cbor2.dumps
+
+
+# Формат -> функция, которая импортирует модуль формата и возвращает сериализатор
+_SERIALIZERS = {
+    FORMAT_JSON: lambda: json.dumps,
+    FORMAT_MSGPACK: _msgpack_serializer,
+    FORMAT_CBOR: _cbor_serializer,
+}
+
+
+def available_formats():
+    """Форматы, для которых установлены нужные модули (модули не импортируются)"""
+    return [FORMAT_JSON] + [fmt for fmt, module in _MODULES.items() if importlib.util.find_spec(module) is not None]
+
+
+class TopicEncoding(object):
+    """Настройки кодирования одного подтопика"""
+
+    def __init__(self, config, logger=None):
+        self.format = config.get('format', FORMAT_JSON)
+        if self.format not in _SERIALIZERS:
+            raise ValueError("Неизвестный формат сообщений {}".format(self.format))
+        try:
+            self._dumps = _SERIALIZERS[self.format]()
+        except ImportError:
+            if logger:
+                logger.warning("Модуль для формата %s не установлен, сообщения кодируются в JSON", self.format)
+            self.format = FORMAT_JSON
+            self._dumps = json.dumps
+        self.compress_threshold = config.get('compress_threshold')
+        self.topic_suffix = config.get('topic_suffix', False)
+
+    def encode(self, data):
+        payload = self._dumps(data)
+        content_encoding = None
+        if self.compress_threshold is not None and len(payload) > self.compress_threshold:
+            if isinstance(payload, str):
+                payload = payload.encode('utf-8')
+            payload = zlib.compress(payload, COMPRESSION_LEVEL)
+            content_encoding = COMPRESSION_ZLIB
+
+        suffix = ''
+        if self.topic_suffix:
+            suffix = '.' + self.format
+            if content_encoding:
+                suffix += '.' + content_encoding
+        return EncodedPayload(payload, suffix, CONTENT_TYPES[self.format], content_encoding)
+
+
+class PayloadEncoder(object):
+    """Кодирование данных по подтопикам"""
+
+    def __init__(self, config=None, logger=None):
+        config = config or {}
+        self._encodings = dict(
+            (subtopic, TopicEncoding(settings, logger)) for subtopic, settings in config.items()
+        )
+
+    def __contains__(self, subtopic):
+        return subtopic in self._encodings
+
+    def encode(self, subtopic, data):
+        encoding = self._encodings.get(subtopic)
+        if encoding is None:
+            return EncodedPayload(json.dumps(data), '', None, None)
+        return encoding.encode(data)
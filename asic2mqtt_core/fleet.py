@@ -0,0 +1,175 @@
+"""
+Сводные показатели по всему парку асиков
+
+Сводка обновляется инкрементально: при поступлении результата опроса асика
+из сумм вычитается его предыдущий вклад и прибавляется новый, поэтому
+стоимость обновления не зависит от размера парка. Максимальная температура
+поддерживается кучей с ленивым удалением устаревших записей.
+"""
+
+import heapq
+import json
+import math
+import time
+from array import array
+
+DEFAULT_TOPIC = 'fleet'
+DEFAULT_INTERVAL = 30
+
+STATE_ONLINE = 'online'
+STATE_OFFLINE = 'offline'
+STATE_ERROR = 'error'
+STATES = (STATE_ONLINE, STATE_OFFLINE, STATE_ERROR)
+
+# Показатели асика, которые хранятся в колонках
+FIELDS = ('hashrate', 'temperature', 'accepted', 'rejected')
+
+_NAN = float('nan')
+
+
+class FleetAggregator(object):
+    """Инкрементальная сводка по парку и ее периодическая публикация"""
+
+    def __init__(self, config=None, logger=None, node_id=None):
+        config = config or {}
+        self.logger = logger
+        self.topic = config.get('topic', DEFAULT_TOPIC).rstrip('/')
+        # В режиме кластера сводка узла учитывает только его асики и
+        # публикуется в собственный топик
+        if node_id:
+            self.topic = '{}/{}'.format(self.topic, node_id)
+        self.interval = config.get('interval', DEFAULT_INTERVAL)
+        self._next_publish = 0
+
+        # asic_name -> номер строки в колонках
+        self._slots = {}
+        self._states = []
+        self._versions = array('L')
+        # Колонки показателей; NaN - показатель неизвестен
+        self._columns = dict((field, array('d')) for field in FIELDS)
+
+        self._sums = dict((field, 0.0) for field in FIELDS)
+        self._counts = dict((field, 0) for field in FIELDS)
+        self._state_counts = dict((state, 0) for state in STATES)
+        # Куча (-температура, версия, номер строки) для максимальной температуры
+        self._temp_heap = []
+
+    def _slot(self, asic_name):
+        slot = self._slots.get(asic_name)
+        if slot is None:
+            slot = len(self._states)
+            self._slots[asic_name] = slot
+            self._states.append(None)
+            self._versions.append(0)
+            for column in self._columns.values():
+                column.append(_NAN)
+        return slot
+
+    def _set_state(self, slot, state):
+        previous = self._states[slot]
+        if previous == state:
+            return
+        if previous is not None:
+            self._state_counts[previous] -= 1
+        self._state_counts[state] += 1
+        self._states[slot] = state
+
+    def _set_value(self, slot, field, value):
+        column = self._columns[field]
+        previous = column[slot]
+        if previous == previous:  # не NaN
+            self._sums[field] -= previous
+            self._counts[field] -= 1
+        # NaN и бесконечность навсегда испортили бы сумму, поэтому они
+        # учитываются как отсутствующий показатель
+        if value is None or not math.isfinite(value):
+            column[slot] = _NAN
+            return
+        column[slot] = value
+        self._sums[field] += value
+        self._counts[field] += 1
+
+    def update(self, asic_name, values):
+        """Учет результата успешного опроса асика; values - MinerSnapshot или словарь показателей"""
+        slot = self._slot(asic_name)
+        self._set_state(slot, STATE_ONLINE)
+        for field in FIELDS:
+            self._set_value(slot, field, values.get(field))
+
+        self._versions[slot] += 1
+        temperature = values.get('temperature')
+        if temperature is not None and math.isfinite(temperature):
+            heapq.heappush(self._temp_heap, (-temperature, self._versions[slot], slot))
+            # Устаревшие записи копятся в куче - периодически перестраиваем ее
+            if len(self._temp_heap) > 4 * len(self._states) + 16:
+                self._rebuild_heap()
+
+    def set_state(self, asic_name, state):
+        """Асик недоступен или опрос завершился ошибкой: его показатели исключаются"""
+        slot = self._slot(asic_name)
+        self._set_state(slot, state)
+        for field in FIELDS:
+            self._set_value(slot, field, None)
+        self._versions[slot] += 1
+
+    def forget(self, asic_name):
+        """Асик больше не опрашивается этим экземпляром (например, перешел к другому узлу кластера)"""
+        slot = self._slots.get(asic_name)
+        if slot is None or self._states[slot] is None:
+            return
+        self._state_counts[self._states[slot]] -= 1
+        self._states[slot] = None
+        for field in FIELDS:
+            self._set_value(slot, field, None)
+        self._versions[slot] += 1
+
+    def _rebuild_heap(self):
+        temperatures = self._columns['temperature']
+        self._temp_heap = [
+            (-temperatures[slot], self._versions[slot], slot)
+            for slot in range(len(self._states))
+            if temperatures[slot] == temperatures[slot]
+        ]
+        heapq.heapify(self._temp_heap)
+
+    def max_temperature(self):
+        heap = self._temp_heap
+        while heap:
+            temperature, version, slot = heap[0]
+            if self._versions[slot] == version:
+                return -temperature
+            heapq.heappop(heap)
+        return None
+
+    def summary(self):
+        """Текущая сводка по парку"""
+        temp_count = self._counts['temperature']
+        accepted = self._sums['accepted']
+        rejected = self._sums['rejected']
+        shares = accepted + rejected
+        return {
+            'hashrate': round(self._sums['hashrate'], 3),
+            'temperature_avg': round(self._sums['temperature'] / temp_count, 2) if temp_count else None,
+            'temperature_max': self.max_temperature(),
+            'reject_ratio': round(rejected / shares, 6) if shares else None,
+            'miners': dict(self._state_counts, total=sum(self._state_counts.values())),
+        }
+
+    def publish_due(self, client, now=None):
+        """Публикация сводки, если с прошлой публикации прошел интервал"""
+        now = time.time() if now is None else now
+        if now < self._next_publish:
+            return False
+        self._next_publish = now + self.interval
+
+        summary = self.summary()
+        client.publish('{}/summary'.format(self.topic), json.dumps(summary))
+        for key, value in summary.items():
+            if key == 'miners':
+                for state, count in value.items():
+                    client.publish('{}/miners/{}'.format(self.topic, state), str(count))
+            elif value is not None:
+                client.publish('{}/{}'.format(self.topic, key), str(value))
+        if self.logger:
+            self.logger.debug("Опубликована сводка по парку: %s", summary)
+        return True
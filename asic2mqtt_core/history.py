@@ -0,0 +1,260 @@
+"""
+История ключевых метрик асиков в памяти
+
+Для каждого асика хранится кольцевой буфер значений с полным разрешением и
+два прореженных уровня (1 и 15 минут) с минимумом, средним и максимумом.
+Буферы выделяются целиком при первом опросе асика, поэтому объем памяти на
+асик известен заранее и не растет со временем.
+
+История запрашивается через MQTT: запрос публикуется в ``{topic}/history/get``,
+ответ приходит в ``{topic}/history`` (или в топик из поля response_topic).
+"""
+
+import json
+import math
+import threading
+import time
+from array import array
+
+DEFAULT_METRICS = ('hashrate', 'temperature')
+# 24 часа с шагом 5 секунд, 24 часа по минутам, 7 суток по 15 минут
+DEFAULT_RAW_POINTS = 17280
+DEFAULT_MINUTE_POINTS = 1440
+DEFAULT_QUARTER_POINTS = 672
+
+TIER_RAW = 'raw'
+TIER_MINUTE = '1m'
+TIER_QUARTER = '15m'
+
+_NAN = float('nan')
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _float_column(capacity):
+    return array('f', [_NAN]) * capacity
+
+
+def _value(value):
+    """Значение для JSON: NaN (нет данных) превращается в null"""
+    return None if math.isnan(value) else round(value, 3)
+
+
+class RawSeries(object):
+    """Кольцевой буфер значений метрик с полным разрешением"""
+
+    def __init__(self, capacity, metrics):
+        self.capacity = capacity
+        self.timestamps = array('I', [0]) * capacity
+        self.values = dict((metric, _float_column(capacity)) for metric in metrics)
+        self.head = 0
+        self.size = 0
+
+    def add(self, timestamp, values):
+        index = self.head
+        self.timestamps[index] = timestamp
+        for metric, column in self.values.items():
+            value = values.get(metric)
+            column[index] = _NAN if value is None else value
+        self.head = (index + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def _indexes(self):
+        start = (self.head - self.size) % self.capacity
+        return ((start + i) % self.capacity for i in range(self.size))
+
+    def points(self, metric, since=0):
+        column = self.values[metric]
+        return [[self.timestamps[i], _value(column[i])]
+                for i in self._indexes() if self.timestamps[i] >= since]
+
+    def nbytes(self):
+        return self.capacity * (self.timestamps.itemsize + 4 * len(self.values))
+
+
+class DownsampledSeries(object):
+    """Кольцевой буфер агрегатов min/avg/max по интервалам фиксированной длины"""
+
+    def __init__(self, bucket, capacity, metrics):
+        self.bucket = bucket
+        self.capacity = capacity
+        self.timestamps = array('I', [0]) * capacity
+        self.columns = dict(
+            (metric, (_float_column(capacity), _float_column(capacity), _float_column(capacity)))
+            for metric in metrics
+        )
+        self.head = 0
+        self.size = 0
+        # Текущий незавершенный интервал: начало и [count, sum, min, max] по метрикам
+        self._current = None
+        self._acc = dict((metric, [0, 0.0, _NAN, _NAN]) for metric in metrics)
+
+    def add(self, timestamp, values):
+        start = timestamp - timestamp % self.bucket
+        if self._current is not None and start != self._current:
+            self._flush()
+        self._current = start
+        for metric, acc in self._acc.items():
+            value = values.get(metric)
+            if value is None:
+                continue
+            if acc[0] == 0:
+                acc[2] = acc[3] = value
+            else:
+                acc[2] = min(acc[2], value)
+                acc[3] = max(acc[3], value)
+            acc[0] += 1
+            acc[1] += value
+
+    def _aggregate(self, acc):
+        if acc[0] == 0:
+            return _NAN, _NAN, _NAN
+        return acc[2], acc[1] / acc[0], acc[3]
+
+    def _flush(self):
+        index = self.head
+        self.timestamps[index] = self._current
+        for metric, acc in self._acc.items():
+            mins, avgs, maxs = self.columns[metric]
+            mins[index], avgs[index], maxs[index] = self._aggregate(acc)
+            acc[:] = [0, 0.0, _NAN, _NAN]
+        self.head = (index + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def points(self, metric, since=0):
+        mins, avgs, maxs = self.columns[metric]
+        start = (self.head - self.size) % self.capacity
+        result = []
+        for i in range(self.size):
+            index = (start + i) % self.capacity
+            if self.timestamps[index] >= since:
+                result.append([self.timestamps[index], _value(mins[index]),
+                               _value(avgs[index]), _value(maxs[index])])
+        # Незавершенный интервал тоже попадает в ответ
+        if self._current is not None and self._current >= since:
+            result.append([self._current] + [_value(v) for v in self._aggregate(self._acc[metric])])
+        return result
+
+    def nbytes(self):
+        return self.capacity * (self.timestamps.itemsize + 3 * 4 * len(self.columns))
+
+
+class MinerHistory(object):
+    """История метрик одного асика"""
+
+    def __init__(self, metrics, raw_points, minute_points, quarter_points):
+        self.tiers = {
+            TIER_RAW: RawSeries(raw_points, metrics),
+            TIER_MINUTE: DownsampledSeries(60, minute_points, metrics),
+            TIER_QUARTER: DownsampledSeries(15 * 60, quarter_points, metrics),
+        }
+
+    def add(self, timestamp, values):
+        for tier in self.tiers.values():
+            tier.add(timestamp, values)
+
+    def nbytes(self):
+        return sum(tier.nbytes() for tier in self.tiers.values())
+
+
+class HistoryStore(object):
+    """История метрик всех асиков и обработка запросов к ней"""
+
+    def __init__(self, config=None, asics=None, logger=None, owns=None):
+        config = config or {}
+        self.logger = logger
+        # Проверка, что асик опрашивает этот узел кластера: запросы к истории
+        # асиков других узлов остаются без ответа, на них отвечает владелец
+        self.owns = owns
+        self.metrics = tuple(config.get('metrics', DEFAULT_METRICS))
+        self.raw_points = config.get('raw_points', DEFAULT_RAW_POINTS)
+        self.minute_points = config.get('minute_points', DEFAULT_MINUTE_POINTS)
+        self.quarter_points = config.get('quarter_points', DEFAULT_QUARTER_POINTS)
+        # topic -> asic_name для обработки запросов
+        self.topics = dict(
+            (asic_config['topic'], asic_name)
+            for asic_name, asic_config in (asics or {}).items() if asic_config.get('topic')
+        )
+        self._miners = {}
+        self._lock = threading.Lock()
+
+    def bytes_per_miner(self):
+        return MinerHistory(self.metrics, self.raw_points, self.minute_points, self.quarter_points).nbytes()
+
+    def record(self, asic_name, values, now=None):
+        timestamp = int(time.time() if now is None else now)
+        with self._lock:
+            history = self._miners.get(asic_name)
+            if history is None:
+                history = MinerHistory(self.metrics, self.raw_points, self.minute_points, self.quarter_points)
+                self._miners[asic_name] = history
+            history.add(timestamp, values)
+
+    def query(self, asic_name, metric, tier=TIER_RAW, since=0, limit=None):
+        """Точки истории: [ts, value] для raw и [ts, min, avg, max] для прореженных уровней"""
+        if metric not in self.metrics:
+            raise ValueError("Метрика {} не сохраняется".format(metric))
+        with self._lock:
+            history = self._miners.get(asic_name)
+            if history is None:
+                return []
+            try:
+                series = history.tiers[tier]
+            except KeyError:
+                raise ValueError("Неизвестный уровень истории {}".format(tier))
+            points = series.points(metric, since)
+        if limit:
+            points = points[-limit:]
+        return points
+
+    def subscribe(self, client):
+        """Подписка на запросы истории для всех асиков"""
+        for topic in self.topics:
+            request_topic = '{}/history/get'.format(topic)
+            client.message_callback_add(request_topic, self._on_request)
+            client.subscribe(request_topic)
+
+    def handle_request(self, topic, payload):
+        """Ответ на запрос истории: (топик ответа, данные)"""
+        asic_name = self.topics.get(topic)
+        try:
+            request = json.loads(payload or '{}')
+        except ValueError:
+            request = {}
+        if not isinstance(request, dict):
+            request = {}
+        response_topic = request.get('response_topic')
+        if not response_topic or not isinstance(response_topic, str):
+            response_topic = '{}/history'.format(topic)
+        response = {
+            'metric': request.get('metric', self.metrics[0]),
+            'tier': request.get('tier', TIER_RAW),
+        }
+        if 'id' in request:
+            response['id'] = request['id']
+        since = request.get('since', 0)
+        limit = request.get('limit')
+        # Запрос приходит из сети: неверные типы полей дают ответ с ошибкой
+        if not isinstance(response['metric'], str) or not isinstance(response['tier'], str):
+            response['error'] = "Поля metric и tier должны быть строками"
+        elif not _is_number(since):
+            response['error'] = "Поле since должно быть числом"
+        elif limit is not None and not (_is_number(limit) and limit == int(limit) and limit >= 0):
+            response['error'] = "Поле limit должно быть неотрицательным целым числом"
+        else:
+            try:
+                response['points'] = self.query(asic_name, response['metric'], response['tier'],
+                                                since, int(limit) if limit is not None else None)
+            except ValueError as e:
+                response['error'] = str(e)
+        return response_topic, response
+
+    def _on_request(self, client, userdata, message):
+        topic = message.topic[:-len('/history/get')]
+        asic_name = self.topics.get(topic)
+        if self.owns is not None and asic_name is not None and not self.owns(asic_name):
+            return
+        response_topic, response = self.handle_request(topic, message.payload.decode('utf-8', 'replace'))
+        client.publish(response_topic, json.dumps(response))
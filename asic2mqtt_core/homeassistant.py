@@ -0,0 +1,137 @@
+"""
+MQTT discovery для Home Assistant
+
+Конфигурация сенсоров публикуется с флагом retain один раз - после первого
+успешного опроса асика. Повторная публикация происходит только при изменении
+набора сенсоров (например, после смены прошивки) или после birth-сообщения
+Home Assistant, но не на каждом цикле.
+"""
+
+import hashlib
+import json
+import re
+import threading
+
+from asic2mqtt_core.drivers import extract
+
+DEFAULT_DISCOVERY_PREFIX = 'homeassistant'
+DEFAULT_STATUS_TOPIC = 'homeassistant/status'
+# Сообщение, которое Home Assistant публикует в status-топик после запуска
+BIRTH_PAYLOAD = 'online'
+
+
+def object_id(text):
+    """Идентификатор для топика и unique_id: латиница, цифры и подчеркивания"""
+    return re.sub(r'[^a-z0-9_]+', '_', text.lower()).strip('_')
+
+
+def value_template(path):
+    """Jinja-шаблон Home Assistant для извлечения значения из JSON"""
+    parts = ''.join('[{}]'.format(key if isinstance(key, int) else repr(key)) for key in path)
+    return '{{{{ value_json{} }}}}'.format(parts)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class DiscoveryPublisher(object):
+    """Публикация конфигурации сенсоров асиков для Home Assistant"""
+
+    def __init__(self, client, config=None, logger=None):
+        config = config or {}
+        self.client = client
+        self.logger = logger
+        self.prefix = config.get('discovery_prefix', DEFAULT_DISCOVERY_PREFIX)
+        self.status_topic = config.get('status_topic', DEFAULT_STATUS_TOPIC)
+        # asic_name -> (набор команд, хэш схемы, опубликованные object_id)
+        self._published = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, client=None):
+        """Подписка на birth-сообщение Home Assistant"""
+        client = client or self.client
+        client.message_callback_add(self.status_topic, self._on_status)
+        client.subscribe(self.status_topic)
+
+    def _on_status(self, client, userdata, message):
+        if message.payload.decode('utf-8', 'replace').strip() == BIRTH_PAYLOAD:
+            if self.logger:
+                self.logger.info("Home Assistant перезапущен, конфигурация сенсоров будет отправлена повторно")
+            self.request_republish()
+
+    def request_republish(self):
+        with self._lock:
+            self._published.clear()
+
+    def build(self, asic_name, driver, topic, capabilities, results):
+        """Конфигурация сенсоров, значения которых есть в результатах опроса"""
+        unique_prefix = 'asic2mqtt_{}'.format(object_id(asic_name))
+        device = {
+            'identifiers': [unique_prefix],
+            'name': asic_name,
+        }
+        if driver.manufacturer:
+            device['manufacturer'] = driver.manufacturer
+
+        configs = {}
+        for sensor in driver.sensors:
+            if sensor.command not in capabilities or sensor.command not in results:
+                continue
+            if not _is_number(extract(results[sensor.command], sensor.path)):
+                continue
+
+            sensor_id = object_id(sensor.name)
+            payload = {
+                'name': sensor.name,
+                'unique_id': '{}_{}'.format(unique_prefix, sensor_id),
+                'state_topic': '{}/{}'.format(topic, driver.topic_for(sensor.command)),
+                'value_template': value_template(sensor.path),
+                'state_class': 'measurement',
+                'device': device,
+            }
+            if sensor.unit:
+                payload['unit_of_measurement'] = sensor.unit
+            if sensor.device_class:
+                payload['device_class'] = sensor.device_class
+            configs[sensor_id] = json.dumps(payload, sort_keys=True)
+        return configs
+
+    def config_topic(self, asic_name, sensor_id):
+        return '{}/sensor/asic2mqtt_{}/{}/config'.format(self.prefix, object_id(asic_name), sensor_id)
+
+    def update(self, asic_name, driver, topic, capabilities, results):
+        """
+        Публикация конфигурации после опроса асика.
+
+        Пока набор поддерживаемых команд не меняется и повторная публикация
+        не запрошена, метод ничего не делает.
+        """
+        with self._lock:
+            published = self._published.get(asic_name)
+        if published is not None and published[0] == capabilities:
+            return False
+
+        configs = self.build(asic_name, driver, topic, capabilities, results)
+        if not configs:
+            return False
+
+        digest = hashlib.sha1(json.dumps(configs, sort_keys=True).encode('utf-8')).hexdigest()
+        if published is not None and published[1] == digest:
+            with self._lock:
+                self._published[asic_name] = (capabilities, digest, published[2])
+            return False
+
+        for sensor_id, payload in configs.items():
+            self.client.publish(self.config_topic(asic_name, sensor_id), payload, retain=True)
+
+        # Удаляем из Home Assistant сенсоры, которых больше нет
+        if published is not None:
+            for sensor_id in published[2] - set(configs):
+                self.client.publish(self.config_topic(asic_name, sensor_id), '', retain=True)
+
+        with self._lock:
+            self._published[asic_name] = (capabilities, digest, frozenset(configs))
+        if self.logger:
+            self.logger.info("Отправлена конфигурация %d сенсоров Home Assistant для %s", len(configs), asic_name)
+        return True
@@ -0,0 +1,83 @@
+"""
+Вспомогательные средства логгирования
+
+Запись в файл и консоль вынесена в отдельный поток (QueueHandler и
+QueueListener), поэтому медленный диск не блокирует цикл опроса: вызов
+logger.* только кладет запись в очередь, а форматирование сообщения
+выполняется в потоке QueueListener.
+
+RateLimiter ограничивает повторяющиеся сообщения по ключу: асик, который
+недоступен сутки, пишет в лог одну строку за окно, а не одну за цикл.
+"""
+
+import logging
+import logging.handlers
+import time
+
+DEFAULT_WINDOW = 60
+DEFAULT_MAX_WINDOW = 60 * 60
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который не форматирует запись в вызывающем потоке.
+
+    Стандартный prepare() подставляет аргументы в сообщение до постановки в
+    очередь; здесь это откладывается до обработчиков в потоке QueueListener.
+    Очередь не покидает процесс, поэтому запись можно передать как есть.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class RateLimiter(object):
+    """
+    Ограничение частоты сообщений по ключу с экспоненциальным окном.
+
+    Первое сообщение по ключу пропускается, следующие подавляются до
+    истечения окна; после каждого пропущенного сообщения окно удваивается
+    до max_window. reset() сбрасывает окно, когда проблема устранена.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, max_window=DEFAULT_MAX_WINDOW):
+        self.window = window
+        self.max_window = max_window
+        # key -> [время следующего разрешенного сообщения, текущее окно, подавлено]
+        self._state = {}
+
+    def allow(self, key, now=None):
+        """
+        Можно ли записать сообщение по ключу. Возвращает (разрешено, число
+        подавленных с прошлого разрешенного сообщения).
+        """
+        now = time.time() if now is None else now
+        state = self._state.get(key)
+        if state is None:
+            self._state[key] = [now + self.window, self.window, 0]
+            return True, 0
+
+        if now < state[0]:
+            state[2] += 1
+            return False, state[2]
+
+        suppressed = state[2]
+        state[1] = min(state[1] * 2, self.max_window)
+        state[0] = now + state[1]
+        state[2] = 0
+        return True, suppressed
+
+    def reset(self, key):
+        """Сброс окна; возвращает True, если по ключу были сообщения"""
+        return self._state.pop(key, None) is not None
+
+    def log(self, logger, level, key, msg, *args):
+        """Запись сообщения в лог, если это разрешено для ключа"""
+        allowed, suppressed = self.allow(key)
+        if not allowed:
+            return False
+        if suppressed:
+            msg += " (повторилось еще %d раз)"
+            args += (suppressed,)
+        logger.log(level, msg, *args)
+        return True
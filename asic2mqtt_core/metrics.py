@@ -0,0 +1,128 @@
+"""
+Публикация отдельных метрик в собственные подтопики
+
+Метрика задается путем вида ``команда/ключ/индекс/ключ``, например
+``stats/STATS/1/GHS 5s``. Вместо команды путь может начинаться с имени
+производных данных драйвера (Driver.derived), например
+``chains/*/failed_chips``. Сегменты пути могут содержать шаблоны fnmatch
+(``fan[0-9]*``, ``*``): такой путь дает по подтопику на каждое совпадение,
+например ``{topic}/fan/fan1``.
+
+Строки путей разбираются один раз для драйвера, и пути без шаблонов на
+каждом цикле дают прямой доступ по ключам. Шаблоны раскрываются по данным
+каждого опроса: у асиков одной прошивки может быть разное число цепей и
+устройств, а у одного асика цепь может пропасть и вернуться.
+"""
+
+from fnmatch import fnmatchcase
+
+from asic2mqtt_core.drivers import extract
+
+WILDCARD_CHARS = '*?['
+
+
+def parse_path(text):
+    """Разбор строки пути в (команда, кортеж ключей и индексов)"""
+    parts = text.split('/')
+    if len(parts) < 2 or not parts[0]:
+        raise ValueError("Путь метрики должен начинаться с команды: {}".format(text))
+    path = tuple(int(part) if part.isdigit() else part for part in parts[1:])
+    return parts[0], path
+
+
+def is_wildcard(key):
+    return isinstance(key, str) and any(char in key for char in WILDCARD_CHARS)
+
+
+def expand_path(data, path):
+    """
+    Раскрытие шаблонов пути по фактическим данным.
+
+    Возвращает список (суффикс подтопика, конкретный путь).
+    """
+    expanded = [((), ())]
+    for key in path:
+        next_expanded = []
+        for suffix, concrete in expanded:
+            if not is_wildcard(key):
+                next_expanded.append((suffix, concrete + (key,)))
+                continue
+            container = extract(data, concrete)
+            if isinstance(container, dict):
+                matches = [k for k in container if fnmatchcase(k, key)]
+            elif isinstance(container, list):
+                matches = [i for i in range(len(container)) if fnmatchcase(str(i), key)]
+            else:
+                matches = []
+            for match in matches:
+                next_expanded.append((suffix + (str(match),), concrete + (match,)))
+        expanded = next_expanded
+    return expanded
+
+
+def is_scalar(value):
+    return isinstance(value, (int, float, str)) and not isinstance(value, bool)
+
+
+class MetricExtractor(object):
+    """Извлечение настроенных метрик из результатов опроса асика"""
+
+    def __init__(self, config=None, logger=None):
+        config = config or {}
+        self.logger = logger
+        # driver.name -> [(имя метрики, команда, путь)], разобранные из конфигурации
+        self._specs = {}
+        for driver_name, metrics in config.get('metrics', {}).items():
+            self._specs[driver_name] = [(name,) + parse_path(text) for name, text in metrics.items()]
+        # driver.name -> [(имя метрики, команда, путь, есть ли в пути шаблоны)]
+        self._plans = {}
+
+    def specs_for(self, driver):
+        specs = self._specs.get(driver.name)
+        if specs is None:
+            # Метрики по умолчанию из драйвера разбираются один раз
+            specs = [(name,) + parse_path(text) for name, text in driver.metrics.items()]
+            self._specs[driver.name] = specs
+        return specs
+
+    def plan_for(self, driver):
+        """План извлечения драйвера: разобранные пути с признаком шаблона"""
+        plan = self._plans.get(driver.name)
+        if plan is None:
+            plan = [(name, command, path, any(is_wildcard(key) for key in path))
+                    for name, command, path in self.specs_for(driver)]
+            self._plans[driver.name] = plan
+            if self.logger:
+                self.logger.debug("Построен план извлечения %d метрик для %s", len(plan), driver.name)
+        return plan
+
+    def extract(self, driver, results, derived_only=False, derived=None):
+        """
+        Список (подтопик, значение) для публикации; derived_only - только
+        метрики производных данных драйвера. В derived запоминаются
+        вычисленные производные данные, чтобы повторный вызов для того же
+        опроса их не пересчитывал.
+        """
+        values = []
+        # Производные данные вычисляются не больше одного раза за опрос
+        derived = {} if derived is None else derived
+        for name, command, path, wildcard in self.plan_for(driver):
+            if derived_only and command not in driver.derived:
+                continue
+            data = results.get(command)
+            if data is None and command in driver.derived:
+                if command not in derived:
+                    derived[command] = driver.derived[command](results)
+                data = derived[command]
+            if data is None:
+                continue
+            if not wildcard:
+                value = extract(data, path)
+                if is_scalar(value):
+                    values.append((name, value))
+                continue
+            for suffix, concrete in expand_path(data, path):
+                value = extract(data, concrete)
+                if is_scalar(value):
+                    values.append(('/'.join((name,) + suffix), value))
+        return values
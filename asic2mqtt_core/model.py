@@ -0,0 +1,78 @@
+"""
+Нормализованный снимок состояния асика
+
+MinerSnapshot создается драйвером один раз на каждый успешный опрос и
+передается всем потребителям, которым нужны показатели асика, а не сырые
+ответы его API: сводке по парку, истории, кэшу API. Поля одинаковы для
+всех драйверов, числа хранятся как float, значения по цепям - в
+array('f'). Объект со __slots__ и интернированными строками занимает
+сотни байт вместо десятков килобайт вложенных словарей ответа.
+"""
+
+import sys
+from array import array
+
+# Скалярные показатели: хэшрейт (GH/s), максимальная температура (°C),
+# принятые и отклоненные шары, потребляемая мощность (W)
+FIELDS = ('hashrate', 'temperature', 'accepted', 'rejected', 'power')
+# Показатели по цепям
+CHAIN_FIELDS = ('chain_hashrate', 'chain_temps')
+
+
+def _number(value):
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _chain_values(values):
+    return array('f', (value if value is not None else float('nan') for value in values))
+
+
+class MinerSnapshot(object):
+    """Показатели асика по результатам одного опроса"""
+
+    __slots__ = ('asic_name', 'driver', 'poll_ts', 'latency') + FIELDS + CHAIN_FIELDS
+
+    def __init__(self, asic_name, driver, poll_ts=None, latency=None, chain_hashrate=(), chain_temps=(),
+                 **values):
+        self.asic_name = sys.intern(asic_name)
+        self.driver = sys.intern(driver) if driver else None
+        self.poll_ts = poll_ts
+        self.latency = latency
+        for field in FIELDS:
+            setattr(self, field, _number(values.get(field)))
+        self.chain_hashrate = _chain_values(chain_hashrate)
+        self.chain_temps = _chain_values(chain_temps)
+
+    def get(self, field, default=None):
+        """Значение показателя по имени, как у словаря summarize()"""
+        value = getattr(self, field, None) if field in self.__slots__ else None
+        return default if value is None else value
+
+    def values(self):
+        """Известные скалярные показатели: {имя: значение}"""
+        return dict((field, getattr(self, field)) for field in FIELDS if getattr(self, field) is not None)
+
+    def as_dict(self):
+        data = {'name': self.asic_name, 'driver': self.driver, 'poll_ts': self.poll_ts, 'latency': self.latency}
+        data.update(self.values())
+        for field in CHAIN_FIELDS:
+            data[field] = [None if value != value else round(value, 3) for value in getattr(self, field)]
+        return data
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+        # После передачи из процесса опроса строки снова интернируются
+        self.asic_name = sys.intern(self.asic_name)
+        if self.driver:
+            self.driver = sys.intern(self.driver)
+
+    def __repr__(self):
+        return 'MinerSnapshot({})'.format(', '.join(
+            '{}={!r}'.format(slot, getattr(self, slot)) for slot in self.__slots__[:4] + FIELDS))
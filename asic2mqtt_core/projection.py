@@ -0,0 +1,234 @@
+"""
+Проекция JSON-ответов перед публикацией
+
+Для каждого подтопика в конфигурации задаются селекторы include/exclude в том
+же формате, что и пути метрик (без команды в начале): ``STATS/*/freq*``.
+Селекторы один раз компилируются в дерево функций, которое применяется к
+ответу до json.dumps, поэтому сериализуются и отправляются брокеру только
+нужные поля. Не затронутые селекторами поддеревья не копируются.
+
+В списках позиции элементов сохраняются: невыбранные элементы заменяются на
+null, чтобы индексы вроде ``STATS[1]`` оставались прежними.
+"""
+
+import json
+import logging
+from fnmatch import fnmatchcase
+
+from asic2mqtt_core.encoding import PayloadEncoder
+from asic2mqtt_core.metrics import is_wildcard
+
+# Маркер конца селектора в дереве (сегменты селекторов - всегда строки)
+_LEAF = None
+# Маркер "ничего не выбрано" в режиме include
+_MISSING = object()
+# Маркер удаления в режиме exclude
+_DROP = object()
+
+
+def _build_tree(selectors):
+    tree = {}
+    for selector in selectors:
+        node = tree
+        for part in selector.strip('/').split('/'):
+            node = node.setdefault(part, {})
+        node[_LEAF] = True
+    return tree
+
+
+def _split(tree):
+    literal = {}
+    patterns = []
+    for key, child in tree.items():
+        if key is _LEAF:
+            continue
+        if is_wildcard(key):
+            patterns.append((key, child))
+        else:
+            literal[key] = child
+    return literal, patterns
+
+
+def _merge(trees):
+    """Объединение поддеревьев всех селекторов, подходящих под один ключ"""
+    if len(trees) == 1:
+        return trees[0]
+    merged = {}
+    for tree in trees:
+        for key, child in tree.items():
+            merged.setdefault(key, []).append(child)
+    return {key: True if key is _LEAF else _merge(children) for key, children in merged.items()}
+
+
+def _children(tree, compile_tree):
+    """
+    Литеральные ключи узла, есть ли среди ключей маски, и функция: ключ ->
+    скомпилированное поддерево или None. Под ключ может подходить литерал и
+    несколько масок (``STATS/1/fan1`` и ``STATS/*/GHS 5s``), тогда их
+    поддеревья объединяются. Поддерево компилируется один раз на ключ.
+    """
+    literal, patterns = _split(tree)
+    compiled = {}
+
+    def child_for(key):
+        try:
+            return compiled[key]
+        except KeyError:
+            pass
+        subtrees = [literal[key]] if key in literal else []
+        subtrees.extend(child for pattern, child in patterns if fnmatchcase(key, pattern))
+        fn = compiled[key] = compile_tree(_merge(subtrees)) if subtrees else None
+        return fn
+
+    for key in literal:
+        child_for(key)
+    return list(literal), bool(patterns), child_for
+
+
+def _compile_include(tree):
+    if _LEAF in tree:
+        return lambda value: value
+
+    literal, patterns, child_for = _children(tree, _compile_include)
+
+    def project(value):
+        if isinstance(value, dict):
+            out = {}
+            for key in (value if patterns else [key for key in literal if key in value]):
+                fn = child_for(key)
+                if fn is not None:
+                    item = fn(value[key])
+                    if item is not _MISSING:
+                        out[key] = item
+            return out if out else _MISSING
+
+        if isinstance(value, list):
+            out = []
+            found = False
+            for index, item in enumerate(value):
+                fn = child_for(str(index))
+                item = fn(item) if fn is not None else _MISSING
+                if item is _MISSING:
+                    out.append(None)
+                else:
+                    out.append(item)
+                    found = True
+            if not found:
+                return _MISSING
+            while out and out[-1] is None:
+                out.pop()
+            return out
+
+        return _MISSING
+
+    return project
+
+
+def _compile_exclude(tree):
+    if _LEAF in tree:
+        return _DROP
+
+    literal, patterns, child_for = _children(tree, _compile_exclude)
+
+    def project(value):
+        if isinstance(value, dict):
+            if patterns:
+                keys = list(value)
+            else:
+                keys = [key for key in literal if key in value]
+            out = None
+            for key in keys:
+                fn = child_for(key)
+                if fn is None:
+                    continue
+                if out is None:
+                    out = dict(value)
+                if fn is _DROP:
+                    del out[key]
+                else:
+                    out[key] = fn(value[key])
+            return value if out is None else out
+
+        if isinstance(value, list):
+            out = None
+            for index, item in enumerate(value):
+                fn = child_for(str(index))
+                if fn is None:
+                    continue
+                if out is None:
+                    out = list(value)
+                out[index] = None if fn is _DROP else fn(item)
+            return value if out is None else out
+
+        return value
+
+    return project
+
+
+def compile_projection(include=None, exclude=None):
+    """Функция проекции по спискам селекторов include и exclude"""
+    steps = []
+    if include:
+        include_fn = _compile_include(_build_tree(include))
+
+        def apply_include(value):
+            value = include_fn(value)
+            return {} if value is _MISSING else value
+        steps.append(apply_include)
+
+    if exclude:
+        exclude_fn = _compile_exclude(_build_tree(exclude))
+        if exclude_fn is _DROP:
+            steps.append(lambda value: {})
+        else:
+            steps.append(exclude_fn)
+
+    if not steps:
+        return lambda value: value
+    if len(steps) == 1:
+        return steps[0]
+    return lambda value: steps[1](steps[0](value))
+
+
+class PayloadProjector(object):
+    """Проекция данных по подтопикам и учет размера публикуемых сообщений"""
+
+    def __init__(self, config=None, logger=None, encoder=None):
+        config = config or {}
+        self.logger = logger
+        self.encoder = encoder or PayloadEncoder()
+        self._projections = {
+            subtopic: compile_projection(selectors.get('include'), selectors.get('exclude'))
+            for subtopic, selectors in config.items()
+        }
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    def project(self, subtopic, data):
+        projection = self._projections.get(subtopic)
+        if projection is None:
+            return data
+        return projection(data)
+
+    def encode(self, subtopic, data):
+        """Проекция и кодирование данных подтопика (см. encoding.py)"""
+        encoded = self.encoder.encode(subtopic, self.project(subtopic, data))
+        self.bytes_after += len(encoded.payload)
+        # Размер исходного JSON считается только когда отчет будет выведен в лог
+        if self.logger and self.logger.isEnabledFor(logging.INFO):
+            if subtopic in self._projections or subtopic in self.encoder:
+                self.bytes_before += len(json.dumps(data))
+            else:
+                self.bytes_before += len(encoded.payload)
+        return encoded
+
+    def report(self):
+        """Вывод в лог размера сообщений за цикл до и после проекции и кодирования"""
+        if self.logger and self.bytes_before and self.bytes_before != self.bytes_after:
+            self.logger.info("Размер сообщений за цикл: %d байт до проекции, %d байт после (%.0f%%)",
+                             self.bytes_before, self.bytes_after,
+                             100.0 * self.bytes_after / self.bytes_before)
+        self.reset_counters()
@@ -0,0 +1,129 @@
+"""
+Публикация сообщений в MQTT с поддержкой MQTT v5
+
+В режиме MQTT v5 (``"protocol": 5`` в секции mqtt) для постоянного набора
+топиков асиков используются алиасы: полное имя топика передается брокеру
+один раз за соединение, дальше сообщение отправляется с пустым топиком и
+номером алиаса. Телеметрия получает срок жизни (Message Expiry Interval),
+чтобы устаревшие значения не задерживались у брокера, и пользовательские
+свойства - время опроса и задержку ответа асика.
+
+В режиме MQTT 3.1.1 (по умолчанию) сообщения публикуются как раньше.
+"""
+
+import math
+import threading
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+PROTOCOL_V311 = '3.1.1'
+PROTOCOL_V5 = '5'
+PROTOCOLS = {
+    PROTOCOL_V311: mqtt.MQTTv311,
+    PROTOCOL_V5: mqtt.MQTTv5,
+}
+
+# Срок жизни телеметрии по умолчанию - в интервалах опроса
+DEFAULT_EXPIRY_INTERVALS = 3
+# Сколько алиасов клиент готов использовать; фактический предел задает брокер
+DEFAULT_TOPIC_ALIASES = 65535
+
+
+def protocol_version(config):
+    """Версия протокола из секции mqtt конфигурации"""
+    protocol = str(config.get('protocol', PROTOCOL_V311))
+    if protocol not in PROTOCOLS:
+        raise ValueError("Неизвестная версия протокола MQTT {}".format(protocol))
+    return protocol
+
+
+def create_client(config):
+    """Клиент MQTT нужной версии протокола"""
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=PROTOCOLS[protocol_version(config)])
+    username = config.get('username', '')
+    password = config.get('password', '')
+    if username and password:
+        client.username_pw_set(username, password)
+    return client
+
+
+class Publisher(object):
+    """
+    Обертка над клиентом paho с тем же методом publish().
+
+    Для каждого брокера создается в BrokerTarget (brokers.py). Алиасы
+    действуют в пределах соединения, поэтому on_connect() и on_disconnect()
+    должны вызываться из соответствующих обработчиков клиента.
+    """
+
+    def __init__(self, client, config=None, logger=None, interval=None):
+        config = config or {}
+        self.client = client
+        self.logger = logger
+        self.v5 = protocol_version(config) == PROTOCOL_V5
+        self.expiry = config.get('message_expiry')
+        if self.expiry is None and interval:
+            self.expiry = int(math.ceil(DEFAULT_EXPIRY_INTERVALS * interval))
+        self.alias_limit = config.get('topic_aliases', DEFAULT_TOPIC_ALIASES)
+        # топик -> номер алиаса в текущем соединении
+        self._aliases = {}
+        self._alias_max = 0
+        self._lock = threading.Lock()
+
+    def on_connect(self, properties=None):
+        """Новое соединение: алиасы прежнего соединения больше не действуют"""
+        server_max = getattr(properties, 'TopicAliasMaximum', 0) if properties is not None else 0
+        with self._lock:
+            self._aliases.clear()
+            self._alias_max = min(self.alias_limit, server_max) if self.v5 else 0
+        if self.logger and self.v5:
+            self.logger.info("MQTT v5: брокер разрешает %d алиасов топиков", server_max)
+
+    def on_disconnect(self):
+        with self._lock:
+            self._aliases.clear()
+            self._alias_max = 0
+
+    def _alias(self, topic):
+        """(топик для отправки, номер алиаса или None)"""
+        with self._lock:
+            alias = self._aliases.get(topic)
+            if alias is not None:
+                return '', alias
+            if len(self._aliases) < self._alias_max:
+                alias = self._aliases[topic] = len(self._aliases) + 1
+                return topic, alias
+        return topic, None
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None, user_properties=None,
+                content_type=None, correlation_data=None):
+        """
+        Публикация сообщения.
+
+        user_properties - пары (имя, значение), которые в MQTT v5 передаются
+        как User Property, content_type - как Content Type, correlation_data
+        (bytes) - как Correlation Data; в MQTT 3.1.1 они отбрасываются.
+        """
+        if not self.v5:
+            return self.client.publish(topic, payload, qos, retain)
+
+        if properties is None:
+            properties = Properties(PacketTypes.PUBLISH)
+        # Retained-сообщения (конфигурация Home Assistant) живут, пока их не заменят
+        if self.expiry and not retain:
+            properties.MessageExpiryInterval = self.expiry
+        if content_type:
+            properties.ContentType = content_type
+        if correlation_data is not None:
+            properties.CorrelationData = correlation_data
+        for name, value in user_properties or ():
+            properties.UserProperty = (name, str(value))
+        # Сообщения QoS 1/2 paho повторяет после переподключения, когда алиас
+        # уже недействителен, поэтому алиасы используются только для QoS 0
+        if qos == 0:
+            topic, alias = self._alias(topic)
+            if alias is not None:
+                properties.TopicAlias = alias
+        return self.client.publish(topic, payload, qos, retain, properties)
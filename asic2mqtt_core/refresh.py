@@ -0,0 +1,110 @@
+"""
+Внеплановый опрос асика по запросу через MQTT
+
+Запрос публикуется в ``{topic}/refresh``: пустое сообщение или JSON с
+полями id и response_topic (в MQTT v5 вместо них можно использовать
+свойства Correlation Data и Response Topic). Асик опрашивается сразу, не
+дожидаясь своей очереди в цикле; если его внеплановый опрос уже идет,
+запрос присоединяется к нему. Повторный опрос асика возможен не раньше
+чем через min_interval секунд.
+
+Результаты публикуются в обычные топики асика (в MQTT v5 со свойством
+correlation_id), итог запроса - в ``{topic}/refresh/result`` или в
+указанный топик ответа.
+"""
+
+import json
+import threading
+from collections import namedtuple
+
+# Интервал задается кэшу (MinerCache.min_interval) и действует и на запросы API
+DEFAULT_MIN_INTERVAL = 10
+
+STATUS_RATE_LIMITED = 'rate_limited'
+STATUS_SKIPPED = 'skipped'
+
+# id - идентификатор запроса из JSON, correlation_data - свойство MQTT v5
+RefreshRequest = namedtuple('RefreshRequest', 'id correlation_data response_topic')
+
+
+class RefreshRequests(object):
+    """Прием запросов внепланового опроса и ответы на них"""
+
+    def __init__(self, config, asics, cache, logger=None, owns=None):
+        self.logger = logger
+        self.cache = cache
+        # Проверка, что асик опрашивает этот узел кластера: на запросы к
+        # асикам других узлов отвечают их владельцы
+        self.owns = owns
+        self.topics = dict(
+            (asic_config['topic'], asic_name) for asic_name, asic_config in asics.items()
+            if asic_config.get('topic')
+        )
+
+    def subscribe(self, client):
+        """Подписка на запросы для всех асиков"""
+        for topic in self.topics:
+            request_topic = '{}/refresh'.format(topic)
+            client.message_callback_add(request_topic, self._on_request)
+            client.subscribe(request_topic)
+
+    def parse(self, topic, payload, properties=None):
+        """Запрос из сообщения в {topic}/refresh"""
+        try:
+            request = json.loads(payload or '{}')
+        except ValueError:
+            request = {}
+        if not isinstance(request, dict):
+            request = {}
+        correlation_data = getattr(properties, 'CorrelationData', None)
+        response_topic = (request.get('response_topic') or getattr(properties, 'ResponseTopic', None)
+                          or '{}/refresh/result'.format(topic))
+        request_id = request.get('id')
+        if request_id is None and correlation_data is not None:
+            request_id = correlation_data.decode('utf-8', 'replace')
+        return RefreshRequest(request_id, correlation_data, response_topic)
+
+    def submit(self, asic_name, request, now=None):
+        """
+        Запуск внепланового опроса в отдельном потоке. Возвращает None или,
+        если опрос отклонен, сколько секунд осталось до разрешенного опроса.
+        """
+        retry_after = self.cache.admit(asic_name, now)
+        if retry_after is not None:
+            return retry_after
+        thread = threading.Thread(target=self.cache.refresh, args=(asic_name, request),
+                                  name='asic2mqtt-refresh', daemon=True)
+        thread.start()
+        return None
+
+    def _on_request(self, client, userdata, message):
+        topic = message.topic[:-len('/refresh')]
+        asic_name = self.topics.get(topic)
+        if asic_name is None or (self.owns is not None and not self.owns(asic_name)):
+            return
+        request = self.parse(topic, message.payload.decode('utf-8', 'replace'),
+                             getattr(message, 'properties', None))
+        retry_after = self.submit(asic_name, request)
+        if retry_after is not None:
+            if self.logger:
+                self.logger.debug("Внеплановый опрос %s отклонен, повтор через %.1f с", asic_name, retry_after)
+            client.publish(request.response_topic, json.dumps(self.response(
+                request, STATUS_RATE_LIMITED, retry_after=round(retry_after, 1))))
+        elif self.logger:
+            self.logger.info("Внеплановый опрос %s по запросу %s", asic_name, request.id)
+
+    def response(self, request, status, **fields):
+        response = dict(fields, status=status)
+        if request.id is not None:
+            response['id'] = request.id
+        return response
+
+    def respond(self, publisher, result, requests):
+        """Ответы на запросы после публикации результата опроса"""
+        for request in requests:
+            if result is None:
+                response = self.response(request, STATUS_SKIPPED)
+            else:
+                response = self.response(request, result.state, poll_ts=result.poll_ts, latency=result.latency)
+            publisher.publish(request.response_topic, json.dumps(response),
+                              correlation_data=request.correlation_data)
@@ -0,0 +1,54 @@
+"""
+Распределение асиков между исполнителями
+
+HashRing - консистентное хэширование: каждый исполнитель занимает на кольце
+несколько виртуальных точек, асик достается первому исполнителю по часовой
+стрелке от хэша своего имени. При изменении числа исполнителей переезжает
+только часть асиков, а не весь парк.
+
+rendezvous_owner() - rendezvous-хэширование (HRW) для кластера узлов:
+владелец асика - узел с наибольшим хэшем пары (узел, асик). Состояние не
+нужно, и при уходе узла переезжают только его асики.
+"""
+
+import bisect
+import hashlib
+
+DEFAULT_REPLICAS = 100
+
+
+def hash_key(key):
+    """Стабильный между процессами и запусками 64-битный хэш строки"""
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+def rendezvous_owner(key, nodes):
+    """Узел, которому принадлежит ключ; None, если узлов нет"""
+    if not nodes:
+        return None
+    return max(nodes, key=lambda node: (hash_key('{}/{}'.format(node, key)), node))
+
+
+class HashRing(object):
+    """Кольцо консистентного хэширования"""
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS):
+        self.nodes = list(nodes)
+        self._ring = sorted(
+            (hash_key('{}#{}'.format(node, replica)), node)
+            for node in self.nodes for replica in range(replicas)
+        )
+        self._hashes = [point for point, node in self._ring]
+
+    def node_for(self, key):
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._hashes, hash_key(key)) % len(self._ring)
+        return self._ring[index][1]
+
+    def split(self, items):
+        """Разбиение словаря {ключ: значение} на словари по исполнителям"""
+        shards = dict((node, {}) for node in self.nodes)
+        for key, value in items.items():
+            shards[self.node_for(key)][key] = value
+        return shards
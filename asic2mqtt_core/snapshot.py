@@ -0,0 +1,134 @@
+"""
+Снимок всего парка одним сообщением
+
+Вместо тысяч небольших сообщений за цикл результаты опроса всех асиков
+собираются в один сжатый снимок (zlib или zstd). Снимок публикуется в
+``{topic}`` после каждого цикла или по истечении окна, а рядом в
+``{topic}/manifest`` - небольшой JSON с номером снимка, способом сжатия,
+размерами и перечнем асиков, по которому потребитель решает, нужно ли
+распаковывать снимок. Модуль zstandard импортируется только при сжатии zstd.
+"""
+
+import json
+import time
+import zlib
+
+DEFAULT_TOPIC = 'fleet/snapshot'
+DEFAULT_COMPRESSION = 'zlib'
+DEFAULT_LEVEL = 6
+
+COMPRESSION_NONE = 'none'
+COMPRESSION_ZLIB = 'zlib'
+COMPRESSION_ZSTD = 'zstd'
+
+
+def _zstandard():
+    """Модуль zstandard или None, если он не установлен"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def compress(data, compression, level=DEFAULT_LEVEL):
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(data, level)
+    if compression == COMPRESSION_ZSTD:
+        return _zstandard().ZstdCompressor(level=level).compress(data)
+    return data
+
+
+def decompress(data, compression):
+    """Распаковка снимка по полю compression из манифеста"""
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if compression == COMPRESSION_ZSTD:
+        return _zstandard().ZstdDecompressor().decompress(data)
+    return data
+
+
+class SnapshotBatcher(object):
+    """Накопление результатов опроса и публикация снимка парка"""
+
+    def __init__(self, config=None, logger=None, node_id=None):
+        config = config or {}
+        self.logger = logger
+        self.topic = config.get('topic', DEFAULT_TOPIC).rstrip('/')
+        # В режиме кластера снимок узла содержит только его асики
+        if node_id:
+            self.topic = '{}/{}'.format(self.topic, node_id)
+        # 0 - снимок после каждого цикла, иначе - раз в window секунд
+        self.window = config.get('window', 0)
+        # Публиковать ли по-прежнему данные в топики каждого асика
+        self.per_miner = config.get('per_miner_topics', True)
+        self.level = config.get('level', DEFAULT_LEVEL)
+        self.compression = config.get('compression', DEFAULT_COMPRESSION)
+        if self.compression not in (COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_ZSTD):
+            raise ValueError("Неизвестный способ сжатия снимка {}".format(self.compression))
+        if self.compression == COMPRESSION_ZSTD and _zstandard() is None:
+            if logger:
+                logger.warning("Модуль zstandard не установлен, снимок парка сжимается zlib")
+            self.compression = COMPRESSION_ZLIB
+
+        self.seq = 0
+        self._miners = {}
+        self._next_publish = None
+
+    def add(self, asic_name, topic, data, timestamp=None):
+        """Результат опроса асика: data - данные по подтопикам"""
+        self._miners[asic_name] = {
+            'topic': topic,
+            'ts': int(time.time() if timestamp is None else timestamp),
+            'data': data,
+        }
+
+    def build(self, now=None):
+        """(манифест, сжатое тело снимка) для накопленных результатов"""
+        timestamp = int(time.time() if now is None else now)
+        body = json.dumps({'seq': self.seq, 'ts': timestamp, 'miners': self._miners},
+                          separators=(',', ':')).encode('utf-8')
+        payload = compress(body, self.compression, self.level)
+        manifest = {
+            'seq': self.seq,
+            'ts': timestamp,
+            'topic': self.topic,
+            'compression': self.compression,
+            'size': len(body),
+            'compressed_size': len(payload),
+            'miners': dict(
+                (asic_name, {'topic': miner['topic'], 'ts': miner['ts'], 'subtopics': sorted(miner['data'])})
+                for asic_name, miner in self._miners.items()
+            ),
+        }
+        return manifest, payload
+
+    def publish_due(self, client, now=None, cycle_end=False):
+        """
+        Публикация снимка, если пришло время.
+
+        Без окна снимок отправляется в конце цикла (cycle_end=True), с окном -
+        по его истечении, независимо от границ циклов.
+        """
+        now = time.time() if now is None else now
+        if self.window:
+            if self._next_publish is None:
+                self._next_publish = now + self.window
+            if now < self._next_publish:
+                return False
+            self._next_publish = now + self.window
+        elif not cycle_end:
+            return False
+        if not self._miners:
+            return False
+
+        manifest, payload = self.build(now)
+        # Манифест первым: по нему потребитель знает, как распаковать снимок
+        client.publish('{}/manifest'.format(self.topic), json.dumps(manifest))
+        client.publish(self.topic, payload)
+        if self.logger:
+            self.logger.debug("Опубликован снимок парка %d: %d асиков, %d байт (%d до сжатия)",
+                              self.seq, len(self._miners), manifest['compressed_size'], manifest['size'])
+        self.seq += 1
+        self._miners = {}
+        return True
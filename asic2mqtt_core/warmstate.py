@@ -0,0 +1,147 @@
+"""
+Состояние опроса между перезапусками (теплый старт)
+
+После перезапуска asic2mqtt ничего не знает о парке: каждый асик заново
+проверяет набор поддерживаемых команд, а недоступные асики задерживают
+первый цикл наравне с работающими. WarmState запоминает по результатам
+опроса последнее состояние асика, его драйвер и поддерживаемые команды,
+сохраняет их в JSON-файл при остановке и в конце каждого цикла (процесс
+могут остановить и без штатного завершения) и восстанавливает при запуске.
+
+Команды восстанавливаются, только если конфигурация асика не менялась, и
+с исходным временем проверки, поэтому прошивку асика по-прежнему проверяют
+раз в сутки. Учетные данные в отпечаток конфигурации не входят и на диск
+не попадают. Первый цикл после запуска начинается с асиков, которые были
+доступны, а недоступные опрашиваются последними; внутри этих групп цикл
+продолжается с того места, где остановился: первыми опрашиваются асики,
+которые дольше всех ждут опроса.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from asic2mqtt_core.fleet import STATE_OFFLINE, STATE_ONLINE
+
+DEFAULT_PATH = 'asic2mqtt_state.json'
+# Состояние старше суток не используется
+DEFAULT_MAX_AGE = 24 * 60 * 60
+# Версия формата файла; файл другой версии игнорируется
+FORMAT_VERSION = 1
+# Поля конфигурации асика, которые не учитываются в отпечатке
+CREDENTIAL_FIELDS = ('username', 'password')
+
+
+def config_digest(asic_config):
+    """
+    Отпечаток конфигурации асика: команды зависят от драйвера, поля web и
+    т.п. Учетные данные не учитываются, чтобы их хэш не попадал на диск.
+    """
+    fields = dict((key, value) for key, value in asic_config.items() if key not in CREDENTIAL_FIELDS)
+    data = json.dumps(fields, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+class WarmState(object):
+    """Последнее известное состояние асиков, сохраняемое на диск"""
+
+    def __init__(self, config=None, logger=None):
+        config = config or {}
+        self.logger = logger
+        self.path = config.get('path', DEFAULT_PATH)
+        self.max_age = config.get('max_age', DEFAULT_MAX_AGE)
+        # asic_name -> {state, driver, capabilities, probed_at, poll_ts, latency, config}
+        self.miners = {}
+
+    def update(self, result, asic_config):
+        """Учет результата опроса (PollResult)"""
+        entry = self.miners.setdefault(result.asic_name, {})
+        entry['state'] = result.state
+        entry['poll_ts'] = result.poll_ts
+        if result.state == STATE_OFFLINE:
+            return
+        entry['driver'] = result.driver
+        entry['latency'] = result.latency
+        entry['config'] = config_digest(asic_config)
+        if result.capabilities is not None:
+            capabilities = sorted(result.capabilities)
+            # Время проверки команд не меняется, пока не изменился их набор
+            if entry.get('capabilities') != capabilities:
+                entry['capabilities'] = capabilities
+                entry['probed_at'] = result.poll_ts
+
+    def load(self, now=None):
+        """Чтение файла состояния; False, если его нет или он не подходит"""
+        now = time.time() if now is None else now
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            if self.logger:
+                self.logger.warning("Не удалось прочитать состояние из %s: %s", self.path, e)
+            return False
+
+        if not isinstance(data, dict) or data.get('version') != FORMAT_VERSION:
+            return False
+        if self.max_age and now - data.get('saved_at', 0) > self.max_age:
+            if self.logger:
+                self.logger.info("Состояние в %s устарело и не используется", self.path)
+            return False
+        self.miners = dict((name, entry) for name, entry in data.get('miners', {}).items()
+                           if isinstance(entry, dict))
+        return True
+
+    def save(self, now=None):
+        """Запись состояния во временный файл и замена им прежнего"""
+        data = {
+            'version': FORMAT_VERSION,
+            'saved_at': time.time() if now is None else now,
+            'miners': self.miners,
+        }
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            if self.logger:
+                self.logger.warning("Не удалось сохранить состояние в %s: %s", self.path, e)
+            return False
+        return True
+
+    def restore(self, capabilities, asics):
+        """
+        Восстановление поддерживаемых команд в CapabilityCache для асиков,
+        конфигурация которых не изменилась; возвращает их число
+        """
+        restored = 0
+        for asic_name, asic_config in asics.items():
+            entry = self.miners.get(asic_name)
+            if not entry or entry.get('capabilities') is None or entry.get('probed_at') is None:
+                continue
+            if entry.get('config') != config_digest(asic_config):
+                continue
+            capabilities.set(asic_name, entry['capabilities'], entry['probed_at'])
+            restored += 1
+        return restored
+
+    def order(self, asics):
+        """
+        Асики в порядке первого цикла: сначала доступные при последнем
+        опросе, затем новые и асики с ошибкой, недоступные - последними.
+        Внутри группы раньше опрашиваются асики с более давним опросом.
+        """
+        def rank(item):
+            entry = self.miners.get(item[0], {})
+            state = entry.get('state')
+            poll_ts = entry.get('poll_ts') or 0
+            if state == STATE_ONLINE:
+                return 0, poll_ts
+            if state == STATE_OFFLINE:
+                return 2, poll_ts
+            return 1, poll_ts
+
+        return dict(sorted(asics.items(), key=rank))
@@ -0,0 +1,147 @@
+"""
+Многопроцессный опрос асиков (режим --workers N)
+
+Асики распределяются между процессами опроса консистентным хэшированием
+имени (sharding.HashRing). Каждый процесс сам проверяет доступность,
+опрашивает свои асики и разбирает ответы, а результаты опроса передает в
+основной процесс через очередь multiprocessing. Основной процесс остается
+единственным издателем: публикация, сводка по парку, история и детектор
+аномалий работают так же, как при опросе в одном процессе, и структура
+топиков не меняется.
+
+Процессы запускаются методом spawn, поэтому опрашивающий объект и функция
+цикла должны быть доступны для pickle.
+"""
+
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import signal
+import time
+
+from asic2mqtt_core.drivers import load_plugins
+from asic2mqtt_core.sharding import HashRing
+
+# Все процессы завершили очередной цикл опроса
+CYCLE_END = object()
+# Как часто основной процесс просыпается без результатов, секунд
+POLL_TIMEOUT = 1
+STOP_TIMEOUT = 5
+
+
+def _worker_main(index, cycle, poller, asics, cycle_pause, results, log_queue, level):
+    # Ctrl+C обрабатывает основной процесс, он же останавливает процессы опроса
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger = logging.getLogger(poller.logger.name)
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    logger.setLevel(level)
+    logger.propagate = False
+    load_plugins(logger)
+    poller.setup()
+
+    while True:
+        for result in cycle(poller, asics):
+            results.put((index, result))
+        results.put((index, None))
+        time.sleep(cycle_pause)
+
+
+class WorkerPool(object):
+    """Процессы опроса и прием их результатов"""
+
+    def __init__(self, asics, workers, poller, cycle, logger=None, cycle_pause=0):
+        self.logger = logger
+        self.poller = poller
+        self.cycle = cycle
+        self.cycle_pause = cycle_pause
+        self.shards = HashRing(range(workers)).split(asics)
+        self._context = multiprocessing.get_context('spawn')
+        self._results = self._context.Queue()
+        self._log_queue = self._context.Queue()
+        self._log_listener = None
+        self._processes = {}
+
+    def _spawn(self, index):
+        level = self.logger.getEffectiveLevel() if self.logger else logging.WARNING
+        process = self._context.Process(
+            target=_worker_main, name='asic2mqtt-worker-{}'.format(index),
+            args=(index, self.cycle, self.poller, self.shards[index], self.cycle_pause,
+                  self._results, self._log_queue, level),
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+
+    def start(self):
+        # Записи логов процессов опроса передаются обработчикам основного процесса
+        handlers = self.logger.handlers if self.logger else ()
+        self._log_listener = logging.handlers.QueueListener(self._log_queue, *handlers)
+        self._log_listener.start()
+        for index, shard in self.shards.items():
+            if shard:
+                self._spawn(index)
+        if self.logger:
+            self.logger.info("Запущено процессов опроса: %d (асиков: %s)", len(self._processes),
+                             ', '.join(str(len(self.shards[index])) for index in sorted(self._processes)))
+
+    def _restart_dead(self):
+        """Перезапуск завершившихся процессов опроса; возвращает их номера"""
+        restarted = set()
+        for index, process in list(self._processes.items()):
+            if not process.is_alive():
+                if self.logger:
+                    self.logger.error("Процесс опроса %d завершился с кодом %s, перезапуск", index, process.exitcode)
+                self._spawn(index)
+                restarted.add(index)
+        return restarted
+
+    def results(self):
+        """
+        Результаты опроса по мере поступления.
+
+        CYCLE_END - все процессы завершили очередной цикл, None - результатов
+        не было POLL_TIMEOUT секунд (позволяет выполнять периодические задачи).
+        """
+        # Процессы, завершения цикла которых ждем, и уже завершившие его
+        expected = set(self._processes)
+        finished = set()
+        checked = time.monotonic()
+        while True:
+            changed = False
+            try:
+                index, result = self._results.get(timeout=POLL_TIMEOUT)
+            except queue.Empty:
+                yield None
+            else:
+                if result is not None:
+                    yield result
+                else:
+                    finished.add(index)
+                    changed = True
+            
+            # Живость процессов проверяется и тогда, когда очередь не пустеет
+            # из-за результатов остальных процессов
+            if time.monotonic() - checked >= POLL_TIMEOUT:
+                checked = time.monotonic()
+                restarted = self._restart_dead()
+                if restarted:
+                    # Перезапущенный процесс начинает цикл заново и не задерживает текущий
+                    expected -= restarted
+                    changed = True
+            
+            if changed and finished >= expected:
+                # Завершения процессов, не входивших в этот цикл, относятся к следующему
+                finished -= expected
+                expected = set(self._processes)
+                yield CYCLE_END
+
+    def stop(self):
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.join(STOP_TIMEOUT)
+        self._processes.clear()
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            self._log_listener = None
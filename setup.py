@@ -32,6 +32,12 @@ setup(
     ],
     python_requires=">=3.7",
     install_requires=requirements,
+    extras_require={
+        "zstd": ["zstandard"],
+        "msgpack": ["msgpack"],
+        "cbor": ["cbor2"],
+        "numpy": ["numpy"],
+    },
     entry_points={
         "console_scripts": [
             "asic2mqtt=asic2mqtt:main",
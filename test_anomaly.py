@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки обнаружения аномалий
+"""
+
+import sys
+import os
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.anomaly import AnomalyDetector
+
+
+def feed(detector, values, count):
+    events = []
+    for i in range(count):
+        events.extend(detector.update('antminer3', values(i), now=1700000000 + i * 5))
+    return events
+
+
+def test_hashrate_drop():
+    """Тест обнаружения падения хэшрейта и возврата к норме"""
+    print("Тестирование падения хэшрейта...")
+    detector = AnomalyDetector()
+    assert feed(detector, lambda i: [('hashrate', 95000.0 + (i % 3) * 100)], 20) == []
+
+    events = detector.update('antminer3', [('hashrate', 60000.0)])
+    assert [(e['series'], e['kind'], e['state']) for e in events] == [('hashrate', 'drop', 'alert')]
+    # Пока аномалия продолжается, повторных событий нет
+    assert detector.update('antminer3', [('hashrate', 61000.0)]) == []
+
+    events = detector.update('antminer3', [('hashrate', 95100.0)])
+    assert events[0]['state'] == 'resolved'
+    print("✅ Падение хэшрейта обнаруживается за один опрос")
+
+
+def test_temperature_and_fans():
+    """Тест скачка температуры цепи и остановки вентилятора"""
+    print("Тестирование температуры и вентиляторов...")
+    detector = AnomalyDetector()
+    feed(detector, lambda i: [('chain_temp/temp2_1', 65.0 + i % 2), ('fan/fan1', 5400)], 20)
+
+    events = detector.update('antminer3', [('chain_temp/temp2_1', 66.5), ('fan/fan1', 5380)])
+    assert events == []
+    events = detector.update('antminer3', [('chain_temp/temp2_1', 85.0), ('fan/fan1', 0)])
+    assert sorted((e['series'], e['kind']) for e in events) == [('chain_temp/temp2_1', 'spike'), ('fan/fan1', 'stall')]
+
+    # Асик без вентиляторов (иммерсионное охлаждение) не вызывает тревог
+    assert AnomalyDetector().update('whatsminer1', [('fan_in', 0), ('fan_in', 0)]) == []
+    print("✅ Скачки температуры и остановка вентиляторов обнаруживаются")
+
+
+if __name__ == "__main__":
+    test_hashrate_drop()
+    test_temperature_and_fans()
+    print("\n✅ Тест обнаружения аномалий пройден успешно!")
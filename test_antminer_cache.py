@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки кэшей клиента Antminer без подключения к асику
+"""
+
+import sys
+import os
+import time
+from unittest.mock import patch
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from antminer.base import BaseClient
+from antminer.exceptions import ErrorResponse, UnsupportedCommand
+from antminer.utils import parse_version_number
+
+INVCMD_RESPONSE = {"STATUS": [{"STATUS": "E", "Code": 14, "Msg": "Invalid command"}]}
+VERSION_RESPONSE = {"STATUS": [{"STATUS": "S"}],
+                    "VERSION": [{"Type": "Antminer S19", "API": "3.1",
+                                 "Miner": "uart_trans.1.3", "BMMiner": "4.11.1"}]}
+
+
+def make_stats(compile_time, elapsed=100):
+    return {"STATUS": [{"STATUS": "S"}],
+            "STATS": [{"Type": "Antminer S19", "CompileTime": compile_time},
+                      {"Elapsed": elapsed}]}
+
+
+def test_unsupported_commands():
+    """Тест запоминания команд, отклоненных с кодом INVCMD"""
+    print("Тестирование кэша неподдерживаемых команд...")
+    client = BaseClient('10.0.0.1')
+    client.unsupported.clear()
+
+    with patch.object(BaseClient, 'send_command', return_value=INVCMD_RESPONSE) as send:
+        for _ in range(3):
+            try:
+                client.lcd()
+                assert False, "Ожидалась ошибка ErrorResponse"
+            except ErrorResponse as e:
+                assert e.code == 14
+        assert send.call_count == 1
+    print("✅ Повторные вызовы не отправляются на асик")
+
+    # После смены прошивки команда снова отправляется
+    with patch.object(BaseClient, 'send_command', return_value=make_stats('Mon Jan 1')):
+        client.stats()
+    with patch.object(BaseClient, 'send_command', return_value=make_stats('Tue Feb 2')):
+        client.stats()
+    assert client.unsupported.get('10.0.0.1', 'lcd') is None
+
+    # Кэш раздельный для каждого хоста
+    client.unsupported.add('10.0.0.1', 'lcd', INVCMD_RESPONSE)
+    assert client.unsupported.get('10.0.0.2', 'lcd') is None
+    try:
+        BaseClient('10.0.0.1').lcd()
+        assert False, "Ожидалась ошибка UnsupportedCommand"
+    except UnsupportedCommand:
+        pass
+    client.unsupported.clear()
+    print("✅ Кэш сбрасывается при смене прошивки")
+
+
+def test_version_cache():
+    """Тест кэширования версии до перезагрузки асика"""
+    print("Тестирование кэша версий...")
+    assert parse_version_number('4.11.1') is parse_version_number('4.11.1')
+    assert str(parse_version_number('uart_trans.1.3')) == '1.3.0'
+
+    client = BaseClient('10.0.0.3')
+    client.versions.clear()
+
+    with patch.object(BaseClient, 'send_command', return_value=VERSION_RESPONSE) as send:
+        version = client.version()
+        assert client.version() is version
+        assert BaseClient('10.0.0.3').cached_version() is version
+        assert send.call_count == 1
+        assert version['miner']['vendor'] == 'BMMiner'
+    print("✅ Повторный запрос версии не обращается к асику")
+
+    # Асик работает дальше - версия остается в кэше
+    with patch.object(BaseClient, 'send_command', return_value=make_stats('Mon Jan 1', elapsed=100)):
+        client.stats()
+    with patch('time.time', return_value=time.time() + 30), \
+         patch.object(BaseClient, 'send_command', return_value=make_stats('Mon Jan 1', elapsed=130)):
+        client.stats()
+    assert client.cached_version() is not None
+
+    # Время работы сбросилось - асик перезагрузился
+    with patch.object(BaseClient, 'send_command', return_value=make_stats('Mon Jan 1', elapsed=5)):
+        client.stats()
+    assert client.cached_version() is None
+    client.versions.clear()
+    print("✅ Перезагрузка асика сбрасывает кэш версии")
+
+
+if __name__ == "__main__":
+    test_unsupported_commands()
+    test_version_cache()
+    print("\n✅ Тест кэшей клиента Antminer пройден успешно!")
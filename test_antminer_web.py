@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки клиента веб-интерфейса Antminer
+"""
+
+import hashlib
+import json
+import threading
+import sys
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import parse_http_list, parse_keqv_list
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from antminer.exceptions import WebError
+from antminer.web import WebClient
+from asic2mqtt_core.drivers import CommandNotSupported
+from asic2mqtt_core.drivers.antminer import AntminerDriver
+
+REALM = 'antMiner Configuration'
+
+
+def md5(*parts):
+    return hashlib.md5(':'.join(parts).encode('utf-8')).hexdigest()
+
+
+class FakeMiner(BaseHTTPRequestHandler):
+    """Веб-интерфейс асика с digest-аутентификацией (root/root) и keep-alive"""
+    protocol_version = 'HTTP/1.1'
+    nonce = 'nonce-1'
+    challenges = 0
+    connections = 0
+
+    def setup(self):
+        super(FakeMiner, self).setup()
+        FakeMiner.connections += 1
+
+    def authorized(self):
+        header = self.headers.get('Authorization', '')
+        if not header.startswith('Digest '):
+            return False
+        params = parse_keqv_list(parse_http_list(header[len('Digest '):]))
+        if params.get('nonce') != self.nonce:
+            return False
+        expected = md5(md5('root', REALM, 'root'), params['nonce'], params['nc'], params['cnonce'],
+                       params['qop'], md5('GET', params['uri']))
+        return params['response'] == expected
+
+    def reply(self, status, body, headers=()):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if not self.authorized():
+            FakeMiner.challenges += 1
+            self.reply(401, 'Unauthorized', [(
+                'WWW-Authenticate', 'Digest realm="{}", nonce="{}", qop="auth"'.format(REALM, self.nonce))])
+        elif self.path == '/cgi-bin/get_system_info.cgi':
+            self.reply(200, json.dumps({'minertype': 'Antminer S19', 'macaddr': '00:11:22:33:44:55'}))
+        else:
+            self.reply(404, 'Not Found')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_web_client():
+    """Тест: digest-аутентификация один раз, одно keep-alive соединение"""
+    print("Тестирование клиента веб-интерфейса...")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeMiner)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    try:
+        client = WebClient('127.0.0.1', 'root', 'root', port=port, timeout=5)
+        for _ in range(3):
+            assert client.cgi('get_system_info')['minertype'] == 'Antminer S19'
+        # Новый клиент (следующий опрос) использует кэш challenge и пул соединений
+        assert WebClient('127.0.0.1', 'root', 'root', port=port, timeout=5).cgi('get_system_info')
+        assert FakeMiner.challenges == 1
+        assert FakeMiner.connections == 1
+        print("✅ Четыре запроса: один ответ 401 и одно TCP-соединение")
+
+        # Асик сменил nonce - клиент повторяет запрос с новым
+        FakeMiner.nonce = 'nonce-2'
+        assert client.cgi('get_system_info')['macaddr'] == '00:11:22:33:44:55'
+        assert FakeMiner.challenges == 2
+        print("✅ Смена nonce обрабатывается повторным запросом")
+
+        try:
+            WebClient('127.0.0.1', 'root', 'wrong', port=port, timeout=5).cgi('get_system_info')
+            assert False, "Ожидался WebError"
+        except WebError as e:
+            assert e.status == 401
+        print("✅ Неверный пароль приводит к WebError")
+
+        driver = AntminerDriver('127.0.0.1', {'web': ['get_system_info', 'get_network_info'], 'web_port': port,
+                                              'timeout': 5})
+        assert driver.commands == ('stats', 'devs', 'web/get_system_info', 'web/get_network_info')
+        assert driver.topic_for('web/get_system_info') == 'web/get_system_info'
+        assert driver.fetch('web/get_system_info')['minertype'] == 'Antminer S19'
+        try:
+            driver.fetch('web/get_network_info')
+            assert False, "Ожидалось CommandNotSupported"
+        except CommandNotSupported:
+            pass
+        print("✅ Драйвер опрашивает CGI, перечисленные в поле web")
+    finally:
+        WebClient.pool.clear()
+        WebClient.challenges.clear()
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    test_web_client()
+    print("\n✅ Тест клиента веб-интерфейса Antminer пройден успешно!")
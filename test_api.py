@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки локального API результатов опроса
+"""
+
+import collections
+import json
+import threading
+import time
+import urllib.request
+import sys
+import os
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.api import ApiServer, MinerCache, SnapshotApi
+
+PollResult = collections.namedtuple('PollResult', 'asic_name state driver results capabilities poll_ts latency snapshot',
+                                    defaults=(None,))
+
+ASICS = {'antminer1': {'ip': '10.0.0.1', 'topic': 'asic/antminer1'}}
+
+
+def online(asic_name, poll_ts, hashrate=13500.0):
+    return PollResult(asic_name, 'online', 'antminer', {'stats': {'STATS': [{}, {'GHS 5s': hashrate}]}},
+                      frozenset(['stats']), poll_ts, 0.2)
+
+
+def test_cache():
+    """Тест: одновременные запросы устаревшей записи ждут один опрос"""
+    print("Тестирование кэша результатов опроса...")
+    polls = []
+    release = threading.Event()
+
+    def poll(asic_name):
+        polls.append(asic_name)
+        release.wait(5)
+        return online(asic_name, time.time(), hashrate=14000.0)
+
+    cache = MinerCache(max_age=60, poll=poll)
+    cache.update(online('antminer1', time.time() - 120))
+
+    entries = []
+    threads = [threading.Thread(target=lambda: entries.append(cache.get('antminer1'))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert polls == ['antminer1']
+    assert len(entries) == 5
+    assert all(entry['results']['stats']['STATS'][1]['GHS 5s'] == 14000.0 for entry in entries)
+    # Результат внепланового опроса передается основному циклу для публикации
+    assert [(asic_name, result.results['stats']['STATS'][1]['GHS 5s'], requests)
+            for asic_name, result, requests in cache.drain()] == [('antminer1', 14000.0, ())]
+    assert list(cache.drain()) == []
+    print("✅ Пять запросов устаревшей записи выполнили один опрос")
+
+    # Свежая запись отдается без опроса, недоступный асик сохраняет последние данные
+    cache.get('antminer1')
+    assert polls == ['antminer1']
+    cache.update(PollResult('antminer1', 'offline', None, None, None, time.time(), None))
+    entry = cache.get('antminer1')
+    assert entry['state'] == 'offline'
+    assert entry['results']['stats']['STATS'][1]['GHS 5s'] == 14000.0
+    print("✅ Свежие данные отдаются из кэша")
+
+    # max_age=0 не опрашивает асик чаще чем раз в min_interval, в том числе
+    # сразу после планового опроса
+    cache = MinerCache(max_age=60, poll=poll, min_interval=10)
+    cache.update(online('antminer1', time.time() - 5))
+    for _ in range(3):
+        assert cache.get('antminer1', max_age=0)['state'] == 'online'
+    assert polls == ['antminer1']
+    assert 4 < cache.admit('antminer1') <= 5
+    cache.update(online('antminer1', time.time() - 11))
+    cache.get('antminer1', max_age=0)
+    cache.get('antminer1', max_age=0)
+    assert polls == ['antminer1', 'antminer1']
+    print("✅ Внеплановые опросы через API не чаще min_interval")
+
+
+def test_api():
+    """Тест ответов API по HTTP"""
+    print("Тестирование HTTP API...")
+    cache = MinerCache(max_age=60)
+    cache.update(online('antminer1', 1000))
+    api = SnapshotApi(cache, ASICS)
+
+    status, body = api.handle('/miners', now=1010)
+    assert status == 200
+    assert body['miners'] == [{'name': 'antminer1', 'state': 'online', 'poll_ts': 1000, 'age': 10}]
+    status, body = api.handle('/miners/antminer1/stats?max_age=3600')
+    assert status == 200 and body['data']['STATS'][1]['GHS 5s'] == 13500.0
+    assert api.handle('/miners/antminer1/devs?max_age=3600')[0] == 404
+    assert api.handle('/miners/unknown')[0] == 404
+    assert api.handle('/miners/antminer1?max_age=x')[0] == 400
+    print("✅ Ответы на запросы списка, асика и команды")
+
+    server = ApiServer({'host': '127.0.0.1', 'port': 0}, api)
+    server.start()
+    try:
+        url = 'http://{}/miners/antminer1?max_age=3600'.format(server.address)
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = json.loads(response.read())
+        assert body['commands']['stats']['STATS'][1]['GHS 5s'] == 13500.0
+        assert body['age'] > 0
+    finally:
+        server.stop()
+    print("✅ Сервер отдает данные асика в JSON")
+
+
+if __name__ == "__main__":
+    test_cache()
+    test_api()
+    print("\n✅ Тест локального API пройден успешно!")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки публикации в несколько MQTT брокеров
+"""
+
+import sys
+import os
+import json
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.brokers import BrokerFanout
+from asic2mqtt_core.cluster import ClusterMembership
+from asic2mqtt_core.history import HistoryStore
+
+
+def test_fanout():
+    """Тест префиксов, фильтров и очередей брокеров"""
+    print("Тестирование публикации в несколько брокеров...")
+    fanout = BrokerFanout([
+        {'broker_address': '192.168.3.27'},
+        {'broker_address': 'cloud.example.com', 'prefix': 'site1/', 'topics': ['fleet/#', '+/+/alerts'],
+         'queue_size': 2},
+    ])
+    site, cloud = fanout.targets
+    assert site.name == '192.168.3.27:1883'
+
+    fanout.publish('miner/t21/stats', '{}')
+    fanout.publish('miner/t21/alerts', '{}')
+    fanout.publish('fleet/summary', '{}')
+    assert site.queue.qsize() == 3
+    assert [item[0] for item in list(cloud.queue.queue)] == ['site1/miner/t21/alerts', 'site1/fleet/summary']
+    print("✅ Префикс и фильтры применяются для каждого брокера отдельно")
+
+    # Переполненная очередь одного брокера не мешает остальным
+    fanout.publish('fleet/hashrate', '1')
+    assert cloud.dropped == 1
+    assert site.queue.qsize() == 4
+    print("✅ Переполнение очереди медленного брокера не затрагивает остальные")
+
+    # Поток публикации разбирает очередь до остановки
+    site.publisher = MagicMock()
+    site._thread = threading.Thread(target=site._run)
+    site._thread.start()
+    site.stop()
+    topics = [c.args[0] for c in site.publisher.publish.call_args_list]
+    assert topics == ['miner/t21/stats', 'miner/t21/alerts', 'fleet/summary', 'fleet/hashrate']
+    print("✅ Оставшиеся сообщения отправляются при остановке")
+
+
+def test_prefixed_subscriptions():
+    """Тест подписок и ответов на брокере с префиксом"""
+    print("Тестирование подписок с префиксом брокера...")
+    fanout = BrokerFanout({'broker_address': 'cloud.example.com', 'prefix': 'site1/', 'topics': ['fleet/#']})
+    target, = fanout.targets
+    target.client = MagicMock()
+    callbacks = {}
+    target.client.message_callback_add.side_effect = lambda sub, callback: callbacks.__setitem__(sub, callback)
+
+    cluster = ClusterMembership({'node_id': 'node-1'})
+    history = HistoryStore({}, {'antminer3': {'topic': 'miner/t21'}})
+    cluster.subscribe(target.session)
+    history.subscribe(target.session)
+    subscribed = [c.args[0] for c in target.client.subscribe.call_args_list]
+    assert subscribed == ['site1/asic2mqtt/cluster/nodes/+', 'site1/miner/t21/history/get']
+    print("✅ Подписки получают префикс брокера")
+
+    # Объявление соседа приходит в топик с префиксом
+    callbacks['site1/asic2mqtt/cluster/nodes/+'](
+        target.client, None, SimpleNamespace(topic='site1/asic2mqtt/cluster/nodes/node-2',
+                                             payload=json.dumps({'lease': 30}).encode()))
+    assert cluster.members() == ('node-1', 'node-2')
+
+    # Ответ уходит через очередь брокера с префиксом, несмотря на фильтры
+    callbacks['site1/miner/t21/history/get'](
+        target.client, None, SimpleNamespace(topic='site1/miner/t21/history/get', payload=b'{}'))
+    topic, payload = target.queue.get_nowait()[:2]
+    assert topic == 'site1/miner/t21/history'
+    assert json.loads(payload)['points'] == []
+    target.client.publish.assert_not_called()
+    print("✅ Префикс убирается из входящих топиков, ответы публикуются с префиксом")
+
+
+if __name__ == "__main__":
+    test_fanout()
+    test_prefixed_subscriptions()
+    print("\n✅ Тест публикации в несколько брокеров пройден успешно!")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки разбора данных по цепям и чипам Antminer
+"""
+
+import sys
+import os
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from antminer import chains
+from asic2mqtt_core.drivers.antminer import AntminerDriver
+from asic2mqtt_core.metrics import MetricExtractor
+
+STATS = {
+    'temp_chip1': '45-50-62-65',
+    'temp_chip2': '0-0-70-74',
+    'temp_chip3': '',
+    'chain_acs1': ' oooooooo oooooooo',
+    'chain_acs2': ' ooooxooo oooo-ooo',
+    'chain_acs3': '',
+    'freq_avg1': 650.0,
+    'freq_avg2': 640,
+    'freq3': '600 620 640',
+    'temp2_1': 65,
+}
+
+EXPECTED = {
+    '1': {'chip_temp_min': 45.0, 'chip_temp_max': 65.0, 'chips': 16, 'failed_chips': 0, 'freq_avg': 650.0},
+    '2': {'chip_temp_min': 70.0, 'chip_temp_max': 74.0, 'chips': 16, 'failed_chips': 2, 'freq_avg': 640.0},
+    '3': {'freq_avg': 620.0},
+}
+
+
+def test_decode():
+    """Тест разбора строк по чипам"""
+    print("Тестирование разбора данных по цепям...")
+    telemetry = chains.decode(STATS, use_numpy=False)
+    assert list(telemetry.temps['1']) == [45, 50, 62, 65]
+    assert telemetry.statuses['2'] == 'ooooxooooooo-ooo'
+    assert telemetry.metrics() == EXPECTED
+    print("✅ Метрики по цепям без NumPy")
+
+    if chains.numpy is not None:
+        assert chains.decode(STATS, use_numpy=True).metrics() == EXPECTED
+        print("✅ Метрики по цепям с NumPy совпадают")
+    else:
+        print("ℹ️ NumPy не установлен, проверен только разбор без него")
+
+
+def test_driver_metrics():
+    """Тест публикации метрик по цепям драйвером Antminer"""
+    print("Тестирование метрик по цепям в драйвере...")
+    driver = AntminerDriver('127.0.0.1')
+    stats = driver.parse('stats', {'STATS': [{'Type': 'Antminer S19'}, dict(STATS)]})
+    # Ответ stats, который публикуется в {topic}/stats, не меняется
+    assert set(stats) == {'STATS'}
+    assert stats['STATS'][1] == STATS
+
+    values = dict(MetricExtractor({}).extract(driver, {'stats': stats}))
+    assert values['failed_chips/2'] == 2
+    assert values['chip_temp_max/1'] == 65.0
+    assert values['chain_freq/3'] == 620.0
+    assert MetricExtractor({}).extract(driver, {'devs': {}}) == []
+    print("✅ Метрики по цепям публикуются в подтопики вида failed_chips/2")
+
+    # Без flatten публикуются только метрики производных данных
+    derived = {}
+    chain_values = dict(MetricExtractor({}).extract(driver, {'stats': stats}, derived_only=True, derived=derived))
+    assert chain_values == dict((key, value) for key, value in values.items()
+                                if key.split('/')[0] in ('chip_temp_min', 'chip_temp_max', 'failed_chips', 'chain_freq'))
+    assert chain_values and set(derived) == {'chains'}
+    print("✅ Метрики по цепям извлекаются отдельно от остальных")
+
+
+if __name__ == "__main__":
+    test_decode()
+    test_driver_metrics()
+    print("\n✅ Тест разбора данных по цепям пройден успешно!")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки режима кластера
+"""
+
+import json
+import time
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.cluster import ClusterMembership
+from asic2mqtt_core.fleet import FleetAggregator
+from asic2mqtt_core.history import HistoryStore
+from asic2mqtt_core.refresh import RefreshRequests
+from asic2mqtt_core.snapshot import SnapshotBatcher
+
+ASICS = ['antminer{}'.format(i) for i in range(100)]
+
+
+def test_cluster():
+    """Тест разделения асиков между узлами и перехода асиков по истечении аренды"""
+    print("Тестирование режима кластера...")
+    node_a = ClusterMembership({'node_id': 'node-a', 'lease': 30})
+    node_b = ClusterMembership({'node_id': 'node-b', 'lease': 30})
+
+    # Узлы обмениваются объявлениями
+    client = MagicMock()
+    assert node_a.publish_due(client, now=1000)
+    assert not node_a.publish_due(client, now=1005)
+    topic, payload = client.publish.call_args.args
+    assert topic == 'asic2mqtt/cluster/nodes/node-a'
+    assert client.publish.call_args.kwargs['retain']
+    node_b.handle_announce(topic, payload, now=1000)
+    node_a.handle_announce('asic2mqtt/cluster/nodes/node-b',
+                           json.dumps({'node': 'node-b', 'lease': 30}), now=1000)
+    assert node_a.members(now=1010) == ('node-a', 'node-b')
+
+    owned_a = set(name for name in ASICS if node_a.owns(name, now=1010))
+    owned_b = set(name for name in ASICS if node_b.owns(name, now=1010))
+    assert not owned_a & owned_b
+    assert owned_a | owned_b == set(ASICS)
+    assert 30 < len(owned_a) < 70
+    print("✅ Каждый асик опрашивает ровно один узел: %d и %d" % (len(owned_a), len(owned_b)))
+
+    # Аренда node-b истекла - node-a забирает его асики
+    assert node_a.members(now=1031) == ('node-a',)
+    assert all(node_a.owns(name, now=1031) for name in ASICS)
+    print("✅ Асики остановившегося узла переходят к оставшимся после истечения аренды")
+
+    # Пустое объявление (штатная остановка или last will) удаляет узел сразу
+    node_a.handle_announce('asic2mqtt/cluster/nodes/node-b', b'{"lease": 30}', now=1040)
+    assert node_a.members(now=1041) == ('node-a', 'node-b')
+    node_a.handle_announce('asic2mqtt/cluster/nodes/node-b', b'', now=1042)
+    assert node_a.members(now=1043) == ('node-a',)
+    print("✅ Остановленный узел удаляется без ожидания аренды")
+
+    # Неверное поле lease заменяется сроком аренды по умолчанию
+    for payload in (b'{"lease": null}', b'{"lease": {}}', b'{"lease": [1]}', b'[]', b'"x"'):
+        node_a.handle_announce('asic2mqtt/cluster/nodes/node-c', payload, now=1050)
+        assert node_a.members(now=1051) == ('node-a', 'node-c')
+    print("✅ Неверные объявления не вызывают исключений")
+
+
+def test_start():
+    """Тест вступления в кластер и продления аренды из фонового потока"""
+    print("Тестирование вступления в кластер...")
+    node = ClusterMembership({'node_id': 'node-a', 'lease': 30, 'heartbeat': 0.05})
+    client = MagicMock()
+    node.start(client, now=1000)
+    # До прихода объявлений соседей узел не берет асики
+    assert not any(node.owns(name, now=1000.01) for name in ASICS)
+    node.handle_announce('asic2mqtt/cluster/nodes/node-b', b'{"lease": 30}', now=1000.02)
+    owned = [name for name in ASICS if node.owns(name, now=1000.1)]
+    assert 30 < len(owned) < 70
+    print("✅ Асики распределяются через интервал объявления после запуска")
+
+    # Аренда продлевается без участия цикла опроса
+    time.sleep(0.3)
+    announcements = [call for call in client.publish.call_args_list if call.args[1]]
+    assert len(announcements) >= 3
+    node.leave(client)
+    assert client.publish.call_args.args == ('asic2mqtt/cluster/nodes/node-a', '')
+    published = client.publish.call_count
+    time.sleep(0.1)
+    assert client.publish.call_count == published
+    print("✅ Аренда продлевается из фонового потока и не продлевается после выхода")
+
+
+def test_owner_replies():
+    """Тест ответов на запросы к асикам только от узла-владельца"""
+    print("Тестирование ответов узлов кластера...")
+    asics = dict((name, {'ip': '10.0.0.1', 'topic': 'asic/{}'.format(name)}) for name in ('antminer1', 'antminer2'))
+    owns = lambda name: name == 'antminer1'
+    client = MagicMock()
+
+    history = HistoryStore({}, asics, owns=owns)
+    for name in asics:
+        history._on_request(client, None, SimpleNamespace(topic='asic/{}/history/get'.format(name), payload=b''))
+    assert [call.args[0] for call in client.publish.call_args_list] == ['asic/antminer1/history']
+
+    client.reset_mock()
+    cache = MagicMock()
+    cache.refreshing.return_value = True
+    refresher = RefreshRequests({}, asics, cache, owns=owns)
+    refresher.submit = MagicMock(return_value=None)
+    for name in asics:
+        refresher._on_request(client, None, SimpleNamespace(topic='asic/{}/refresh'.format(name), payload=b''))
+    assert [call.args[0] for call in refresher.submit.call_args_list] == ['antminer1']
+    assert not client.publish.called
+    print("✅ На запросы истории и опроса отвечает только владелец асика")
+
+    assert FleetAggregator({'topic': 'fleet'}, node_id='node-a').topic == 'fleet/node-a'
+    assert SnapshotBatcher({'topic': 'fleet/snapshot/'}, node_id='node-a').topic == 'fleet/snapshot/node-a'
+    assert FleetAggregator({'topic': 'fleet'}).topic == 'fleet'
+    print("✅ Сводка и снимок каждого узла публикуются в свои топики")
+
+
+if __name__ == "__main__":
+    test_cluster()
+    test_start()
+    test_owner_replies()
+    print("\n✅ Тест режима кластера пройден успешно!")
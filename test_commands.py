@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки выполнения команд на группе асиков
+"""
+
+import json
+import socket
+import threading
+import time
+import sys
+import os
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.commands import CommandRequests, FleetCommandRunner, select_miners
+from asic2mqtt_core.drivers import CommandNotSent, Driver, register_driver
+
+
+@register_driver
+class ScriptedDriver(Driver):
+    """Драйвер без сети: поведение асика задается полем "behaviour" конфигурации"""
+    name = 'scripted'
+    attempts = {}
+    lock = threading.Lock()
+
+    def execute(self, command, params=()):
+        behaviour = self.asic_config['behaviour']
+        with self.lock:
+            attempt = self.attempts[self.ip] = self.attempts.get(self.ip, 0) + 1
+        if behaviour == 'flaky' and attempt == 1:
+            raise CommandNotSent(command, ConnectionRefusedError("Соединение отклонено"))
+        if behaviour == 'rejects':
+            raise ValueError("Invalid command")
+        if behaviour == 'hangs':
+            # Команда отправлена, ответа нет за таймаут сокета
+            time.sleep(self.asic_config['timeout'])
+            raise socket.timeout("timed out")
+        return {'STATUS': [{'STATUS': 'S', 'Msg': '{} {}'.format(command, ','.join(params))}]}
+
+
+ASICS = dict(
+    ('miner{}'.format(i), {'ip': '10.0.0.{}'.format(i), 'driver': 'scripted', 'group': 'rack1', 'behaviour': 'ok'})
+    for i in range(20)
+)
+ASICS['flaky'] = {'ip': '10.0.1.1', 'driver': 'scripted', 'group': 'rack2', 'behaviour': 'flaky'}
+ASICS['rejects'] = {'ip': '10.0.1.2', 'driver': 'scripted', 'group': 'rack2', 'behaviour': 'rejects'}
+ASICS['hangs'] = {'ip': '10.0.1.3', 'driver': 'scripted', 'group': 'rack2', 'behaviour': 'hangs'}
+
+
+def test_select():
+    """Тест выбора асиков"""
+    print("Тестирование выбора асиков...")
+    assert len(select_miners(ASICS)) == 23
+    assert select_miners(ASICS, group='rack2') == ['flaky', 'rejects', 'hangs']
+    assert select_miners(ASICS, match='miner1?') == ['miner{}'.format(i) for i in range(10, 20)]
+    assert select_miners(ASICS, miners=['flaky', 'miner1'], group='rack1') == ['miner1']
+    assert select_miners(ASICS, driver='antminer') == []
+    print("✅ Асики выбираются по именам, группе, драйверу и маске")
+
+
+def test_runner():
+    """Тест параллельного выполнения с повторами и таймаутом"""
+    print("Тестирование выполнения команды...")
+    ScriptedDriver.attempts.clear()
+    runner = FleetCommandRunner(ASICS, {'concurrency': 8, 'timeout': 0.3, 'retries': 1, 'retry_delay': 0})
+    report = runner.run('switchpool', ['1'])
+
+    assert report['total'] == 23
+    assert report['succeeded'] == 21
+    assert report['failed'] == 1 and report['unknown'] == 1
+    assert report['results']['miner5']['response']['STATUS'][0]['Msg'] == 'switchpool 1'
+    # Неотправленная команда повторяется
+    assert report['results']['flaky'] == dict(report['results']['flaky'], status='ok', attempts=2)
+    # Отказ асика не повторяется
+    assert report['results']['rejects'] == dict(report['results']['rejects'], status='failed', attempts=1)
+    # Команда без ответа выполнена один раз, ее результат неизвестен
+    assert report['results']['hangs'] == dict(report['results']['hangs'], status='unknown', attempts=1)
+    assert ScriptedDriver.attempts['10.0.1.3'] == 1
+    # 23 асика по 8 одновременно, зависший асик не задерживает остальные
+    assert report['elapsed'] < 2
+    json.dumps(report)
+    print("✅ Отчет: %d из %d за %.2f с" % (report['succeeded'], report['total'], report['elapsed']))
+
+
+def test_requests():
+    """Тест команд через MQTT"""
+    print("Тестирование команд через MQTT...")
+    runner = FleetCommandRunner(ASICS, {'retries': 0, 'timeout': 0.1})
+    requests = CommandRequests({'allow': ['switchpool']}, runner, owns=lambda name: name != 'miner0', node_id='node-a')
+
+    topic, report = requests.handle_request(json.dumps({'id': 7, 'command': 'switchpool', 'params': [2],
+                                                        'group': 'rack1'}))
+    assert topic == 'asic2mqtt/commands/result'
+    assert report['id'] == 7 and report['node'] == 'node-a'
+    # miner0 принадлежит другому узлу кластера
+    assert report['total'] == 19 and report['failed'] == 0
+    attempts = ScriptedDriver.attempts.get('10.0.0.1', 0)
+
+    topic, report = requests.handle_request(json.dumps({'command': 'restart', 'response_topic': 'ops/reply',
+                                                        'all': True}))
+    assert topic == 'ops/reply'
+    assert 'error' in report and 'results' not in report
+    print("✅ Через MQTT выполняются только разрешенные команды")
+
+    # Без условий выбора команда не выполняется на всем парке
+    for request in ({'command': 'switchpool', 'params': [1]},
+                    {'command': 'switchpool', 'params': [1], 'all': 'yes'},
+                    {'command': 'switchpool', 'params': [1], 'miners': 'miner1'},
+                    {'command': 'switchpool', 'params': [1], 'miners': [1]},
+                    {'command': 'switchpool', 'params': '12', 'group': 'rack1'}):
+        topic, report = requests.handle_request(json.dumps(dict(request, id=8)))
+        assert report['id'] == 8 and 'error' in report and 'results' not in report, request
+    assert ScriptedDriver.attempts.get('10.0.0.1', 0) == attempts
+    print("✅ Запросы без асиков и с неверными miners или params отклоняются")
+
+    topic, report = requests.handle_request(json.dumps({'command': 'switchpool', 'params': ['0'], 'all': True}))
+    assert report['total'] == 22
+    _, report = requests.handle_request(json.dumps({'command': 'switchpool', 'params': [], 'miners': ['miner1']}))
+    assert list(report['results']) == ['miner1']
+    print("✅ Весь парк выбирается только явным \"all\": true, имена - точно")
+
+
+if __name__ == "__main__":
+    test_select()
+    test_runner()
+    test_requests()
+    print("\n✅ Тест выполнения команд пройден успешно!")
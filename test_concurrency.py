@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки адаптивного ограничения числа одновременных опросов
+"""
+
+import sys
+import os
+import threading
+import time
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.concurrency import AIMDLimit, ConcurrencyController
+
+
+def test_aimd():
+    """Тест аддитивного роста и мультипликативного снижения предела"""
+    print("Тестирование AIMD...")
+    limit = AIMDLimit(4, 1, 16, latency_target=2.0)
+
+    # Четыре быстрых опроса - предел вырос примерно на единицу
+    for i in range(4):
+        limit.on_result(started=i, latency=0.5, failed=False, now=i + 1)
+    assert 4.9 < limit.limit < 5.0
+
+    # Несколько таймаутов одной перегрузки снижают предел один раз
+    limit.on_result(started=10, latency=None, failed=True, now=12)
+    limit.on_result(started=11, latency=None, failed=True, now=13)
+    limit.on_result(started=11.5, latency=5.0, failed=False, now=14)
+    assert 2.4 < limit.limit < 2.5
+    # Перегрузка, замеченная запросом после снижения, снижает снова
+    limit.on_result(started=15, latency=3.0, failed=False, now=16)
+    assert 1.2 < limit.limit < 1.3
+    for i in range(10):
+        limit.on_result(started=20, latency=None, failed=True, now=21 + i)
+        limit.on_result(started=30 + i, latency=None, failed=True, now=31 + i)
+    assert limit.limit == 1
+    print("✅ Предел растет аддитивно и снижается мультипликативно до минимума")
+
+    # Предел меньше единицы остановил бы опрос
+    for minimum, maximum in ((0, 16), (0.5, 16), (4, 2)):
+        try:
+            AIMDLimit(1, minimum, maximum)
+            assert False, "Ожидался ValueError"
+        except ValueError:
+            pass
+    assert AIMDLimit(100, 1, 16).limit == 16
+    print("✅ Неверные пределы отклоняются")
+
+
+def test_controller():
+    """Тест общего предела и пределов групп"""
+    print("Тестирование пределов групп...")
+    controller = ConcurrencyController({'global': {'initial': 3}, 'group': {'initial': 1, 'max': 1}})
+    assert controller.group_for({'ip': '192.168.3.73'}) == '192.168.3.0/24'
+    assert controller.group_for({'ip': '192.168.3.73', 'group': 'switch-2'}) == 'switch-2'
+
+    active = {}
+    peak = {}
+    lock = threading.Lock()
+
+    def poll(group):
+        admitted = controller.try_acquire([group])
+        while admitted is None:
+            time.sleep(0.001)
+            admitted = controller.try_acquire([group])
+        started = admitted[1]
+        with lock:
+            active[group] = active.get(group, 0) + 1
+            active['all'] = active.get('all', 0) + 1
+            for key in (group, 'all'):
+                peak[key] = max(peak.get(key, 0), active[key])
+        time.sleep(0.02)
+        with lock:
+            active[group] -= 1
+            active['all'] -= 1
+        controller.release(group, started, latency=0.02)
+
+    futures = [controller.executor.submit(poll, 'net{}'.format(i % 4)) for i in range(24)]
+    for future in futures:
+        future.result()
+    controller.shutdown()
+
+    assert all(peak['net{}'.format(i)] == 1 for i in range(4))
+    assert peak['all'] <= 4
+    # Место в заполненной группе не выдается, свободная группа выбирается сразу
+    assert controller.try_acquire(['net0'])[0] == 'net0'
+    assert controller.try_acquire(['net0']) is None
+    assert controller.try_acquire(['net0', 'net1'])[0] == 'net1'
+    assert controller.global_limit.inflight == 2
+    assert controller.global_limit.limit > 3
+    print("✅ Одновременно не больше одного опроса на группу и не больше общего предела")
+
+
+def test_poll_cycle_groups():
+    """Тест цикла опроса, в котором асики перечислены подсеть за подсетью"""
+    print("Тестирование очередей по группам...")
+    import asic2mqtt
+
+    config = {'global': {'initial': 24, 'max': 24}, 'group': {'initial': 8, 'max': 8}}
+    controller = ConcurrencyController(config)
+    asics = dict(('asic{}-{}'.format(net, i), {'ip': '10.0.{}.{}'.format(net, i + 1)})
+                 for net in range(3) for i in range(40))
+    active = [0]
+    peak = [0]
+    lock = threading.Lock()
+
+    class Poller(object):
+        def poll(self, asic_name, asic_config):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return asic2mqtt.PollResult(asic_name, 'online', 'antminer', {}, frozenset(), time.time(), 0.01)
+
+    results = list(asic2mqtt.concurrent_poll_cycle(Poller(), asics, controller))
+    controller.shutdown()
+    assert sorted(result.asic_name for result in results) == sorted(asics)
+    # Пока одна подсеть заполнена, опрашиваются асики остальных, и общий
+    # предел используется полностью
+    assert peak[0] == 24
+    assert all(limit.inflight == 0 for limit in controller.groups.values())
+    print("✅ Заполненная группа не задерживает опрос остальных групп")
+
+
+if __name__ == "__main__":
+    test_aimd()
+    test_controller()
+    test_poll_cycle_groups()
+    print("\n✅ Тест адаптивного ограничения опросов пройден успешно!")
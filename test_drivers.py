@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки реестра драйверов и кэша поддерживаемых команд
+"""
+
+import sys
+import os
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.drivers import (
+    Driver, CapabilityCache, CommandNotSupported, register_driver,
+    resolve_driver, available_drivers
+)
+
+
+class FakeDriver(Driver):
+    """Драйвер-заглушка, который не поддерживает команду pools"""
+    name = 'fakeminer'
+    commands = ('summary', 'pools')
+    topics = {'summary': 'status'}
+
+    def __init__(self, ip, asic_config=None, logger=None):
+        super(FakeDriver, self).__init__(ip, asic_config, logger)
+        self.sent = []
+
+    def fetch(self, command):
+        self.sent.append(command)
+        if command == 'pools':
+            raise CommandNotSupported(command)
+        return {"SUMMARY": [{"GHS 5s": 100.0}]}
+
+
+def test_registry():
+    """Тест регистрации и выбора драйвера"""
+    print("Тестирование реестра драйверов...")
+    register_driver(FakeDriver)
+
+    assert 'antminer' in available_drivers()
+    assert 'whatsminer' in available_drivers()
+    assert resolve_driver('antminer3', {}).name == 'antminer'
+    assert resolve_driver('whatsminer1', {}).name == 'whatsminer'
+    assert resolve_driver('rig7', {'driver': 'fakeminer'}) is FakeDriver
+    assert resolve_driver('rig7', {}) is None
+    print("✅ Драйверы выбираются по имени асика и по полю driver")
+
+
+def test_capabilities():
+    """Тест определения и кэширования поддерживаемых команд"""
+    print("Тестирование кэша поддерживаемых команд...")
+    import asic2mqtt
+
+    capabilities = CapabilityCache()
+    driver = FakeDriver('127.0.0.1')
+    results = asic2mqtt.poll_asic(driver, 'rig7', capabilities)
+    assert capabilities.get('rig7') == frozenset(['summary'])
+    assert list(results) == ['summary']
+    assert driver.topic_for('summary') == 'status'
+
+    # Повторный опрос не отправляет отклоненную команду
+    driver = FakeDriver('127.0.0.1')
+    asic2mqtt.poll_asic(driver, 'rig7', capabilities)
+    assert driver.sent == ['summary']
+    print("✅ Отклоненные команды больше не отправляются")
+
+
+if __name__ == "__main__":
+    test_registry()
+    test_capabilities()
+    print("\n✅ Тест драйверов пройден успешно!")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки кодирования сообщений (JSON, MessagePack, CBOR)
+"""
+
+import json
+import sys
+import os
+import zlib
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core import encoding
+from asic2mqtt_core.encoding import PayloadEncoder
+from asic2mqtt_core.projection import PayloadProjector
+
+STATS = {"STATS": [{"Type": "Antminer S19"},
+                   dict(("freq{}".format(i), 650 + i) for i in range(1, 41))]}
+
+
+def test_encoding():
+    """Тест форматов, сжатия и суффиксов топиков"""
+    print("Тестирование кодирования сообщений...")
+    encoder = PayloadEncoder({
+        'stats': {'format': 'msgpack', 'compress_threshold': 256, 'topic_suffix': True},
+        'devs': {'format': 'cbor'},
+    })
+
+    # Подтопики без настроек кодируются в JSON как раньше
+    encoded = encoder.encode('summary', {"SUMMARY": []})
+    assert encoded == ('{"SUMMARY": []}', '', None, None)
+    print("✅ JSON остается форматом по умолчанию")
+
+    encoded = encoder.encode('stats', STATS)
+    if 'msgpack' in encoding.available_formats():
+        import msgpack
+        assert encoded.content_type == 'application/msgpack'
+        assert encoded.content_encoding == 'zlib'
+        assert encoded.suffix == '.msgpack.zlib'
+        assert msgpack.unpackb(zlib.decompress(encoded.payload)) == STATS
+        assert len(encoded.payload) < len(json.dumps(STATS))
+        print("✅ MessagePack со сжатием: %d байт вместо %d" % (len(encoded.payload), len(json.dumps(STATS))))
+    else:
+        assert encoded.content_type == 'application/json'
+
+    encoded = encoder.encode('devs', {"DEVS": [{"Accepted": 100}]})
+    if 'cbor' in encoding.available_formats():
+        import cbor2
+        assert encoded.content_type == 'application/cbor'
+        assert encoded.content_encoding is None and encoded.suffix == ''
+        assert cbor2.loads(encoded.payload) == {"DEVS": [{"Accepted": 100}]}
+        print("✅ CBOR без сжатия ниже порога")
+
+    try:
+        PayloadEncoder({'stats': {'format': 'xml'}})
+        assert False
+    except ValueError:
+        pass
+    print("✅ Неизвестный формат отклоняется")
+
+    # Проекция применяется до кодирования
+    projector = PayloadProjector({'stats': {'include': ['STATS/1/freq1']}}, encoder=encoder)
+    encoded = projector.encode('stats', STATS)
+    assert encoded.content_encoding is None
+    if 'msgpack' in encoding.available_formats():
+        assert msgpack.unpackb(encoded.payload) == {"STATS": [None, {"freq1": 651}]}
+    print("✅ Проекция применяется до кодирования")
+
+
+if __name__ == "__main__":
+    test_encoding()
+    print("\n✅ Тест кодирования сообщений пройден успешно!")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки сводки по парку асиков
+"""
+
+import json
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.drivers import get_driver
+from asic2mqtt_core.fleet import FleetAggregator, STATE_OFFLINE
+
+
+def test_summarize():
+    """Тест нормализации показателей драйверами"""
+    print("Тестирование нормализации показателей...")
+    antminer = get_driver('antminer')('192.168.3.73')
+    values = antminer.summarize({
+        'stats': {"STATS": [{}, {"GHS 5s": "95000.5", "temp2_1": 65, "temp2_2": 71, "temp1": 50}]},
+        'devs': {"DEVS": [{"Accepted": 10, "Rejected": 1}, {"Accepted": 5, "Rejected": 0}]},
+    })
+    assert values == {'hashrate': 95000.5, 'temperature': 71.0, 'accepted': 15.0, 'rejected': 1.0}
+
+    whatsminer = get_driver('whatsminer')('192.168.3.34')
+    values = whatsminer.summarize({
+        'summary': {"SUMMARY": [{"MHS 5s": 100000000, "Temperature": 70, "Accepted": 9, "Rejected": 1}]},
+        'edevs': {"DEVS": [{"Temperature": 75}, {"Temperature": 72}]},
+    })
+    assert values == {'hashrate': 100000.0, 'temperature': 75.0, 'accepted': 9.0, 'rejected': 1.0}
+    print("✅ Хэшрейт приводится к GH/s, температура - к максимальной")
+
+
+def test_aggregator():
+    """Тест инкрементального обновления сводки"""
+    print("Тестирование сводки по парку...")
+    fleet = FleetAggregator({'interval': 30})
+    fleet.update('a1', {'hashrate': 100.0, 'temperature': 70.0, 'accepted': 90.0, 'rejected': 10.0})
+    fleet.update('a2', {'hashrate': 50.0, 'temperature': 80.0, 'accepted': 100.0, 'rejected': 0.0})
+    fleet.update('a1', {'hashrate': 110.0, 'temperature': 60.0, 'accepted': 95.0, 'rejected': 5.0})
+    summary = fleet.summary()
+    assert summary['hashrate'] == 160.0
+    assert summary['temperature_avg'] == 70.0
+    assert summary['temperature_max'] == 80.0
+    assert summary['reject_ratio'] == 0.025
+    assert summary['miners'] == {'online': 2, 'offline': 0, 'error': 0, 'total': 2}
+
+    # Недоступный асик исключается из сумм и максимума
+    fleet.set_state('a2', STATE_OFFLINE)
+    summary = fleet.summary()
+    assert summary['hashrate'] == 110.0
+    assert summary['temperature_max'] == 60.0
+    assert summary['miners']['offline'] == 1
+    print("✅ Сводка обновляется инкрементально")
+
+    client = MagicMock()
+    assert fleet.publish_due(client, now=1000)
+    assert not fleet.publish_due(client, now=1010)
+    published = dict(c.args for c in client.publish.call_args_list)
+    assert json.loads(published['fleet/summary'])['hashrate'] == 110.0
+    assert published['fleet/miners/online'] == '1'
+    print("✅ Сводка публикуется с заданным интервалом")
+
+    # Асик, перешедший к другому узлу кластера, не учитывается вовсе
+    fleet.forget('a1')
+    summary = fleet.summary()
+    assert summary['hashrate'] == 0
+    assert summary['miners'] == {'online': 0, 'offline': 1, 'error': 0, 'total': 1}
+    print("✅ Забытый асик исключается из сводки")
+
+
+def test_non_finite():
+    """Тест показаний NaN и бесконечности"""
+    print("Тестирование нечисловых показаний...")
+    fleet = FleetAggregator()
+    fleet.update('a1', {'hashrate': 110.0, 'temperature': 60.0, 'accepted': 95.0, 'rejected': 5.0})
+    fleet.update('a2', {'hashrate': float('nan'), 'temperature': float('inf'), 'accepted': 1.0})
+    fleet.update('a2', {'hashrate': 40.0, 'temperature': 65.0, 'accepted': 1.0, 'rejected': 0.0})
+    summary = fleet.summary()
+    assert summary['hashrate'] == 150.0
+    assert summary['temperature_max'] == 65.0
+    assert 'NaN' not in json.dumps(summary)
+
+    antminer = get_driver('antminer')('192.168.3.73')
+    assert antminer.summarize({'stats': {"STATS": [{}, {"GHS 5s": "nan", "temp2_1": "inf"}]}}) == {}
+    print("✅ NaN и бесконечность не попадают в сводку")
+
+
+if __name__ == "__main__":
+    test_summarize()
+    test_aggregator()
+    test_non_finite()
+    print("\n✅ Тест сводки по парку пройден успешно!")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки истории метрик в памяти
+"""
+
+import sys
+import os
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.history import HistoryStore
+
+ASICS = {"antminer3": {"ip": "192.168.3.73", "topic": "miner/worker_t21_002"}}
+
+
+def test_ring_buffer():
+    """Тест кольцевого буфера и прореживания"""
+    print("Тестирование истории метрик...")
+    store = HistoryStore({'raw_points': 10, 'minute_points': 3, 'quarter_points': 2}, ASICS)
+    size = store.bytes_per_miner()
+
+    start = 1700000000 - 1700000000 % 900
+    for i in range(30):
+        store.record('antminer3', {'hashrate': float(i), 'temperature': 60.0 + i % 5}, now=start + i * 10)
+
+    raw = store.query('antminer3', 'hashrate')
+    assert len(raw) == 10
+    assert raw[0] == [start + 200, 20.0] and raw[-1] == [start + 290, 29.0]
+    assert store.query('antminer3', 'hashrate', since=start + 280) == [[start + 280, 28.0], [start + 290, 29.0]]
+    print("✅ Кольцевой буфер хранит последние точки")
+
+    minutes = store.query('antminer3', 'hashrate', tier='1m')
+    # 3 завершенных минуты в буфере + текущая
+    assert len(minutes) == 4
+    assert minutes[0] == [start + 60, 6.0, 8.5, 11.0]
+    assert minutes[-1] == [start + 240, 24.0, 26.5, 29.0]
+    assert store.query('antminer3', 'temperature', tier='15m')[-1][1:] == [60.0, 62.0, 64.0]
+    assert store.bytes_per_miner() == size
+    print("✅ Прореженные уровни хранят min/avg/max")
+
+
+def test_request():
+    """Тест запроса истории через MQTT"""
+    print("Тестирование запроса истории...")
+    store = HistoryStore({}, ASICS)
+    store.record('antminer3', {'hashrate': 95000.0}, now=1700000000)
+    topic, response = store.handle_request('miner/worker_t21_002', '{"metric": "hashrate", "id": 7}')
+    assert topic == 'miner/worker_t21_002/history'
+    assert response == {'metric': 'hashrate', 'tier': 'raw', 'id': 7, 'points': [[1700000000, 95000.0]]}
+
+    topic, response = store.handle_request('miner/worker_t21_002', '{"metric": "power"}')
+    assert 'error' in response
+    print("✅ Запросы истории обрабатываются")
+
+    # Неверные запросы не вызывают исключений в обработчике MQTT
+    for payload in ('[1, 2]', '"hashrate"', '{"since": "abc"}', '{"limit": "3"}', '{"tier": [1]}',
+                    '{"metric": {}}', '{"limit": -1}', '{"limit": 1.5}'):
+        topic, response = store.handle_request('miner/worker_t21_002', payload)
+        assert topic == 'miner/worker_t21_002/history'
+        if payload.startswith('{'):
+            assert 'error' in response and 'points' not in response, payload
+    topic, response = store.handle_request('miner/worker_t21_002', '{"response_topic": 5, "limit": 1}')
+    assert topic == 'miner/worker_t21_002/history'
+    assert response['points'] == [[1700000000, 95000.0]]
+    print("✅ Неверные запросы получают ответ с ошибкой")
+
+
+if __name__ == "__main__":
+    test_ring_buffer()
+    test_request()
+    print("\n✅ Тест истории метрик пройден успешно!")
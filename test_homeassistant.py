@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки MQTT discovery для Home Assistant
+"""
+
+import json
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.drivers import get_driver
+from asic2mqtt_core.homeassistant import DiscoveryPublisher
+
+STATS = {"STATS": [{"Type": "Antminer S19"},
+                   {"GHS 5s": 95000.5, "GHS av": 94000.1, "Elapsed": 3600,
+                    "fan1": 5400, "fan2": 5460, "temp2_1": 65}]}
+
+
+def test_discovery():
+    """Тест однократной публикации конфигурации сенсоров"""
+    print("Тестирование MQTT discovery...")
+    client = MagicMock()
+    discovery = DiscoveryPublisher(client, {})
+    driver = get_driver('antminer')('192.168.3.73')
+    capabilities = frozenset(['stats', 'devs'])
+
+    assert discovery.update('antminer3', driver, 'miner/t21', capabilities, {'stats': STATS})
+    topics = [c.args[0] for c in client.publish.call_args_list]
+    assert 'homeassistant/sensor/asic2mqtt_antminer3/hashrate/config' in topics
+    assert 'homeassistant/sensor/asic2mqtt_antminer3/fan_3/config' not in topics
+    assert all(c.kwargs['retain'] for c in client.publish.call_args_list)
+
+    config = json.loads(client.publish.call_args_list[0].args[1])
+    assert config['state_topic'] == 'miner/t21/stats'
+    assert config['value_template'] == "{{ value_json['STATS'][1]['GHS 5s'] }}"
+    print("✅ Конфигурация сенсоров сформирована по первому опросу")
+
+    # Следующие циклы ничего не публикуют
+    client.publish.reset_mock()
+    assert not discovery.update('antminer3', driver, 'miner/t21', capabilities, {'stats': STATS})
+    assert client.publish.call_count == 0
+
+    # Birth-сообщение Home Assistant вызывает повторную публикацию
+    message = MagicMock(payload=b'online')
+    discovery._on_status(client, None, message)
+    assert discovery.update('antminer3', driver, 'miner/t21', capabilities, {'stats': STATS})
+    assert client.publish.call_count == len(topics)
+    print("✅ Повторная публикация только после birth-сообщения")
+
+
+if __name__ == "__main__":
+    test_discovery()
+    print("\n✅ Тест MQTT discovery пройден успешно!")
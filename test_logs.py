@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки асинхронного логгирования и ограничения частоты сообщений
+"""
+
+import logging
+import sys
+import os
+import tempfile
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.logs import RateLimiter
+
+
+def test_rate_limiter():
+    """Тест экспоненциального окна для повторяющихся сообщений"""
+    print("Тестирование ограничения частоты сообщений...")
+    limiter = RateLimiter(window=60, max_window=120)
+    key = ('antminer3', 'unavailable')
+    assert limiter.allow(key, now=0) == (True, 0)
+    assert limiter.allow(key, now=5) == (False, 1)
+    assert limiter.allow(key, now=10) == (False, 2)
+    # Окно истекло - сообщение пишется с числом подавленных, окно удваивается
+    assert limiter.allow(key, now=60) == (True, 2)
+    assert limiter.allow(key, now=150) == (False, 1)
+    assert limiter.allow(key, now=180) == (True, 1)
+    # Окно не превышает максимального
+    assert limiter.allow(key, now=299) == (False, 1)
+    assert limiter.allow(key, now=300) == (True, 1)
+
+    assert limiter.reset(key)
+    assert not limiter.reset(key)
+    assert limiter.allow(key, now=301) == (True, 0)
+    print("✅ Повторяющиеся сообщения подавляются")
+
+
+def test_setup_logging():
+    """Тест записи в файл через очередь"""
+    print("Тестирование асинхронного логгирования...")
+    import asic2mqtt
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_file = os.path.join(directory, 'asic2mqtt.log')
+        logger = asic2mqtt.setup_logging({'file': log_file, 'file_level': 'INFO'})
+        try:
+            assert not logger.isEnabledFor(logging.DEBUG)
+            logger.debug("Пинг хоста %s", '192.168.3.73')
+            logger.info("Асик %s недоступен", 'antminer3')
+            asic2mqtt.stop_logging()
+        finally:
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+
+        with open(log_file, encoding='utf-8') as f:
+            content = f.read()
+        assert "Асик antminer3 недоступен" in content
+        assert "Пинг хоста" not in content
+    print("✅ Сообщения записываются в файл из потока QueueListener")
+
+
+if __name__ == "__main__":
+    test_rate_limiter()
+    test_setup_logging()
+    print("\n✅ Тест логгирования пройден успешно!")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки публикации отдельных метрик
+"""
+
+import copy
+import sys
+import os
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.drivers import get_driver
+from asic2mqtt_core.metrics import MetricExtractor, parse_path
+
+RESULTS = {
+    'stats': {"STATS": [{"Type": "Antminer S19", "CompileTime": "Mon Jan 1"},
+                        {"GHS 5s": 95000.5, "GHS av": 94000.1, "fan_num": 4,
+                         "fan1": 5400, "fan2": 5460, "temp2_1": 65, "temp2_2": 67}]},
+    'devs': {"DEVS": [{"ASC": 0, "Accepted": 10, "Rejected": 1},
+                      {"ASC": 1, "Accepted": 12, "Rejected": 0}]},
+}
+
+
+def test_parse_path():
+    """Тест разбора пути метрики"""
+    print("Тестирование разбора путей...")
+    assert parse_path('stats/STATS/1/GHS 5s') == ('stats', ('STATS', 1, 'GHS 5s'))
+    try:
+        parse_path('GHS 5s')
+        assert False, "Ожидалась ошибка ValueError"
+    except ValueError:
+        pass
+    print("✅ Пути разбираются корректно")
+
+
+def test_extract():
+    """Тест извлечения метрик драйвера по умолчанию"""
+    print("Тестирование извлечения метрик...")
+    driver = get_driver('antminer')('192.168.3.73')
+    extractor = MetricExtractor()
+    values = dict(extractor.extract(driver, RESULTS))
+    assert values['hashrate'] == 95000.5
+    assert values['fan/fan1'] == 5400
+    assert 'fan/fan_num' not in values
+    assert values['chain_temp/temp2_2'] == 67
+    assert values['rejected/0'] == 1
+    print("✅ Метрики и шаблоны путей извлекаются")
+
+    # План строится один раз для драйвера
+    assert len(extractor._plans) == 1
+    results = copy.deepcopy(RESULTS)
+    results['stats']['STATS'][1]['GHS 5s'] = 1.0
+    assert dict(extractor.extract(driver, results))['hashrate'] == 1.0
+    assert len(extractor._plans) == 1
+
+    extractor = MetricExtractor({'metrics': {'antminer': {'temp': 'stats/STATS/1/temp2_1'}}})
+    assert extractor.extract(driver, RESULTS) == [('temp', 65)]
+    print("✅ План извлечения кэшируется и настраивается в конфигурации")
+
+
+def test_chain_count():
+    """Тест асиков одной прошивки с разным числом цепей"""
+    print("Тестирование асиков с разным числом цепей...")
+    driver = get_driver('antminer')('192.168.3.73')
+    extractor = MetricExtractor()
+    one_chain = copy.deepcopy(RESULTS)
+    del one_chain['stats']['STATS'][1]['temp2_2']
+    one_chain['devs']['DEVS'] = one_chain['devs']['DEVS'][:1]
+    three_chains = copy.deepcopy(RESULTS)
+    three_chains['stats']['STATS'][1].update({'temp2_3': 69, 'chain_rate1': 31000, 'chain_rate3': 32000})
+    three_chains['devs']['DEVS'].append({"ASC": 2, "Accepted": 7, "Rejected": 2})
+
+    assert 'chain_temp/temp2_2' not in dict(extractor.extract(driver, one_chain))
+    values = dict(extractor.extract(driver, three_chains))
+    assert values['chain_temp/temp2_3'] == 69
+    assert values['chain_hashrate/chain_rate3'] == 32000
+    assert values['accepted/2'] == 7
+    print("✅ Шаблоны раскрываются по данным каждого асика")
+
+
+if __name__ == "__main__":
+    test_parse_path()
+    test_extract()
+    test_chain_count()
+    print("\n✅ Тест публикации метрик пройден успешно!")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки нормализованного снимка асика
+"""
+
+import pickle
+import sys
+import os
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.drivers.antminer import AntminerDriver
+from asic2mqtt_core.drivers.whatsminer import WhatsminerDriver
+from asic2mqtt_core.fleet import FleetAggregator
+
+ANTMINER_RESULTS = {
+    'stats': {'STATS': [{'Type': 'Antminer S19'}, {
+        'GHS 5s': '95000.5', 'chain_rate1': '31000.1', 'chain_rate2': '32000.2', 'chain_rate3': '',
+        'temp2_1': 65, 'temp2_2': 71, 'temp2_3': 0,
+    }]},
+    'devs': {'DEVS': [{'Accepted': 10, 'Rejected': 1}, {'Accepted': 5, 'Rejected': 0}]},
+}
+
+WHATSMINER_RESULTS = {
+    'summary': {'SUMMARY': [{'MHS 5s': 100000000, 'Temperature': 70, 'Accepted': 9, 'Rejected': 1,
+                             'Power': 3300}]},
+    'edevs': {'DEVS': [{'MHS 5s': 33000000, 'Temperature': 75}, {'MHS 5s': 34000000, 'Temperature': 74}]},
+}
+
+
+def test_snapshot():
+    """Тест снимков драйверов Antminer и Whatsminer"""
+    print("Тестирование снимка асика...")
+    snapshot = AntminerDriver('127.0.0.1').snapshot('antminer1', ANTMINER_RESULTS, 1000, 0.5)
+    assert snapshot.hashrate == 95000.5
+    assert snapshot.temperature == 71.0
+    assert snapshot.accepted == 15.0 and snapshot.rejected == 1.0
+    assert snapshot.power is None
+    # array('f') хранит значения с одинарной точностью, пустое значение - NaN
+    chain_hashrate = snapshot.as_dict()['chain_hashrate']
+    assert [round(value) for value in chain_hashrate[:2]] == [31000, 32000]
+    assert chain_hashrate[2] is None
+    assert list(snapshot.chain_temps) == [65.0, 71.0, 0.0]
+    assert not hasattr(snapshot, '__dict__')
+    print("✅ Снимок Antminer")
+
+    snapshot = WhatsminerDriver.__new__(WhatsminerDriver).snapshot('whatsminer1', WHATSMINER_RESULTS, 1000, 0.5)
+    assert snapshot.values() == {'hashrate': 100000.0, 'temperature': 75.0, 'accepted': 9.0, 'rejected': 1.0,
+                                 'power': 3300.0}
+    assert list(snapshot.chain_hashrate) == [33000.0, 34000.0]
+    print("✅ Снимок Whatsminer с теми же полями")
+
+    # Снимок передается из процессов опроса в основной процесс
+    copy = pickle.loads(pickle.dumps(snapshot))
+    assert copy.values() == snapshot.values()
+    assert copy.asic_name is sys.intern('whatsminer1')
+    print("✅ Снимок передается между процессами")
+
+    # Сводка по парку принимает снимок вместо словаря показателей
+    fleet = FleetAggregator()
+    fleet.update('whatsminer1', snapshot)
+    summary = fleet.summary()
+    assert summary['temperature_max'] == 75.0
+    assert summary['hashrate'] == 100000.0
+    print("✅ Сводка по парку строится по снимкам")
+
+
+if __name__ == "__main__":
+    test_snapshot()
+    print("\n✅ Тест снимка асика пройден успешно!")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки проекции JSON-сообщений
+"""
+
+import json
+import logging
+import sys
+import os
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.projection import PayloadProjector, compile_projection
+
+STATS = {"STATUS": [{"STATUS": "S"}],
+         "STATS": [{"Type": "Antminer S19", "CompileTime": "Mon Jan 1"},
+                   {"GHS 5s": 95000.5, "fan1": 5400, "freq1": 650, "freq2": 655,
+                    "chain_acn1": 76, "temp2_1": 65}]}
+
+
+def test_include_exclude():
+    """Тест селекторов include и exclude"""
+    print("Тестирование селекторов...")
+    exclude = compile_projection(exclude=['STATS/*/freq*', 'STATS/*/chain_acn*', 'STATUS'])
+    projected = exclude(STATS)
+    assert 'STATUS' not in projected
+    assert projected['STATS'][1] == {"GHS 5s": 95000.5, "fan1": 5400, "temp2_1": 65}
+    # Исходные данные не изменяются, нетронутые поддеревья не копируются
+    assert 'freq1' in STATS['STATS'][1]
+    assert projected['STATS'][0] is STATS['STATS'][0]
+    print("✅ exclude удаляет выбранные поля")
+
+    include = compile_projection(include=['STATS/1/GHS 5s', 'STATS/1/temp2_*'])
+    assert include(STATS) == {"STATS": [None, {"GHS 5s": 95000.5, "temp2_1": 65}]}
+    assert compile_projection(include=['missing'])(STATS) == {}
+
+    both = compile_projection(include=['STATS/1'], exclude=['STATS/1/freq*'])
+    assert 'freq1' not in both(STATS)['STATS'][1]
+    assert 'fan1' in both(STATS)['STATS'][1]
+    print("✅ include оставляет выбранные поля с сохранением индексов")
+
+    # Литерал и маска на одном уровне: учитываются оба селектора
+    include = compile_projection(include=['STATS/1/fan1', 'STATS/*/GHS 5s'])
+    assert include(STATS) == {"STATS": [None, {"GHS 5s": 95000.5, "fan1": 5400}]}
+    include = compile_projection(include=['STATS/*/Type', 'STATS/[01]/temp2_*', 'STATS/1/fan1'])
+    assert include(STATS) == {"STATS": [{"Type": "Antminer S19"}, {"fan1": 5400, "temp2_1": 65}]}
+    exclude = compile_projection(exclude=['STATS/1/fan1', 'STATS/*/freq*', 'STATS/0'])
+    assert exclude(STATS)['STATS'] == [None, {"GHS 5s": 95000.5, "chain_acn1": 76, "temp2_1": 65}]
+    print("✅ Поддеревья пересекающихся селекторов объединяются")
+
+
+def test_report():
+    """Тест учета размера сообщений"""
+    print("Тестирование учета размера сообщений...")
+    logger = logging.getLogger('asic2mqtt_test_projection')
+    logger.setLevel(logging.INFO)
+    projector = PayloadProjector({'stats': {'exclude': ['STATS/*/freq*']}}, logger)
+    message = projector.encode('stats', STATS).payload
+    assert 'freq1' not in json.loads(message)['STATS'][1]
+    assert projector.encode('devs', {"DEVS": []}).payload == '{"DEVS": []}'
+    assert projector.bytes_before > projector.bytes_after
+    projector.report()
+    assert projector.bytes_before == projector.bytes_after == 0
+    print("✅ Размер до и после проекции учитывается")
+
+
+if __name__ == "__main__":
+    test_include_exclude()
+    test_report()
+    print("\n✅ Тест проекции пройден успешно!")
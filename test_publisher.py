@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки публикации в режимах MQTT 3.1.1 и MQTT v5
+"""
+
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.publisher import Publisher, create_client
+
+
+def test_publisher():
+    """Тест алиасов топиков, срока жизни и пользовательских свойств"""
+    print("Тестирование публикации в MQTT...")
+
+    # MQTT 3.1.1: сообщение уходит без свойств
+    client = MagicMock()
+    publisher = Publisher(client, {}, interval=10)
+    publisher.publish('miner/t21/stats', '{}', user_properties=[('poll_ts', 1)])
+    client.publish.assert_called_once_with('miner/t21/stats', '{}', 0, False)
+    print("✅ MQTT 3.1.1 публикует сообщения как раньше")
+
+    # MQTT v5: брокер разрешает два алиаса
+    client = MagicMock()
+    publisher = Publisher(client, {'protocol': 5}, interval=10)
+    assert publisher.expiry == 30
+    publisher.on_connect(MagicMock(TopicAliasMaximum=2))
+
+    publisher.publish('miner/t21/stats', '{}', user_properties=[('poll_ts', 1700000000), ('latency_ms', 42)])
+    topic, payload, qos, retain, properties = client.publish.call_args.args
+    assert topic == 'miner/t21/stats'
+    assert properties.TopicAlias == 1
+    assert properties.MessageExpiryInterval == 30
+    assert properties.UserProperty == [('poll_ts', '1700000000'), ('latency_ms', '42')]
+
+    publisher.publish('miner/t21/stats', '{}')
+    topic, payload, qos, retain, properties = client.publish.call_args.args
+    assert topic == '' and properties.TopicAlias == 1
+    print("✅ Повторная публикация использует алиас вместо топика")
+
+    publisher.publish('miner/t21/devs', '{}')
+    publisher.publish('miner/t21/hashrate', '1')
+    topic, payload, qos, retain, properties = client.publish.call_args.args
+    assert topic == 'miner/t21/hashrate' and not hasattr(properties, 'TopicAlias')
+    print("✅ Число алиасов ограничено пределом брокера")
+
+    # Retained-сообщения не устаревают
+    publisher.publish('homeassistant/sensor/x/config', '{}', retain=True)
+    properties = client.publish.call_args.args[4]
+    assert not hasattr(properties, 'MessageExpiryInterval')
+
+    # После переподключения алиасы назначаются заново
+    publisher.on_disconnect()
+    publisher.publish('miner/t21/stats', '{}')
+    assert client.publish.call_args.args[0] == 'miner/t21/stats'
+    publisher.on_connect(MagicMock(TopicAliasMaximum=2))
+    publisher.publish('miner/t21/stats', '{}')
+    assert client.publish.call_args.args[0] == 'miner/t21/stats'
+    assert client.publish.call_args.args[4].TopicAlias == 1
+    print("✅ Алиасы сбрасываются при переподключении")
+
+    # Неизвестная версия протокола
+    try:
+        create_client({'protocol': '4'})
+        assert False
+    except ValueError:
+        pass
+    print("✅ Неизвестная версия протокола отклоняется")
+
+
+if __name__ == "__main__":
+    test_publisher()
+    print("\n✅ Тест публикации в MQTT пройден успешно!")
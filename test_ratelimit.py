@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки ограничения частоты запросов к асикам
+"""
+
+import threading
+import time
+import sys
+import os
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from antminer.base import Core
+from antminer.exceptions import RateLimited
+from antminer.ratelimit import HostRateLimiter, TokenBucket
+from asic2mqtt_core.drivers import configure_rate_limits, get_driver
+
+
+def test_token_bucket():
+    """Тест: burst запросов подряд, затем не чаще rate в секунду"""
+    print("Тестирование token bucket...")
+    bucket = TokenBucket(rate=2, burst=3)
+    bucket.updated = 100
+    assert [bucket.reserve(now=100) for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve(now=100) == 0.5
+    assert bucket.reserve(now=100) == 1.0
+    # За две секунды накопилось 4 токена, но не больше burst
+    assert bucket.reserve(now=110) == 0
+    assert bucket.tokens == 2
+    print("✅ Запросы сверх предела ждут своей очереди")
+
+    limiter = HostRateLimiter(rate=1, burst=1, max_wait=0.1)
+    limiter.acquire('10.0.0.1')
+    try:
+        limiter.acquire('10.0.0.1')
+        assert False, "Ожидался RateLimited"
+    except RateLimited as e:
+        assert e.host == '10.0.0.1' and e.delay > 0.1
+    # У другого асика своя корзина
+    assert limiter.acquire('10.0.0.2') == 0
+    print("✅ Запрос, которому пришлось бы ждать дольше max_wait, отклоняется")
+
+
+def test_models():
+    """Тест пределов по моделям асиков"""
+    print("Тестирование пределов по моделям...")
+    limiter = HostRateLimiter()
+    limiter.configure(4, 8, models={'Antminer S9': (1, 2)})
+    assert limiter.limits('10.0.0.1') == (4, 8)
+    limiter.set_model('10.0.0.1', 'Antminer S9i')
+    assert limiter.limits('10.0.0.1') == (1, 2)
+    limiter.set_model('10.0.0.2', 'Antminer S19')
+    assert limiter.limits('10.0.0.2') == (4, 8)
+    print("✅ Модель асика выбирает его пределы")
+
+    configure_rate_limits({'rate': 2, 'burst': 3, 'models': {'Antminer S9': {'rate': 0.5}}})
+    try:
+        assert Core.limiter.rate == 2
+        assert Core.limiter.models == {'Antminer S9': (0.5, 3)}
+        assert get_driver('antminer').limiter is Core.limiter
+        assert get_driver('whatsminer').limiter.rate == 2
+    finally:
+        configure_rate_limits()
+    print("✅ Секция rate_limit настраивает ограничители всех драйверов")
+
+
+def test_coalescing():
+    """Тест объединения одинаковых одновременных запросов"""
+    print("Тестирование объединения запросов...")
+    limiter = HostRateLimiter(rate=None)
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def request():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'STATS': [{'Type': 'Antminer S9'}]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(limiter.call('10.0.0.1', 'stats', request)))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 5
+    assert all(result == results[0] for result in results)
+    # Каждый получает собственную копию ответа
+    assert len(set(id(result) for result in results)) == 5
+    print("✅ Пять одновременных запросов stats отправлены асику один раз")
+
+    # Без ключа запросы не объединяются, ошибка передается вызывающему
+    limiter.call('10.0.0.1', None, lambda: calls.append(1))
+    assert len(calls) == 2
+    try:
+        limiter.call('10.0.0.1', 'stats', lambda: 1 / 0)
+        assert False, "Ожидалось исключение"
+    except ZeroDivisionError:
+        pass
+    print("✅ Ошибка запроса не оставляет его висеть в очереди объединения")
+
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_models()
+    test_coalescing()
+    print("\n✅ Тест ограничения частоты запросов пройден успешно!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки внепланового опроса по запросу через MQTT
+"""
+
+import collections
+import json
+import threading
+import time
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.api import MinerCache
+from asic2mqtt_core.refresh import RefreshRequests
+
+PollResult = collections.namedtuple('PollResult', 'asic_name state driver results capabilities poll_ts latency snapshot',
+                                    defaults=(None,))
+
+ASICS = {'antminer1': {'ip': '10.0.0.1', 'topic': 'asic/antminer1'}}
+
+
+def test_refresh():
+    """Тест объединения запросов, ограничения частоты и ответов"""
+    print("Тестирование внепланового опроса...")
+    polls = []
+    release = threading.Event()
+
+    def poll(asic_name):
+        polls.append(asic_name)
+        release.wait(5)
+        return PollResult(asic_name, 'online', 'antminer', {'stats': {}}, frozenset(['stats']), 1000, 0.5)
+
+    cache = MinerCache(poll=poll, min_interval=10)
+    refresher = RefreshRequests({}, ASICS, cache)
+
+    # Запрос в JSON и запрос MQTT v5 со свойствами
+    first = refresher.parse('asic/antminer1', '{"id": "pool-switch"}')
+    assert first.id == 'pool-switch'
+    assert first.response_topic == 'asic/antminer1/refresh/result'
+    second = refresher.parse('asic/antminer1', '', SimpleNamespace(CorrelationData=b'abc', ResponseTopic='ui/reply'))
+    assert second.id == 'abc' and second.correlation_data == b'abc'
+    assert second.response_topic == 'ui/reply'
+    print("✅ Идентификатор и топик ответа берутся из JSON или свойств MQTT v5")
+
+    # Второй запрос присоединяется к идущему опросу
+    assert refresher.submit('antminer1', first, now=995) is None
+    while not cache.refreshing('antminer1'):
+        time.sleep(0.01)
+    assert refresher.submit('antminer1', second, now=996) is None
+    time.sleep(0.1)
+    release.set()
+    while cache.refreshing('antminer1'):
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert polls == ['antminer1']
+    (asic_name, result, requests), = list(cache.drain())
+    assert result.state == 'online'
+    assert [request.id for request in requests] == ['pool-switch', 'abc']
+    print("✅ Запросы во время опроса объединяются с ним")
+
+    # Новый опрос не раньше чем через min_interval после последнего опроса (poll_ts 1000)
+    assert refresher.submit('antminer1', first, now=1005) == 5
+    print("✅ Частые запросы отклоняются")
+
+    publisher = MagicMock()
+    refresher.respond(publisher, result, requests)
+    (topic, payload), kwargs = publisher.publish.call_args_list[1]
+    assert topic == 'ui/reply'
+    assert json.loads(payload) == {'id': 'abc', 'status': 'online', 'poll_ts': 1000, 'latency': 0.5}
+    assert kwargs['correlation_data'] == b'abc'
+    refresher.respond(publisher, None, [first])
+    assert json.loads(publisher.publish.call_args.args[1])['status'] == 'skipped'
+    print("✅ Итог запроса публикуется с его идентификатором")
+
+
+if __name__ == "__main__":
+    test_refresh()
+    print("\n✅ Тест внепланового опроса пройден успешно!")
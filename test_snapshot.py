@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки снимка парка одним сообщением
+"""
+
+import json
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.snapshot import SnapshotBatcher, decompress
+
+STATS = {"STATS": [{"Type": "Antminer S19"}, {"GHS 5s": 95000.5, "temp2_1": 65}]}
+
+
+def test_snapshot():
+    """Тест сборки, сжатия и публикации снимка"""
+    print("Тестирование снимка парка...")
+    client = MagicMock()
+    snapshot = SnapshotBatcher({'compression': 'zlib'})
+
+    for i in range(50):
+        snapshot.add('antminer{}'.format(i), 'miner/t21_{:03d}'.format(i), {'stats': STATS}, 1700000000)
+
+    # Без окна снимок публикуется только в конце цикла
+    assert not snapshot.publish_due(client, now=1700000005)
+    assert snapshot.publish_due(client, now=1700000005, cycle_end=True)
+    assert client.publish.call_count == 2
+
+    manifest_topic, manifest = client.publish.call_args_list[0].args
+    assert manifest_topic == 'fleet/snapshot/manifest'
+    manifest = json.loads(manifest)
+    assert manifest['seq'] == 0 and manifest['compression'] == 'zlib'
+    assert manifest['miners']['antminer7'] == {'topic': 'miner/t21_007', 'ts': 1700000000, 'subtopics': ['stats']}
+    assert manifest['compressed_size'] < manifest['size']
+    print("✅ Манифест описывает снимок: %d байт вместо %d" % (manifest['compressed_size'], manifest['size']))
+
+    topic, payload = client.publish.call_args_list[1].args
+    assert topic == 'fleet/snapshot'
+    body = json.loads(decompress(payload, manifest['compression']))
+    assert len(body['miners']) == 50
+    assert body['miners']['antminer7']['data']['stats'] == STATS
+    print("✅ Снимок распаковывается по полю compression из манифеста")
+
+    # Пустой снимок не публикуется, номер растет
+    client.reset_mock()
+    assert not snapshot.publish_due(client, cycle_end=True)
+    snapshot.add('antminer1', 'miner/t21_001', {'stats': STATS})
+    assert snapshot.publish_due(client, cycle_end=True)
+    assert json.loads(client.publish.call_args_list[0].args[1])['seq'] == 1
+
+    # С окном снимок публикуется по времени, а не по концу цикла
+    client.reset_mock()
+    snapshot = SnapshotBatcher({'window': 30, 'compression': 'none'})
+    snapshot.add('antminer1', 'miner/t21_001', {'stats': STATS})
+    assert not snapshot.publish_due(client, now=100)
+    assert not snapshot.publish_due(client, now=120, cycle_end=True)
+    assert snapshot.publish_due(client, now=131)
+    assert json.loads(client.publish.call_args_list[1].args[1])['miners']['antminer1']['data']['stats'] == STATS
+    print("✅ Снимок по окну публикуется независимо от границ цикла")
+
+
+if __name__ == "__main__":
+    test_snapshot()
+    print("\n✅ Тест снимка парка пройден успешно!")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки теплого старта: ленивой загрузки драйверов и
+восстановления состояния опроса
+"""
+
+import collections
+import json
+import subprocess
+import sys
+import os
+import tempfile
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.drivers import CapabilityCache
+from asic2mqtt_core.warmstate import WarmState, config_digest
+
+PollResult = collections.namedtuple('PollResult', 'asic_name state driver results capabilities poll_ts latency snapshot',
+                                    defaults=(None,))
+
+ASICS = {
+    'antminer1': {'ip': '10.0.0.1', 'topic': 'asic/antminer1'},
+    'antminer2': {'ip': '10.0.0.2', 'topic': 'asic/antminer2'},
+    'whatsminer1': {'ip': '10.0.0.3', 'topic': 'asic/whatsminer1', 'password': 'secret-admin'},
+    'antminer4': {'ip': '10.0.0.4', 'topic': 'asic/antminer4'},
+}
+
+
+def test_lazy_drivers():
+    """Тест загрузки модулей драйверов только при обращении к ним"""
+    print("Тестирование ленивой загрузки драйверов...")
+    code = (
+        "import sys; import asic2mqtt; "
+        "from asic2mqtt_core.drivers import available_drivers, resolve_driver; "
+        "assert 'whatsminer' not in sys.modules and 'antminer.base' not in sys.modules; "
+        "assert available_drivers() == ['antminer', 'whatsminer']; "
+        "assert resolve_driver('antminer1', {}).name == 'antminer'; "
+        "assert 'antminer.base' in sys.modules and 'whatsminer' not in sys.modules; "
+        "assert not {'msgpack', 'cbor2', 'zstandard'} & set(sys.modules)"
+    )
+    subprocess.run([sys.executable, '-c', code], check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    print("✅ Драйвер Whatsminer и модули сжатия не загружаются, пока не нужны")
+
+
+def test_warm_state():
+    """Тест сохранения и восстановления состояния опроса"""
+    print("Тестирование состояния опроса между перезапусками...")
+    path = os.path.join(tempfile.mkdtemp(), 'state.json')
+    state = WarmState({'path': path})
+    state.update(PollResult('antminer1', 'offline', None, None, None, 1000, None), ASICS['antminer1'])
+    state.update(PollResult('antminer2', 'online', 'antminer', {}, frozenset(['stats', 'devs']), 1000, 0.5),
+                 ASICS['antminer2'])
+    state.update(PollResult('whatsminer1', 'online', 'whatsminer', {}, frozenset(['summary']), 1000, 0.2),
+                 ASICS['whatsminer1'])
+    # Набор команд не изменился - время проверки остается прежним
+    state.update(PollResult('antminer2', 'online', 'antminer', {}, frozenset(['stats', 'devs']), 1060, 0.4),
+                 ASICS['antminer2'])
+    assert state.miners['antminer2']['probed_at'] == 1000
+    assert state.save(now=1100)
+    assert not os.path.exists(path + '.tmp')
+    print("✅ Состояние сохраняется в файл")
+
+    # Конфигурация whatsminer1 изменилась - его команды проверяются заново
+    asics = dict(ASICS, whatsminer1=dict(ASICS['whatsminer1'], model='M30S'))
+    restored = WarmState({'path': path})
+    assert restored.load(now=1200)
+    capabilities = CapabilityCache(ttl=0)
+    assert restored.restore(capabilities, asics) == 1
+    assert capabilities.get('antminer2') == frozenset(['stats', 'devs'])
+    assert capabilities.entries()['antminer2'][1] == 1000
+    assert capabilities.get('whatsminer1') is None
+    print("✅ Команды восстанавливаются для асиков с прежней конфигурацией")
+
+    # whatsminer1 опрошен раньше antminer2 и ждет дольше
+    assert list(restored.order(asics)) == ['whatsminer1', 'antminer2', 'antminer4', 'antminer1']
+    print("✅ Первый цикл начинается с доступных асиков, дольше всех ждущих опроса, недоступные - последними")
+
+    # Пароль не влияет на отпечаток конфигурации и не попадает в файл
+    with open(path) as f:
+        saved = f.read()
+    assert 'secret-admin' not in saved
+    assert restored.miners['whatsminer1']['config'] == config_digest(dict(ASICS['whatsminer1'], password='other'))
+    assert config_digest(ASICS['whatsminer1']) != config_digest(dict(ASICS['whatsminer1'], driver='antminer'))
+    print("✅ Учетные данные не входят в отпечаток конфигурации")
+
+    assert not WarmState({'path': path, 'max_age': 60}).load(now=1200)
+    with open(path, 'w') as f:
+        json.dump({'version': 0}, f)
+    assert not WarmState({'path': path}).load(now=1200)
+    assert not WarmState({'path': path + '.missing'}).load()
+    print("✅ Устаревшее или чужое состояние не используется")
+
+
+if __name__ == "__main__":
+    test_lazy_drivers()
+    test_warm_state()
+    print("\n✅ Тест теплого старта пройден успешно!")
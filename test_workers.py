@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Тестовый скрипт для проверки многопроцессного опроса
+"""
+
+import logging
+import sys
+import os
+import tempfile
+import time
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asic2mqtt_core.sharding import HashRing
+from asic2mqtt_core.workers import CYCLE_END, WorkerPool
+
+
+class EchoPoller(object):
+    """Опрос без сети: результат - имя асика и номер процесса"""
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def setup(self):
+        pass
+
+    def poll(self, asic_name, asic_config):
+        return asic_name, os.getpid()
+
+
+class CrashingPoller(EchoPoller):
+    """Процесс опроса завершается аварийно на асике crash при первом запуске"""
+
+    def __init__(self, logger, marker):
+        super(CrashingPoller, self).__init__(logger)
+        self.marker = marker
+
+    def poll(self, asic_name, asic_config):
+        time.sleep(0.01)
+        if asic_name == 'crash' and not os.path.exists(self.marker):
+            open(self.marker, 'w').close()
+            os._exit(1)
+        return super(CrashingPoller, self).poll(asic_name, asic_config)
+
+
+def echo_cycle(poller, asics):
+    for asic_name, asic_config in asics.items():
+        yield poller.poll(asic_name, asic_config)
+
+
+def test_hash_ring():
+    """Тест консистентного хэширования"""
+    print("Тестирование распределения асиков...")
+    asics = dict(('antminer{}'.format(i), {}) for i in range(1000))
+    shards = HashRing(range(4)).split(asics)
+    assert sum(len(shard) for shard in shards.values()) == 1000
+    assert all(150 < len(shard) < 350 for shard in shards.values())
+    print("✅ Асики распределены равномерно: %s" % [len(shard) for shard in shards.values()])
+
+    # При добавлении процесса переезжает примерно пятая часть асиков
+    bigger = HashRing(range(5))
+    moved = sum(1 for name in asics if bigger.node_for(name) != HashRing(range(4)).node_for(name))
+    assert moved < 350
+    print("✅ При добавлении процесса переехало %d асиков из 1000" % moved)
+
+
+def test_worker_pool():
+    """Тест сбора результатов из процессов опроса"""
+    print("Тестирование процессов опроса...")
+    logger = logging.getLogger('asic2mqtt_test_workers')
+    asics = dict(('antminer{}'.format(i), {}) for i in range(20))
+    pool = WorkerPool(asics, 3, EchoPoller(logger), echo_cycle, logger, cycle_pause=60)
+    pool.start()
+    try:
+        seen = {}
+        for result in pool.results():
+            if result is CYCLE_END:
+                break
+            if result is not None:
+                asic_name, pid = result
+                seen[asic_name] = pid
+    finally:
+        pool.stop()
+    assert set(seen) == set(asics)
+    assert len(set(seen.values())) == 3
+    assert os.getpid() not in seen.values()
+    print("✅ Все асики опрошены в трех процессах, цикл завершен")
+
+
+def test_worker_restart():
+    """Тест перезапуска процесса опроса, пока остальные процессы заняты"""
+    print("Тестирование перезапуска процесса опроса...")
+    logger = logging.getLogger('asic2mqtt_test_workers')
+    asics = dict(('antminer{}'.format(i), {}) for i in range(20))
+    asics['crash'] = {}
+    marker = os.path.join(tempfile.mkdtemp(), 'crashed')
+    # Без паузы между циклами очередь результатов не пустеет
+    pool = WorkerPool(asics, 3, CrashingPoller(logger, marker), echo_cycle, logger, cycle_pause=0)
+    pool.start()
+    cycles = 0
+    seen = set()
+    deadline = time.time() + 30
+    try:
+        for result in pool.results():
+            assert time.time() < deadline, "Процесс опроса не перезапущен"
+            if result is CYCLE_END:
+                cycles += 1
+            elif result is not None:
+                seen.add(result[0])
+            if cycles >= 2 and 'crash' in seen:
+                break
+    finally:
+        pool.stop()
+    assert os.path.exists(marker)
+    print("✅ Завершившийся процесс перезапущен, циклы продолжают завершаться")
+
+
+if __name__ == "__main__":
+    test_hash_ring()
+    test_worker_pool()
+    test_worker_restart()
+    print("\n✅ Тест многопроцессного опроса пройден успешно!")